@@ -0,0 +1,226 @@
+"""
+generator.py
+
+Seeded synthetic transaction generator for benchmarks.
+
+`data/sample_transaction.csv` has 201 rows, far too few to measure
+throughput. This module produces arbitrarily many transactions (10M+ rows are
+written in bounded-memory chunks) with the traits that matter for the engine:
+
+    - Zipf-skewed user activity (a few very hot users, a long tail).
+    - Bursts: runs of transactions by one user seconds apart, which is what
+      `RapidTransactionsRule` looks for.
+    - A configurable share of invalid rows (bad amount, bad timestamp,
+      wrong field count), exercising the reject paths.
+
+The same seed and options always produce the same rows.
+
+Key Responsibilities:
+    - Generate transaction rows column-wise with NumPy, chunk by chunk.
+    - Write them as CSV (the sample file's layout) or NDJSON.
+    - Yield raw record dicts for in-memory stage benchmarks.
+
+Typical usage:
+    from benchmarks.generator import write_csv
+
+    write_csv("/tmp/txns.csv", rows=10_000_000, users=100_000, seed=7)
+"""
+import argparse
+import json
+from datetime import datetime, timezone
+from typing import Iterator, List
+
+import numpy as np
+
+CSV_HEADER = ["transaction_id", "user_id", "amount", "timestamp", "location", "payment_method"]
+LOCATIONS = ["Mumbai", "Delhi", "Bangalore", "Hyderabad", "Chennai", "Kolkata",
+             "Pune", "Ahmedabad", "Jaipur", "Indore"]
+PAYMENT_METHODS = ["CreditCard", "DebitCard", "UPI", "NetBanking", "Wallet"]
+DEFAULT_START = datetime(2025, 9, 1, tzinfo=timezone.utc)
+DEFAULT_CHUNK_ROWS = 100_000
+
+# Kinds of invalid rows produced when invalid_rate > 0
+_BAD_AMOUNT, _BAD_TIMESTAMP, _BAD_WIDTH = range(3)
+
+
+class TransactionGenerator:
+    """
+    Deterministic stream of synthetic transactions.
+
+    Args:
+        users (int): Number of distinct users.
+        zipf_s (float): Zipf exponent of user activity (0 = uniform).
+        burst_rate (float): Probability that a row starts a burst.
+        burst_size (int): Transactions per burst (including the first).
+        burst_gap_seconds (float): Maximum gap between transactions in a burst.
+        mean_gap_seconds (float): Mean gap between ordinary transactions.
+        invalid_rate (float): Share of rows made invalid.
+        large_rate (float): Share of rows with a very large amount.
+        seed (int): Random seed.
+        start (datetime): Timestamp of the first transaction.
+    """
+
+    def __init__(self, users: int = 10_000, zipf_s: float = 1.1, burst_rate: float = 0.001,
+                 burst_size: int = 5, burst_gap_seconds: float = 10.0,
+                 mean_gap_seconds: float = 0.5, invalid_rate: float = 0.001,
+                 large_rate: float = 0.001, seed: int = 0, start: datetime = DEFAULT_START):
+        if users < 1:
+            raise ValueError("users must be at least 1")
+        self.users = users
+        self.zipf_s = zipf_s
+        self.burst_rate = burst_rate
+        self.burst_size = max(1, burst_size)
+        self.burst_gap_seconds = burst_gap_seconds
+        self.mean_gap_seconds = mean_gap_seconds
+        self.invalid_rate = invalid_rate
+        self.large_rate = large_rate
+        self.seed = seed
+        self.start_us = int(start.timestamp() * 1_000_000)
+
+        weights = 1.0 / np.arange(1, users + 1, dtype=np.float64) ** zipf_s
+        self._cdf = np.cumsum(weights / weights.sum())
+        # Spread hot users over the id space instead of U0, U1, ...
+        self._user_ids = np.random.default_rng(seed).permutation(users)
+
+    def chunks(self, rows: int, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[dict]:
+        """
+        Yield column chunks of at most `chunk_rows` rows.
+
+        Each chunk is a dict of NumPy arrays: transaction_id (int), user (int),
+        amount (float), timestamp (int, epoch microseconds), location (int index),
+        payment_method (int index), and invalid (int kind, -1 for valid rows).
+        """
+        rng = np.random.default_rng(self.seed)
+        clock = self.start_us
+        pending_user, pending_left = 0, 0
+
+        for offset in range(0, rows, chunk_rows):
+            n = min(chunk_rows, rows - offset)
+            user = self._user_ids[np.minimum(np.searchsorted(self._cdf, rng.random(n)),
+                                             self.users - 1)]
+            gaps = rng.exponential(self.mean_gap_seconds, n)
+
+            # Bursts: the burst_size - 1 rows after a burst start belong to
+            # the same user and arrive within burst_gap_seconds of each other.
+            in_burst = np.zeros(n, dtype=bool)
+            if pending_left:
+                carry = min(pending_left, n)
+                user[:carry] = pending_user
+                in_burst[:carry] = True
+                pending_left -= carry
+            if self.burst_size > 1 and self.burst_rate > 0:
+                for s in np.flatnonzero(rng.random(n) < self.burst_rate):
+                    if in_burst[s]:
+                        continue
+                    end = min(s + self.burst_size, n)
+                    user[s + 1:end] = user[s]
+                    in_burst[s + 1:end] = True
+                    if s + self.burst_size > n:
+                        pending_user, pending_left = user[s], s + self.burst_size - n
+            gaps[in_burst] = rng.uniform(1.0, self.burst_gap_seconds, int(in_burst.sum()))
+
+            timestamp = clock + np.cumsum(np.round(gaps * 1_000_000).astype(np.int64))
+            clock = int(timestamp[-1])
+
+            amount = np.round(rng.lognormal(7.5, 1.0, n), 2)
+            large = rng.random(n) < self.large_rate
+            amount[large] = np.round(rng.uniform(10_000, 100_000, int(large.sum())), 2)
+
+            invalid = np.full(n, -1, dtype=np.int8)
+            bad = rng.random(n) < self.invalid_rate
+            invalid[bad] = rng.integers(0, 3, int(bad.sum()))
+
+            yield {
+                "transaction_id": np.arange(offset, offset + n),
+                "user": user,
+                "amount": amount,
+                "timestamp": timestamp,
+                "location": rng.integers(0, len(LOCATIONS), n),
+                "payment_method": rng.integers(0, len(PAYMENT_METHODS), n),
+                "invalid": invalid,
+            }
+
+    @staticmethod
+    def _text_columns(chunk: dict) -> List[list]:
+        times = np.datetime_as_string(chunk["timestamp"].astype("datetime64[us]"), unit="s")
+        times = np.char.replace(times, "T", " ").tolist()
+        amounts = [f"{a:.2f}" for a in chunk["amount"].tolist()]
+        for i in np.flatnonzero(chunk["invalid"] == _BAD_AMOUNT).tolist():
+            amounts[i] = "N/A"
+        for i in np.flatnonzero(chunk["invalid"] == _BAD_TIMESTAMP).tolist():
+            times[i] = "not-a-date"
+        return [
+            [str(t) for t in chunk["transaction_id"].tolist()],
+            [f"U{u}" for u in chunk["user"].tolist()],
+            amounts,
+            times,
+            [LOCATIONS[i] for i in chunk["location"].tolist()],
+            [PAYMENT_METHODS[i] for i in chunk["payment_method"].tolist()],
+        ]
+
+    def records(self, rows: int, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[dict]:
+        """Yield raw record dicts (string values, as read from CSV)."""
+        for chunk in self.chunks(rows, chunk_rows):
+            width = chunk["invalid"] == _BAD_WIDTH
+            for values, short in zip(zip(*self._text_columns(chunk)), width.tolist()):
+                record = dict(zip(CSV_HEADER, values))
+                if short:
+                    del record["location"]
+                yield record
+
+    def write_csv(self, path: str, rows: int, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> str:
+        """Write `rows` transactions to a CSV file with the sample file's header."""
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(",".join(CSV_HEADER) + "\n")
+            for chunk in self.chunks(rows, chunk_rows):
+                width = (chunk["invalid"] == _BAD_WIDTH).tolist()
+                lines = [",".join(values[:-1] if short else values)
+                         for values, short in zip(zip(*self._text_columns(chunk)), width)]
+                f.write("\n".join(lines) + "\n")
+        return path
+
+    def write_ndjson(self, path: str, rows: int, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> str:
+        """Write `rows` transactions as newline-delimited JSON."""
+        with open(path, "w", encoding="utf-8") as f:
+            for chunk in self.chunks(rows, chunk_rows):
+                width = (chunk["invalid"] == _BAD_WIDTH).tolist()
+                lines = []
+                for values, short in zip(zip(*self._text_columns(chunk)), width):
+                    record = dict(zip(CSV_HEADER, values))
+                    if short:
+                        del record["location"]
+                    lines.append(json.dumps(record))
+                f.write("\n".join(lines) + "\n")
+        return path
+
+
+def write_csv(path: str, rows: int, **options) -> str:
+    """Write a synthetic CSV file; `options` are `TransactionGenerator` arguments."""
+    return TransactionGenerator(**options).write_csv(path, rows)
+
+
+def write_ndjson(path: str, rows: int, **options) -> str:
+    """Write a synthetic NDJSON file; `options` are `TransactionGenerator` arguments."""
+    return TransactionGenerator(**options).write_ndjson(path, rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic transactions.")
+    parser.add_argument("path", help="Output file (.csv, or .ndjson/.jsonl for NDJSON).")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of user activity.")
+    parser.add_argument("--burst-rate", type=float, default=0.001)
+    parser.add_argument("--burst-size", type=int, default=5)
+    parser.add_argument("--invalid-rate", type=float, default=0.001)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generator = TransactionGenerator(users=args.users, zipf_s=args.zipf,
+                                     burst_rate=args.burst_rate, burst_size=args.burst_size,
+                                     invalid_rate=args.invalid_rate, seed=args.seed)
+    if args.path.endswith((".ndjson", ".jsonl")):
+        generator.write_ndjson(args.path, args.rows)
+    else:
+        generator.write_csv(args.path, args.rows)
+    print(f"Wrote {args.rows} transactions to {args.path}")
@@ -0,0 +1,301 @@
+"""
+run.py
+
+Benchmark harness for the Fraud Detection Engine.
+
+Generates a seeded synthetic dataset (`benchmarks/generator.py`), times every
+stage of the engine on it, and writes the results to a JSON file that later
+runs can be compared against to catch performance regressions.
+
+Stages:
+    ingest_csv_batches   columnar CSV parsing (`batch_pipeline`)
+    ingest_csv           fast-path `pipeline(..., "csv")`, one Transaction per row
+    ingest_csv_strict    `pipeline(..., "csv", strict=True)` (DictReader + Pydantic)
+    ingest_ndjson        `pipeline(..., "ndjson")`
+    ingest_columnar      memory-mapped `batch_pipeline(..., "columnar")` (conversion not timed)
+    validate_transaction `validate_transaction` on raw record dicts
+    rule.<Name>          each configured rule's `check`
+    detector_evaluate    `FraudDetector.evaluate`
+    profile_update       `ProfileEngine.update_profile`
+    end_to_end           `scripts.run_detection.main` on the synthetic CSV
+    cold_start.cli       fresh `fraudx check-config` processes (warm config cache)
+    cold_start.detect    fresh `fraudx detect --help` processes (imports the detection path)
+
+File stages scan all `--rows` rows; in-memory stages use the first
+`--stage-rows` transactions so 10M+ row runs stay within memory. Each stage
+is run `--repeat` times and the fastest run is reported.
+
+Cold-start stages count process starts, so their rows/s is starts per
+second and `--compare` holds startup time to the same regression budget as
+throughput.
+
+Typical usage:
+    python -m benchmarks.run --rows 1000000 --save benchmarks/baseline.json
+    python -m benchmarks.run --rows 1000000 --compare benchmarks/baseline.json
+"""
+import argparse
+import contextlib
+import copy
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.generator import TransactionGenerator
+
+DEFAULT_ROWS = 1_000_000
+DEFAULT_STAGE_ROWS = 200_000
+DEFAULT_TOLERANCE = 0.10
+COLD_START_RUNS = 10
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_VERSION = 1
+
+
+def _time_stage(fn: Callable[[], int], repeat: int) -> dict:
+    """Run `fn` (returning the rows it handled) `repeat` times; keep the fastest run."""
+    best, rows = None, 0
+    for _ in range(max(1, repeat)):
+        # Rejected rows are reported with print(); keep them off the terminal
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            rows = fn()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        "seconds": round(best, 6),
+        "rows": rows,
+        "rows_per_sec": round(rows / best, 1) if best > 0 else None,
+    }
+
+
+def run_benchmarks(rows: int = DEFAULT_ROWS, stage_rows: int = DEFAULT_STAGE_ROWS,
+                   repeat: int = 1, seed: int = 0, users: int = 10_000,
+                   stages=None, workdir=None, log=print) -> dict:
+    """
+    Generate data and time each stage.
+
+    Args:
+        rows (int): Rows in the synthetic CSV / NDJSON files.
+        stage_rows (int): Rows used by in-memory stages.
+        repeat (int): Runs per stage (fastest is kept).
+        seed (int): Generator seed.
+        users (int): Distinct users in the synthetic data.
+        stages (iterable, optional): Stage name prefixes to run (default: all).
+        workdir (str, optional): Directory for generated files (default: a temp dir).
+        log (callable): Progress output.
+
+    Returns:
+        dict: {"meta": {...}, "results": {stage: {"seconds", "rows", "rows_per_sec"}}}
+    """
+    # Imported here so that `--help` and the generator stay cheap to start
+    from fraud_engine.columnar import convert_to_columnar
+    from fraud_engine.detector import FraudDetector
+    from fraud_engine.pipeline import batch_pipeline, pipeline
+    from fraud_engine.schema import validate_transaction
+    from fraud_engine.exceptions import InvalidTransactionError
+    from scripts import run_detection
+    from scripts.profile_engine import ProfileEngine
+
+    def wanted(name):
+        return stages is None or any(name.startswith(s) for s in stages)
+
+    generator = TransactionGenerator(users=users, seed=seed)
+    results: Dict[str, dict] = {}
+    stage_rows = min(stage_rows, rows)
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        csv_path = os.path.join(tmp, "transactions.csv")
+        ndjson_path = os.path.join(tmp, "transactions.ndjson")
+
+        start = time.perf_counter()
+        generator.write_csv(csv_path, rows)
+        if wanted("ingest_ndjson"):
+            generator.write_ndjson(ndjson_path, rows)
+        log(f"Generated {rows} rows in {time.perf_counter() - start:.1f}s")
+
+        def record(name, fn):
+            if wanted(name):
+                results[name] = _time_stage(fn, repeat)
+                r = results[name]
+                log(f"  {name:<32} {r['seconds']:>10.3f}s {r['rows_per_sec'] or 0:>14,.0f} rows/s")
+
+        record("ingest_csv_batches",
+               lambda: sum(len(b) for b in batch_pipeline(csv_path, rejects=[])))
+        record("ingest_csv", lambda: sum(1 for _ in pipeline(csv_path, "csv", rejects=[])))
+        record("ingest_csv_strict", lambda: sum(1 for _ in pipeline(csv_path, "csv", strict=True)))
+        record("ingest_ndjson", lambda: sum(1 for _ in pipeline(ndjson_path, "ndjson")))
+        if wanted("ingest_columnar"):
+            columnar_path = os.path.join(tmp, "transactions.columnar")
+            convert_to_columnar(csv_path, columnar_path, rejects=[])
+            record("ingest_columnar",
+                   lambda: sum(len(b) for b in batch_pipeline(columnar_path, "columnar")))
+
+        # In-memory inputs for the per-stage benchmarks
+        raw = list(generator.records(stage_rows))
+        txns = list(islice(pipeline(csv_path, "csv", rejects=[]), stage_rows))
+        rules_config = run_detection.rules_config.get("rules", [])
+
+        def validate():
+            count = 0
+            for row in raw:
+                try:
+                    validate_transaction(row)
+                    count += 1
+                except InvalidTransactionError:
+                    pass
+            return count
+
+        record("validate_transaction", validate)
+
+        for i, rule_conf in enumerate(rules_config):
+            def check_rule(i=i):
+                # Fresh instances so stateful rules start empty on every repeat
+                rule = run_detection.build_rules([dict(copy.deepcopy(rules_config[i]))])[0]
+                for txn in txns:
+                    rule.check(txn)
+                return len(txns)
+            record(f"rule.{rule_conf.get('name', rule_conf['type'])}", check_rule)
+
+        def evaluate():
+            detector = FraudDetector(run_detection.build_rules(copy.deepcopy(rules_config)))
+            for txn in txns:
+                detector.evaluate(txn)
+            return len(txns)
+
+        record("detector_evaluate", evaluate)
+
+        def profile():
+            profiler = ProfileEngine()
+            for txn in txns:
+                profiler.update_profile(txn)
+            return len(txns)
+
+        record("profile_update", profile)
+
+        def end_to_end():
+            logging.disable(logging.CRITICAL)
+            try:
+                status = run_detection.main(source=csv_path,
+                                            alerts_csv=os.path.join(tmp, "alerts.csv"))
+            finally:
+                logging.disable(logging.NOTSET)
+            if status != 0:
+                # A failed run is fast; never report it as a timing
+                raise RuntimeError(f"run_detection.main exited with status {status}")
+            return rows
+
+        record("end_to_end", end_to_end)
+
+        def cold_start(*command):
+            def run():
+                for _ in range(COLD_START_RUNS):
+                    subprocess.run([sys.executable, "-m", "fraud_engine", *command], cwd=ROOT,
+                                   check=True, stdout=subprocess.DEVNULL)
+                return COLD_START_RUNS
+            return run
+
+        if wanted("cold_start"):
+            # One untimed run compiles the config cache and bytecode
+            cold_start("check-config")()
+        record("cold_start.cli", cold_start("check-config"))
+        record("cold_start.detect", cold_start("detect", "--help"))
+
+    meta = {
+        "schema_version": SCHEMA_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "rows": rows,
+        "stage_rows": stage_rows,
+        "users": users,
+        "seed": seed,
+        "repeat": repeat,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+    }
+    return {"meta": meta, "results": results}
+
+
+def compare(current: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> List[dict]:
+    """
+    Compare two result files stage by stage.
+
+    A stage regresses when its throughput fell by more than `tolerance`
+    (a fraction) relative to the baseline.
+
+    Returns:
+        List[dict]: One row per stage present in both runs, with keys
+            stage, baseline, current (rows/s), change (fraction), regression (bool).
+    """
+    rows = []
+    for stage, result in current["results"].items():
+        before = baseline.get("results", {}).get(stage)
+        if not before or not before.get("rows_per_sec") or not result.get("rows_per_sec"):
+            continue
+        change = result["rows_per_sec"] / before["rows_per_sec"] - 1.0
+        rows.append({
+            "stage": stage,
+            "baseline": before["rows_per_sec"],
+            "current": result["rows_per_sec"],
+            "change": change,
+            "regression": change < -tolerance,
+        })
+    return rows
+
+
+def _print_comparison(rows: List[dict], current: dict, baseline: dict):
+    for key in ("rows", "stage_rows", "users", "seed"):
+        if current["meta"].get(key) != baseline.get("meta", {}).get(key):
+            print(f"[WARN] Baseline was recorded with {key}={baseline.get('meta', {}).get(key)}, "
+                  f"this run used {key}={current['meta'].get(key)}")
+    print(f"{'stage':<32} {'baseline':>14} {'current':>14} {'change':>8}")
+    for r in rows:
+        mark = "  REGRESSION" if r["regression"] else ""
+        print(f"{r['stage']:<32} {r['baseline']:>14,.0f} {r['current']:>14,.0f} "
+              f"{r['change']:>+7.1%}{mark}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the fraud detection stages.")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS,
+                        help="Rows in the generated CSV / NDJSON files.")
+    parser.add_argument("--stage-rows", type=int, default=DEFAULT_STAGE_ROWS,
+                        help="Rows used by the in-memory (validate/rule/detector/profile) stages.")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per stage; the fastest is kept.")
+    parser.add_argument("--stage", action="append", dest="stages",
+                        help="Only run stages starting with this name (repeatable).")
+    parser.add_argument("--workdir", default=None, help="Directory for the generated files.")
+    parser.add_argument("--save", default=None, help="Write results to this JSON file.")
+    parser.add_argument("--compare", default=None, help="Compare against this JSON baseline.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed throughput drop before a stage counts as a regression.")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="Exit with status 1 when any stage regressed.")
+    args = parser.parse_args()
+
+    current = run_benchmarks(rows=args.rows, stage_rows=args.stage_rows, repeat=args.repeat,
+                             seed=args.seed, users=args.users, stages=args.stages,
+                             workdir=args.workdir)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+        print(f"Saved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        comparison = compare(current, baseline, args.tolerance)
+        _print_comparison(comparison, current, baseline)
+        if args.fail_on_regression and any(r["regression"] for r in comparison):
+            sys.exit(1)
@@ -0,0 +1,6 @@
+"""`python -m fraud_engine <command>`: the `fraudx` command line without installing it."""
+import sys
+
+from fraud_engine.cli import main
+
+sys.exit(main())
@@ -0,0 +1,367 @@
+"""
+alerts.py
+
+Streaming alert sinks for the Fraud Detection Engine.
+
+Alerts used to be collected in a list for the whole run and written to
+`logs/fraud_alerts.csv` at the end. A sink instead receives each alert as it
+is raised, buffers it in memory up to `buffer_size` alerts or `flush_interval`
+seconds, and appends whole batches to disk with one write call. Output files
+can be rotated by size or age, and alerts can be stored in a compact binary
+format instead of CSV.
+
+Sinks have no timer thread: the time limits (`flush_interval`,
+`rotate_interval`) are checked when an alert is written and when the owner
+calls `poll()`. A stream that can go quiet should call `poll()` periodically.
+
+Key Responsibilities:
+    - Buffer alerts and write them in batches (bounded memory).
+    - Rotate output files by size (`max_bytes`) or age (`rotate_interval`).
+    - Apply the time limits without new alerts (`AlertSink.poll`).
+    - Write CSV (`CsvAlertSink`) or length-prefixed binary records (`BinaryAlertSink`).
+    - Read binary alert files back (`read_binary_alerts`).
+    - Checkpoint the output position and roll files back to it on resume.
+
+A sink is anything with `write(seq, transaction_id, user_id, flags)`,
+`flush()` and `close()`; subclass `AlertSink` to add new destinations.
+
+Typical usage:
+    from fraud_engine.alerts import open_alert_sink
+
+    with open_alert_sink("logs/fraud_alerts.csv", max_bytes=64 * 2**20) as sink:
+        for seq, txn in enumerate(stream):
+            ...
+            sink.write(seq, txn.transaction_id, txn.user_id, flags)
+"""
+import csv
+import glob
+import io
+import json
+import os
+import re
+import struct
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from fraud_engine.exceptions import CheckpointError
+
+DEFAULT_BUFFER_SIZE = 1024
+DEFAULT_FLUSH_INTERVAL = 1.0
+CSV_FIELDS = ["transaction_id", "user_id", "flags"]
+
+BINARY_MAGIC = b"FXAL"
+BINARY_VERSION = 1
+# seq, flag mask, len(transaction_id), len(user_id)
+_RECORD = struct.Struct("<QQHH")
+_HEADER = struct.Struct("<4sHI")
+
+
+class AlertSink:
+    """
+    Buffered, rotating alert file writer. Subclasses define the encoding.
+
+    The file is opened lazily on the first alert, so a run without alerts
+    leaves existing output untouched.
+
+    Args:
+        path (str): Active output file.
+        buffer_size (int): Alerts buffered before a write.
+        flush_interval (float): Write the buffer once this many seconds have
+            passed since the last write (checked on `write` and `poll`).
+        max_bytes (int, optional): Rotate once the file reaches this size.
+        rotate_interval (float, optional): Rotate once the file is this many
+            seconds old (checked after each write to it and on `poll`).
+        append (bool): Append to an existing file instead of truncating it.
+    """
+
+    def __init__(self, path: str, buffer_size: int = DEFAULT_BUFFER_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 max_bytes: Optional[int] = None, rotate_interval: Optional[float] = None,
+                 append: bool = False):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.append = append
+        self.count = 0
+        self.rotated: List[str] = []
+        self._buffer: List[tuple] = []
+        self._file = None
+        self._opened_at = 0.0
+        self._last_flush = time.monotonic()
+        # Checkpoint state applied to the files on the next flush (see `restore_state`)
+        self._restored = None
+
+    # ---- encoding (subclasses) ------------------------------------------
+
+    def _header(self) -> bytes:
+        return b""
+
+    def _encode(self, alerts: List[tuple]) -> bytes:
+        raise NotImplementedError
+
+    # ---- file handling --------------------------------------------------
+
+    def _open(self):
+        existing = self.append and os.path.exists(self.path) and os.path.getsize(self.path) > 0
+        self._file = open(self.path, "ab" if existing else "wb")
+        if not existing:
+            self._file.write(self._header())
+        self._opened_at = time.monotonic()
+        # Only the first file of a run may continue an earlier one
+        self.append = False
+
+    def _rotated_siblings(self) -> List[str]:
+        """Rotated files of `path` on disk, in rotation order."""
+        stem, ext = os.path.splitext(self.path)
+        pattern = re.compile(re.escape(stem) + r"\.(\d{5,})" + re.escape(ext) + "$")
+        found = []
+        for name in glob.glob(glob.escape(stem) + ".*" + glob.escape(ext)):
+            m = pattern.match(name)
+            if m:
+                found.append((int(m.group(1)), name))
+        return [name for _, name in sorted(found)]
+
+    def _rotated_path(self) -> str:
+        stem, ext = os.path.splitext(self.path)
+        n = len(self.rotated) + 1
+        while os.path.exists(f"{stem}.{n:05d}{ext}"):
+            n += 1
+        return f"{stem}.{n:05d}{ext}"
+
+    def _should_rotate(self) -> bool:
+        if self.max_bytes is not None and self._file.tell() >= self.max_bytes:
+            return True
+        return (self.rotate_interval is not None
+                and time.monotonic() - self._opened_at >= self.rotate_interval)
+
+    def rotate(self):
+        """Close the active file and move it aside; the next alert starts a new file."""
+        self.flush()
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        target = self._rotated_path()
+        os.replace(self.path, target)
+        self.rotated.append(target)
+
+    # ---- public API -----------------------------------------------------
+
+    def write(self, seq: int, transaction_id: str, user_id: str, flags: Sequence[str]):
+        """Queue one alert; writes happen when the buffer is full or stale."""
+        self._add((seq, transaction_id, user_id, flags))
+
+    def _add(self, item: tuple):
+        """Queue one record for `_encode`; subclasses with other records call this."""
+        self._buffer.append(item)
+        self.count += 1
+        if (len(self._buffer) >= self.buffer_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Write buffered alerts to the active file."""
+        self._last_flush = time.monotonic()
+        if self._restored is not None:
+            self._roll_back()
+        if not self._buffer:
+            return
+        if self._file is None:
+            self._open()
+        self._file.write(self._encode(self._buffer))
+        self._file.flush()
+        self._buffer.clear()
+        if self._should_rotate():
+            self.rotate()
+
+    def poll(self):
+        """
+        Apply the time limits without a new alert: write a buffer older than
+        `flush_interval`, and rotate a file older than `rotate_interval`.
+        """
+        now = time.monotonic()
+        if self._buffer and now - self._last_flush >= self.flush_interval:
+            self.flush()
+        elif (self._file is not None and self.rotate_interval is not None
+                and now - self._opened_at >= self.rotate_interval):
+            self.rotate()
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # ---- checkpoints ----------------------------------------------------
+
+    def snapshot_state(self, incremental: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Flush and record the output position, so a resumed run can drop
+        alerts written after this point (see `restore_state`).
+
+        Returns:
+            dict: {"sink": JSON document as a uint8 array} with the active
+            file's path and size, the rotated files and the alert count.
+        """
+        self.flush()
+        if self._file is not None:
+            position = self._file.tell()
+        elif self.append and os.path.exists(self.path):
+            position = os.path.getsize(self.path)
+        else:
+            position = 0
+        state = {
+            "path": self.path,
+            "position": position,
+            "count": self.count,
+            "rotated": self.rotated,
+            "on_disk": self._rotated_siblings(),
+        }
+        return {"sink": np.frombuffer(json.dumps(state).encode("utf-8"), dtype=np.uint8)}
+
+    def restore_state(self, state: Dict[str, np.ndarray], incremental: bool = False):
+        """
+        Roll the output back to a `snapshot_state` position.
+
+        Files rotated after the checkpoint are removed, except the one that
+        was active at the checkpoint, which becomes the active file again;
+        the active file is truncated to the recorded size and appended to.
+        The files are changed on the next `flush` (or `close`), so restoring
+        a chain of checkpoints only rolls back to the last one.
+        """
+        state = json.loads(bytes(state["sink"]).decode("utf-8"))
+        if state["path"] != self.path:
+            raise CheckpointError(
+                f"Checkpoint alerts were written to {state['path']}, not {self.path}")
+        if self._file is not None or self._buffer:
+            raise CheckpointError("Alert sinks must be restored before alerts are written")
+        self.count = state["count"]
+        self.rotated = list(state["rotated"])
+        self._restored = state
+
+    def _roll_back(self):
+        position = self._restored["position"]
+        known = set(self._restored["on_disk"])
+        self._restored = None
+        later = [name for name in self._rotated_siblings() if name not in known]
+        if later and position:
+            os.replace(later.pop(0), self.path)
+        for name in later:
+            os.remove(name)
+        if position:
+            with open(self.path, "r+b") as f:
+                f.truncate(position)
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+        self.append = bool(position)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class CsvAlertSink(AlertSink):
+    """Alerts as `transaction_id,user_id,flags` CSV (flags joined with ';')."""
+
+    def _header(self) -> bytes:
+        return (",".join(CSV_FIELDS) + "\r\n").encode("utf-8")
+
+    def _encode(self, alerts: List[tuple]) -> bytes:
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerows((txn_id, user_id, ";".join(flags)) for _, txn_id, user_id, flags in alerts)
+        return out.getvalue().encode("utf-8")
+
+
+class BinaryAlertSink(AlertSink):
+    """
+    Compact binary alerts.
+
+    File layout: a header (magic b"FXAL", format version, length of the
+    JSON rule-name table, the table itself), then one record per alert:
+    seq (u64), flags bitmask over the rule table (u64), the lengths of the
+    UTF-8 transaction and user ids (u16 each), and the two ids.
+
+    Args:
+        path (str): Active output file.
+        rule_names (Sequence[str]): All rule names that can appear in flags (at most 64).
+        **options: See `AlertSink`.
+    """
+
+    def __init__(self, path: str, rule_names: Sequence[str], **options):
+        if len(rule_names) > 64:
+            raise ValueError("BinaryAlertSink supports at most 64 rule names.")
+        super().__init__(path, **options)
+        self.rule_names = list(rule_names)
+        self._bits = {name: 1 << i for i, name in enumerate(self.rule_names)}
+
+    def _header(self) -> bytes:
+        table = json.dumps(self.rule_names).encode("utf-8")
+        return _HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(table)) + table
+
+    def _encode(self, alerts: List[tuple]) -> bytes:
+        parts = []
+        bits = self._bits
+        for seq, txn_id, user_id, flags in alerts:
+            mask = 0
+            for name in flags:
+                mask |= bits[name]
+            tid = str(txn_id).encode("utf-8")
+            uid = str(user_id).encode("utf-8")
+            parts.append(_RECORD.pack(seq, mask, len(tid), len(uid)))
+            parts.append(tid)
+            parts.append(uid)
+        return b"".join(parts)
+
+
+def read_binary_alerts(path: str) -> Iterator[Tuple[int, str, str, List[str]]]:
+    """
+    Read a `BinaryAlertSink` file.
+
+    Yields:
+        tuple: (seq, transaction_id, user_id, flags)
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, table_len = _HEADER.unpack_from(data, 0)
+    if magic != BINARY_MAGIC:
+        raise ValueError(f"{path} is not a binary alert file")
+    if version != BINARY_VERSION:
+        raise ValueError(f"{path} has alert format version {version}, expected {BINARY_VERSION}")
+    pos = _HEADER.size
+    names = json.loads(data[pos:pos + table_len].decode("utf-8"))
+    pos += table_len
+    while pos < len(data):
+        seq, mask, tid_len, uid_len = _RECORD.unpack_from(data, pos)
+        pos += _RECORD.size
+        txn_id = data[pos:pos + tid_len].decode("utf-8")
+        pos += tid_len
+        user_id = data[pos:pos + uid_len].decode("utf-8")
+        pos += uid_len
+        yield seq, txn_id, user_id, [n for i, n in enumerate(names) if mask >> i & 1]
+
+
+def open_alert_sink(path: str, fmt: str = "csv", rule_names: Optional[Sequence[str]] = None,
+                    **options) -> AlertSink:
+    """
+    Create an alert sink.
+
+    Args:
+        path (str): Output file.
+        fmt (str): 'csv' or 'binary'.
+        rule_names (Sequence[str], optional): Required for 'binary'.
+        **options: See `AlertSink`.
+    """
+    if fmt == "csv":
+        return CsvAlertSink(path, **options)
+    if fmt == "binary":
+        if rule_names is None:
+            raise ValueError("The binary alert format needs the list of rule names.")
+        return BinaryAlertSink(path, rule_names, **options)
+    raise ValueError("Unsupported alert format. Use 'csv' or 'binary'.")
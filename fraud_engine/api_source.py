@@ -0,0 +1,199 @@
+"""
+api_source.py
+
+Asynchronous HTTP transaction source for the Fraud Detection Engine.
+
+A single blocking `requests.get(...).json()` holds the whole response in memory,
+opens a fresh connection per call and cannot overlap fetching with detection.
+`AsyncApiSource` fetches with aiohttp over a pooled, keep-alive connector,
+requests several pages concurrently, decodes response bodies incrementally with
+`JsonRecordDecoder`, and hands records to the consumer through a bounded queue
+so a slow detector applies backpressure to the fetchers.
+
+Key Responsibilities:
+    - Reuse a bounded pool of HTTP connections.
+    - Fetch pages concurrently with a configurable number of requests in flight.
+    - Decode JSON array / NDJSON bodies incrementally as bytes arrive.
+    - Deliver records in page order through a bounded queue (backpressure).
+    - Offer both an async interface and a plain iterator for `pipeline`.
+
+Typical usage:
+    from fraud_engine.api_source import AsyncApiSource
+
+    source = AsyncApiSource("http://host/transactions", page_param="page", page_size=500)
+    for txn in source:
+        detector.evaluate(txn)
+"""
+import asyncio
+import codecs
+import concurrent.futures
+import threading
+from collections import deque
+from typing import AsyncIterator, Iterator, List, Optional
+
+import aiohttp  # type: ignore
+
+from fraud_engine.exceptions import InvalidTransactionError
+from fraud_engine.jsonstream import JsonRecordDecoder
+from fraud_engine.schema import validate_transaction
+
+DEFAULT_CHUNK_BYTES = 64 * 1024
+_END = object()
+
+
+class AsyncApiSource:
+    """
+    Paginated, concurrent, backpressured JSON API reader.
+
+    When `page_param` is None the URL is fetched once and its body is streamed.
+    Otherwise pages `start_page, start_page + 1, ...` are requested (up to
+    `max_in_flight` at once) until a page returns fewer than `page_size` records.
+
+    Args:
+        url (str): Endpoint returning a JSON array or NDJSON of transactions.
+        page_param (str, optional): Query parameter carrying the page number.
+        page_size_param (str, optional): Query parameter carrying the page size.
+        page_size (int): Records per page; a shorter page ends pagination.
+        start_page (int): First page number.
+        max_in_flight (int): Maximum concurrent page requests.
+        pool_size (int): Maximum open connections in the pool.
+        queue_size (int): Maximum decoded chunks waiting for the consumer.
+        timeout (float): Total timeout per request, in seconds.
+        headers (dict, optional): Extra request headers.
+    """
+
+    def __init__(self, url: str, page_param: Optional[str] = None,
+                 page_size_param: Optional[str] = None, page_size: int = 1000,
+                 start_page: int = 1, max_in_flight: int = 4, pool_size: int = 8,
+                 queue_size: int = 16, timeout: float = 30.0, headers: Optional[dict] = None):
+        if max_in_flight < 1 or queue_size < 1:
+            raise ValueError("max_in_flight and queue_size must be at least 1")
+        self.url = url
+        self.page_param = page_param
+        self.page_size_param = page_size_param
+        self.page_size = page_size
+        self.start_page = start_page
+        self.max_in_flight = max_in_flight
+        self.pool_size = pool_size
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.headers = headers or {}
+
+    # ---- fetching --------------------------------------------------------
+
+    async def _stream_body(self, session, params=None) -> AsyncIterator[List[dict]]:
+        """Yield lists of records as the response body is decoded."""
+        async with session.get(self.url, params=params) as resp:
+            resp.raise_for_status()
+            text = codecs.getincrementaldecoder("utf-8")()
+            decoder = JsonRecordDecoder()
+            async for data in resp.content.iter_chunked(DEFAULT_CHUNK_BYTES):
+                records = decoder.feed(text.decode(data))
+                if records:
+                    yield records
+            records = decoder.feed(text.decode(b"", final=True)) + decoder.close()
+            if records:
+                yield records
+
+    async def _fetch_page(self, session, page: int) -> List[dict]:
+        params = {self.page_param: page}
+        if self.page_size_param:
+            params[self.page_size_param] = self.page_size
+        records = []
+        async for chunk in self._stream_body(session, params):
+            records.extend(chunk)
+        return records
+
+    async def _paged_chunks(self, session) -> AsyncIterator[List[dict]]:
+        pending = deque()
+        next_page = self.start_page
+        exhausted = False
+        try:
+            while pending or not exhausted:
+                while not exhausted and len(pending) < self.max_in_flight:
+                    pending.append(asyncio.ensure_future(self._fetch_page(session, next_page)))
+                    next_page += 1
+                records = await pending.popleft()
+                if len(records) < self.page_size:
+                    exhausted = True
+                    for task in pending:
+                        task.cancel()
+                    pending.clear()
+                if records:
+                    yield records
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def chunks(self) -> AsyncIterator[List[dict]]:
+        """Yield raw records in lists, in page order, over a pooled session."""
+        connector = aiohttp.TCPConnector(limit=self.pool_size)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers=self.headers) as session:
+            if self.page_param is None:
+                async for records in self._stream_body(session):
+                    yield records
+            else:
+                async for records in self._paged_chunks(session):
+                    yield records
+
+    async def stream(self) -> AsyncIterator:
+        """Yield validated transactions, skipping invalid records."""
+        async for records in self.chunks():
+            for row in records:
+                try:
+                    yield validate_transaction(row)
+                except InvalidTransactionError as e:
+                    print(f"Skipping invalid transaction: {e}")
+
+    # ---- synchronous bridge ---------------------------------------------
+
+    async def _produce(self, queue: asyncio.Queue):
+        chunks = self.chunks()
+        try:
+            async for records in chunks:
+                await queue.put(records)
+            await queue.put(_END)
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            # Close the session now rather than leaving it to the GC
+            await chunks.aclose()
+
+    def __iter__(self) -> Iterator:
+        """
+        Iterate validated transactions from synchronous code.
+
+        Fetching runs on a background event loop; decoded chunks wait in a
+        queue of at most `queue_size` entries, so fetching pauses whenever
+        the consumer falls behind.
+        """
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+
+        async def make_queue():
+            return asyncio.Queue(maxsize=self.queue_size)
+
+        queue = asyncio.run_coroutine_threadsafe(make_queue(), loop).result()
+        producer = asyncio.run_coroutine_threadsafe(self._produce(queue), loop)
+        try:
+            while True:
+                item = asyncio.run_coroutine_threadsafe(queue.get(), loop).result()
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                for row in item:
+                    try:
+                        yield validate_transaction(row)
+                    except InvalidTransactionError as e:
+                        print(f"Skipping invalid transaction: {e}")
+        finally:
+            producer.cancel()
+            concurrent.futures.wait([producer])
+            asyncio.run_coroutine_threadsafe(loop.shutdown_asyncgens(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
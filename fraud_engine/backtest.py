@@ -0,0 +1,199 @@
+"""
+backtest.py
+
+Single-pass backtesting of many rule configurations.
+
+Tuning `max_txns`, `window_minutes` or `threshold` by re-running detection
+once per configuration parses and validates the same data every time.
+`Backtest` expands a parameter grid over the base rule configuration, builds
+each distinct rule variant once, and evaluates all of them side by side on
+one stream of columnar batches. Window rules over the same key share one
+`SlidingWindowAggregator`, so a single per-user history answers every
+`max_txns` / `window_minutes` combination.
+
+Key Responsibilities:
+    - Expand a parameter grid into named rule configurations.
+    - Deduplicate rule variants across configurations and share window state.
+    - Count alerts per configuration, hits per rule variant, and the pairwise
+      overlap of the configurations' alert sets.
+
+Typical usage:
+    from fraud_engine.backtest import Backtest
+
+    grid = {"RapidTransactionsRule": {"max_txns": [3, 5], "window_minutes": [1, 5]}}
+    backtest = Backtest(rules_config["rules"], grid, RULE_CLASSES)
+    result = backtest.run(batch_pipeline("data/transactions.csv"))
+    for row in result.rows():
+        print(row)
+"""
+import itertools
+import logging
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from fraud_engine.batch import TransactionBatch
+
+logger = logging.getLogger("fraud_engine")
+
+
+def _rule_key(conf: dict) -> str:
+    """How a grid refers to a configured rule: its name, else its type."""
+    return conf.get("name") or conf["type"]
+
+
+def expand_grid(base_rules: List[dict], grid: Dict[str, Dict[str, list]]) -> List[dict]:
+    """
+    Expand a parameter grid over a base rule configuration.
+
+    Args:
+        base_rules (List[dict]): Rule configs as in rules.config.yaml.
+        grid (dict): Rule name or type -> parameter -> list of values.
+
+    Returns:
+        List[dict]: One {"label", "params", "rules"} entry per combination,
+        in grid order; `params` maps "Rule.param" to its value.
+    """
+    keys = {_rule_key(conf) for conf in base_rules}
+    axes = []
+    for rule_key, params in grid.items():
+        if rule_key not in keys:
+            raise ValueError(f"Grid refers to unknown rule {rule_key!r}")
+        for param, values in params.items():
+            values = values if isinstance(values, (list, tuple)) else [values]
+            if not values:
+                raise ValueError(f"No values given for {rule_key}.{param}")
+            axes.append((rule_key, param, list(values)))
+
+    configs = []
+    for combo in itertools.product(*(values for _, _, values in axes)):
+        params = {f"{rule_key}.{param}": value
+                  for (rule_key, param, _), value in zip(axes, combo)}
+        rules = []
+        for conf in base_rules:
+            conf = dict(conf)
+            for (rule_key, param, _), value in zip(axes, combo):
+                if _rule_key(conf) == rule_key:
+                    conf[param] = value
+            rules.append(conf)
+        label = ",".join(f"{k}={v}" for k, v in params.items()) or "base"
+        configs.append({"label": label, "params": params, "rules": rules})
+    return configs
+
+
+class BacktestResult:
+    """
+    Outcome of a backtest.
+
+    Attributes:
+        labels (List[str]): Configuration labels.
+        params (List[dict]): Grid parameters of each configuration.
+        transactions (int): Transactions evaluated.
+        alerts (np.ndarray): Flagged transactions per configuration.
+        overlap (np.ndarray): overlap[i, j] = transactions flagged by both
+            configuration i and j (the diagonal equals `alerts`).
+        rule_hits (List[Dict[str, int]]): Hits per rule in each configuration.
+    """
+
+    def __init__(self, labels, params, transactions, alerts, overlap, rule_hits):
+        self.labels = labels
+        self.params = params
+        self.transactions = transactions
+        self.alerts = alerts
+        self.overlap = overlap
+        self.rule_hits = rule_hits
+
+    def jaccard(self) -> np.ndarray:
+        """Pairwise |A and B| / |A or B| of the configurations' alert sets."""
+        union = self.alerts[:, None] + self.alerts[None, :] - self.overlap
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(union > 0, self.overlap / np.maximum(union, 1), 1.0)
+
+    def rows(self) -> List[dict]:
+        """One summary row per configuration."""
+        out = []
+        for i, label in enumerate(self.labels):
+            row = {"config": label, "alerts": int(self.alerts[i]),
+                   "alert_rate": self.alerts[i] / self.transactions if self.transactions else 0.0}
+            row.update(self.params[i])
+            row.update({f"hits.{name}": n for name, n in self.rule_hits[i].items()})
+            out.append(row)
+        return out
+
+
+class Backtest:
+    """
+    Evaluate a grid of rule configurations in one pass over the data.
+
+    Args:
+        base_rules (List[dict]): Base rule configs (rules.config.yaml `rules`).
+        grid (dict): Rule name or type -> parameter -> values (see `expand_grid`).
+        rule_classes (Dict[str, type]): Rule type name -> class.
+    """
+
+    def __init__(self, base_rules: List[dict], grid: Dict[str, Dict[str, list]],
+                 rule_classes: Dict[str, type]):
+        self.configs = expand_grid(base_rules, grid)
+        self.variants = []      # distinct rule instances, shared between configs
+        self.members: List[List[int]] = []   # variant indices of each config
+        self.variant_names: List[str] = []
+        aggregators = {}
+        index = {}
+        for config in self.configs:
+            members = []
+            for conf in config["rules"]:
+                params = {k: v for k, v in conf.items() if k != "type"}
+                key = (conf["type"], tuple(sorted((k, repr(v)) for k, v in params.items())))
+                if key not in index:
+                    cls = rule_classes.get(conf["type"])
+                    if cls is None:
+                        logger.warning(f"Unknown rule type: {conf['type']}, skipping...")
+                        index[key] = None
+                        continue
+                    if getattr(cls, "windowed", False):
+                        # One history per key answers every window / threshold variant
+                        params.setdefault("aggregators", aggregators)
+                    try:
+                        rule = cls(**params)
+                    except TypeError as e:
+                        raise ValueError(f"Invalid parameters for {conf['type']}: {e}") from e
+                    index[key] = len(self.variants)
+                    self.variants.append(rule)
+                    self.variant_names.append(_rule_key(conf))
+                if index[key] is not None:
+                    members.append(index[key])
+            self.members.append(members)
+
+    def run(self, batches: Iterable[TransactionBatch]) -> BacktestResult:
+        """Evaluate every configuration over a stream of batches."""
+        n_configs = len(self.configs)
+        alerts = np.zeros(n_configs, dtype=np.int64)
+        overlap = np.zeros((n_configs, n_configs), dtype=np.int64)
+        variant_hits = np.zeros(len(self.variants), dtype=np.int64)
+        transactions = 0
+
+        for batch in batches:
+            n = len(batch)
+            if n == 0:
+                continue
+            transactions += n
+            hits = np.empty((len(self.variants), n), dtype=bool)
+            for j, rule in enumerate(self.variants):
+                hits[j] = rule.check_batch(batch)
+            variant_hits += hits.sum(axis=1)
+
+            flagged = np.zeros((n_configs, n), dtype=bool)
+            for c, members in enumerate(self.members):
+                if members:
+                    np.any(hits[members], axis=0, out=flagged[c])
+            alerts += flagged.sum(axis=1)
+            # Pairwise intersections; float32 is exact for counts below 2**24
+            for lo in range(0, n, 1 << 22):
+                block = flagged[:, lo:lo + (1 << 22)].astype(np.float32)
+                overlap += np.rint(block @ block.T).astype(np.int64)
+
+        rule_hits = [{self.variant_names[j]: int(variant_hits[j]) for j in members}
+                     for members in self.members]
+        return BacktestResult([c["label"] for c in self.configs],
+                              [c["params"] for c in self.configs],
+                              transactions, alerts, overlap, rule_hits)
@@ -0,0 +1,182 @@
+"""
+batch.py
+
+Columnar transaction batches for high-throughput evaluation.
+
+Evaluating one `Transaction` at a time spends most of its time in interpreter
+overhead rather than in the rules themselves. A `TransactionBatch` stores a
+block of transactions column by column in NumPy arrays so that rules can
+evaluate the whole block with vectorized operations.
+
+Key Responsibilities:
+    - Hold columnar transaction data (amount, int64 epoch timestamps, interned user ids).
+    - Intern user ids into stable integer codes shared across batches.
+    - Convert between `datetime` timestamps and int64 epoch microseconds.
+    - Rebuild per-row `Transaction` objects for rules without a batch implementation.
+
+Typical usage:
+    from fraud_engine.batch import TransactionBatch
+
+    batch = TransactionBatch.from_transactions(transactions)
+    flags = detector.evaluate_batch(batch)
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from fraud_engine.schema import Transaction
+
+EPOCH = datetime(1970, 1, 1)
+_ONE_US = timedelta(microseconds=1)
+
+
+def to_epoch_us(ts: datetime) -> int:
+    """
+    Convert a datetime to int64 epoch microseconds.
+    Naive datetimes are treated as UTC.
+    """
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return (ts - EPOCH) // _ONE_US
+
+
+def from_epoch_us(us) -> datetime:
+    """Convert int64 epoch microseconds back to a naive UTC datetime."""
+    return EPOCH + timedelta(microseconds=int(us))
+
+
+# Range of epoch microseconds a `datetime` can hold. NumPy parses years 0
+# and above 9999; such values must be rejected before they reach `rows()`.
+MIN_EPOCH_US = to_epoch_us(datetime.min)
+MAX_EPOCH_US = to_epoch_us(datetime.max)
+
+
+class UserInterner:
+    """
+    Maps user id strings to dense integer codes.
+    Codes are stable for the lifetime of the interner, so batches built
+    with the same interner can be compared code-for-code.
+    """
+
+    def __init__(self):
+        self._codes: Dict[str, int] = {}
+        self.user_ids: List[str] = []
+
+    def intern(self, user_id: str) -> int:
+        code = self._codes.get(user_id)
+        if code is None:
+            code = len(self.user_ids)
+            self._codes[user_id] = code
+            self.user_ids.append(user_id)
+        return code
+
+    def intern_many(self, user_ids: Iterable[str]) -> np.ndarray:
+        intern = self.intern
+        return np.fromiter((intern(u) for u in user_ids), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+
+class TransactionBatch:
+    """
+    A block of transactions stored column by column.
+
+    Attributes:
+        transaction_id (np.ndarray): Transaction ids (object array of str).
+        user_code (np.ndarray): int64 interned user codes.
+        user_ids (Sequence[str]): Lookup table from user code to user id.
+        amount (np.ndarray): float64 amounts.
+        timestamp (np.ndarray): int64 epoch microseconds.
+        location, payment_method, merchant_id (np.ndarray, optional): object arrays.
+    """
+
+    def __init__(self, transaction_id, user_code, user_ids, amount, timestamp,
+                 location=None, payment_method=None, merchant_id=None):
+        self.transaction_id = np.asarray(transaction_id, dtype=object)
+        self.user_code = np.asarray(user_code, dtype=np.int64)
+        self.user_ids = user_ids
+        self.amount = np.asarray(amount, dtype=np.float64)
+        self.timestamp = np.asarray(timestamp, dtype=np.int64)
+        self.location = location
+        self.payment_method = payment_method
+        self.merchant_id = merchant_id
+
+        n = len(self.transaction_id)
+        if not (len(self.user_code) == len(self.amount) == len(self.timestamp) == n):
+            raise ValueError("All batch columns must have the same length.")
+
+    def __len__(self):
+        return len(self.transaction_id)
+
+    @classmethod
+    def from_transactions(cls, transactions: Iterable[Transaction],
+                          interner: Optional[UserInterner] = None) -> "TransactionBatch":
+        """Build a batch from validated `Transaction` objects."""
+        txns = list(transactions)
+        interner = interner if interner is not None else UserInterner()
+        return cls(
+            transaction_id=[t.transaction_id for t in txns],
+            user_code=interner.intern_many(t.user_id for t in txns),
+            user_ids=interner.user_ids,
+            amount=[t.amount for t in txns],
+            timestamp=[to_epoch_us(t.timestamp) for t in txns],
+            location=np.array([t.location for t in txns], dtype=object),
+            payment_method=np.array([t.payment_method for t in txns], dtype=object),
+            merchant_id=np.array([t.merchant_id for t in txns], dtype=object),
+        )
+
+    def user_id(self, i: int) -> str:
+        return self.user_ids[self.user_code[i]]
+
+    def take(self, rows) -> "TransactionBatch":
+        """New batch with the selected rows (boolean mask or index array)."""
+        def pick(column):
+            return None if column is None else column[rows]
+
+        return TransactionBatch(
+            transaction_id=self.transaction_id[rows],
+            user_code=self.user_code[rows],
+            user_ids=self.user_ids,
+            amount=self.amount[rows],
+            timestamp=self.timestamp[rows],
+            location=pick(self.location),
+            payment_method=pick(self.payment_method),
+            merchant_id=pick(self.merchant_id),
+        )
+
+    def rows(self) -> Iterator[Transaction]:
+        """
+        Yield each row as a `Transaction`.
+        Used by rules that have no vectorized implementation.
+
+        Columns are converted to Python objects in bulk first. Building the
+        model from already-typed values is cheaper in Pydantic's compiled
+        validator than `model_construct`, which is only needed when optional
+        columns (location, payment_method) are absent.
+        """
+        n = len(self)
+        user_ids = self.user_ids
+        users = [user_ids[c] for c in self.user_code.tolist()]
+        amounts = self.amount.tolist()
+        timestamps = self.timestamp.astype("datetime64[us]").tolist()
+        ids = list(self.transaction_id)
+        none = [None] * n
+        locations = none if self.location is None else list(self.location)
+        methods = none if self.payment_method is None else list(self.payment_method)
+        merchants = none if self.merchant_id is None else list(self.merchant_id)
+
+        build = Transaction
+        if self.location is None or self.payment_method is None:
+            build = Transaction.model_construct
+        for i in range(n):
+            yield build(
+                transaction_id=ids[i],
+                user_id=users[i],
+                amount=amounts[i],
+                timestamp=timestamps[i],
+                location=locations[i],
+                payment_method=methods[i],
+                merchant_id=merchants[i],
+            )
@@ -0,0 +1,236 @@
+"""
+checkpoint.py
+
+Snapshot and fast restore of detector, profile, run summary and output state.
+
+Rule state (`RapidTransactionsRule`) and user profiles (`ProfileEngine`) live
+only in memory, so every restart used to replay history to warm them up.
+`Checkpointer` writes the state of every stateful component to a compact,
+versioned binary snapshot (an uncompressed NumPy `.npz` archive of flat
+arrays plus a JSON header) together with the stream offset reached, and
+restores it with bulk array loads.
+
+A stateful component is any object with:
+    snapshot_state(incremental: bool) -> Dict[str, np.ndarray]
+    restore_state(state: Dict[str, np.ndarray], incremental: bool) -> None
+
+Key Responsibilities:
+    - Write full and incremental (changed keys only) checkpoints atomically.
+    - Record the stream offset and a format version in every checkpoint.
+    - Restore the newest full checkpoint plus the incrementals built on it.
+    - Prune checkpoints superseded by a newer full checkpoint.
+    - Checkpoint a numbered transaction stream every N records (`checkpointed`).
+
+Typical usage:
+    from fraud_engine.checkpoint import Checkpointer
+
+    checkpointer = Checkpointer("state/", {"profiles": profiler, "rule0": rapid_rule})
+    offset = checkpointer.restore()          # 0 when no checkpoint exists
+    ...
+    checkpointer.save(offset=processed, incremental=True)
+"""
+import glob
+import json
+import os
+import re
+from typing import Dict, Iterable, Iterator, Tuple
+
+import numpy as np
+
+from fraud_engine.exceptions import CheckpointError
+
+FORMAT_NAME = "fraudx-checkpoint"
+FORMAT_VERSION = 2
+_META_KEY = "__meta__"
+_SEP = "::"
+_FILE_RE = re.compile(r"checkpoint-(\d{8})-(full|incr)\.npz$")
+
+
+def stateful_components(detector=None, profiler=None, summary=None, sink=None) -> Dict[str, object]:
+    """
+    Collect the stateful parts of a run, with stable names.
+    Rules are named by position and rule name, so a changed rule list is detected.
+    Pass the run's `DetectionSummary` so its totals and counters resume too,
+    and its alert sink so alerts written after the checkpoint are dropped.
+    """
+    components = {}
+    if sink is not None:
+        components["alerts"] = sink
+    if summary is not None:
+        components["summary"] = summary
+    if profiler is not None:
+        components["profiles"] = profiler
+    if detector is not None:
+        for i, rule in enumerate(detector.rules):
+            if hasattr(rule, "snapshot_state"):
+                components[f"rule{i}.{rule.name}"] = rule
+    return components
+
+
+class Checkpointer:
+    """
+    Writes and restores checkpoints for a fixed set of named components.
+
+    Args:
+        directory (str): Directory holding checkpoint files.
+        components (dict): Name -> stateful component.
+    """
+
+    def __init__(self, directory: str, components: Dict[str, object]):
+        self.directory = directory
+        self.components = components
+        os.makedirs(directory, exist_ok=True)
+        self._sequence, self._base = self._latest_sequence()
+
+    def _files(self):
+        found = []
+        for path in glob.glob(os.path.join(self.directory, "checkpoint-*.npz")):
+            m = _FILE_RE.search(os.path.basename(path))
+            if m:
+                found.append((int(m.group(1)), m.group(2), path))
+        return sorted(found)
+
+    def _latest_sequence(self):
+        files = self._files()
+        fulls = [seq for seq, kind, _ in files if kind == "full"]
+        return (files[-1][0] if files else 0), (fulls[-1] if fulls else None)
+
+    def save(self, offset: int, incremental: bool = False) -> str:
+        """
+        Write a checkpoint of every component.
+
+        Args:
+            offset (int): Number of stream records fully processed.
+            incremental (bool): Only write keys changed since the previous
+                checkpoint. Falls back to a full checkpoint if none exists yet.
+
+        Returns:
+            str: Path of the checkpoint file.
+        """
+        if incremental and self._base is None:
+            incremental = False
+        kind = "incr" if incremental else "full"
+        self._sequence += 1
+        sequence = self._sequence
+
+        arrays = {}
+        for name, component in self.components.items():
+            for key, value in component.snapshot_state(incremental).items():
+                arrays[f"{name}{_SEP}{key}"] = value
+
+        meta = {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "kind": kind,
+            "sequence": sequence,
+            "base": self._base if incremental else sequence,
+            "offset": int(offset),
+            "components": sorted(self.components),
+        }
+        arrays[_META_KEY] = np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8)
+
+        path = os.path.join(self.directory, f"checkpoint-{sequence:08d}-{kind}.npz")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+        if not incremental:
+            self._base = sequence
+        return path
+
+    @staticmethod
+    def read(path: str):
+        """Read one checkpoint file, returning (meta, {component: {key: array}})."""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(bytes(data[_META_KEY]).decode("utf-8"))
+                if meta.get("format") != FORMAT_NAME:
+                    raise CheckpointError(f"{path} is not a {FORMAT_NAME} file")
+                if meta.get("version") != FORMAT_VERSION:
+                    raise CheckpointError(
+                        f"{path} has format version {meta.get('version')}, expected {FORMAT_VERSION}")
+                states: Dict[str, Dict[str, np.ndarray]] = {}
+                for key in data.files:
+                    if key == _META_KEY:
+                        continue
+                    name, array_name = key.split(_SEP, 1)
+                    states.setdefault(name, {})[array_name] = data[key]
+        except (OSError, ValueError, KeyError) as e:
+            raise CheckpointError(f"Cannot read checkpoint {path}: {e}")
+        return meta, states
+
+    def restore(self) -> int:
+        """
+        Restore the newest full checkpoint and the incrementals built on it.
+
+        Returns:
+            int: Stream offset to resume from (0 if there is no checkpoint).
+        """
+        files = self._files()
+        fulls = [(seq, path) for seq, kind, path in files if kind == "full"]
+        if not fulls:
+            return 0
+        base_seq, base_path = fulls[-1]
+        chain = [(base_path, False)] + [
+            (path, True) for seq, kind, path in files if kind == "incr" and seq > base_seq]
+
+        offset = 0
+        for path, incremental in chain:
+            meta, states = self.read(path)
+            if incremental and meta["base"] != base_seq:
+                continue
+            if meta["components"] != sorted(self.components):
+                raise CheckpointError(
+                    f"Checkpoint components {meta['components']} do not match "
+                    f"{sorted(self.components)}; was the rule configuration changed?")
+            for name, component in self.components.items():
+                component.restore_state(states.get(name, {}), incremental)
+            offset = meta["offset"]
+
+        self._sequence, self._base = self._latest_sequence()
+        return offset
+
+    def prune(self) -> int:
+        """Delete checkpoints older than the newest full checkpoint."""
+        if self._base is None:
+            return 0
+        removed = 0
+        for seq, _, path in self._files():
+            if seq < self._base:
+                os.remove(path)
+                removed += 1
+        return removed
+
+
+def checkpointed(numbered_txns: Iterable[Tuple[int, object]], checkpointer: Checkpointer,
+                 every: int, full_every: int = 10) -> Iterator[Tuple[int, object]]:
+    """
+    Pass (seq, txn) pairs through, checkpointing every `every` records.
+
+    A record is fully processed once the next one is requested, so the
+    checkpoint taken before yielding `seq` has offset `seq`. Every
+    `full_every`-th checkpoint is a full one (older files are then pruned);
+    the rest are incremental. A final checkpoint is written when the stream ends.
+    """
+    taken = 0
+    start = next_offset = None
+
+    def save(offset):
+        nonlocal taken
+        full = taken % full_every == 0
+        checkpointer.save(offset, incremental=not full)
+        if full:
+            checkpointer.prune()
+        taken += 1
+
+    for seq, txn in numbered_txns:
+        if start is None:
+            start = seq
+        elif every and (seq - start) % every == 0:
+            save(seq)
+        yield seq, txn
+        next_offset = seq + 1
+
+    if next_offset is not None:
+        save(next_offset)
@@ -0,0 +1,295 @@
+"""
+columnar.py
+
+Memory-mapped, on-disk columnar store for transactions.
+
+Replaying the same history (backtests, benchmarks, reruns) used to re-parse
+CSV or JSON text and timestamp strings on every run. A columnar store is
+converted once and then read back without parsing: each column is a raw
+little-endian array that is memory-mapped with `np.memmap`, so a replay is
+bounded by disk bandwidth (or the page cache) rather than by the parser.
+
+Directory layout:
+    meta.json                  format name/version, row count, column dtypes
+    amount.f8                  float64 amounts
+    timestamp.i8               int64 epoch microseconds (UTC)
+    transaction_id.offsets.i8  int64 byte offsets (rows + 1) into ...
+    transaction_id.bytes       concatenated UTF-8 transaction ids
+    <column>.codes.i4          int32 dictionary codes (-1 = missing) for
+                               user_id, location, payment_method, merchant_id
+    <column>.dict.json         code -> string dictionary for that column
+
+`meta.json` is written last, so an interrupted conversion is never mistaken
+for a complete store.
+
+Key Responsibilities:
+    - Convert CSV / JSON / NDJSON sources into a columnar store (`convert_to_columnar`).
+    - Append `TransactionBatch` objects with dictionary encoding (`ColumnarWriter`).
+    - Read the store back as zero-copy `TransactionBatch` slices (`ColumnarStore`).
+
+Typical usage:
+    from fraud_engine.columnar import convert_to_columnar, ColumnarStore
+
+    convert_to_columnar("data/sample_transaction.csv", "data/sample.columnar")
+    for batch in ColumnarStore("data/sample.columnar").batches():
+        masks = detector.evaluate_batch(batch)
+"""
+import json
+import os
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+from fraud_engine.batch import TransactionBatch, UserInterner
+from fraud_engine.exceptions import InvalidTransactionError
+
+FORMAT_NAME = "fraudx-columnar"
+FORMAT_VERSION = 1
+DEFAULT_BATCH_SIZE = 65536
+DICT_COLUMNS = ("user_id", "location", "payment_method", "merchant_id")
+_META = "meta.json"
+
+
+class ColumnarWriter:
+    """
+    Appends transaction batches to a new columnar store.
+
+    Args:
+        directory (str): Output directory (created; must not hold a store already).
+    """
+
+    def __init__(self, directory: str):
+        if os.path.exists(os.path.join(directory, _META)):
+            raise FileExistsError(f"{directory} already contains a columnar store")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.rows = 0
+        self._has_merchant = False
+        self._dicts = {name: {} for name in DICT_COLUMNS}
+        self._id_bytes = 0
+        # Store codes of the batches' user id table (usually one shared interner)
+        self._user_table = None
+        self._user_table_codes = np.zeros(0, dtype="<i4")
+
+        def open_column(name):
+            return open(os.path.join(directory, name), "wb")
+
+        self._amount = open_column("amount.f8")
+        self._timestamp = open_column("timestamp.i8")
+        self._id_offsets = open_column("transaction_id.offsets.i8")
+        self._id_data = open_column("transaction_id.bytes")
+        self._codes = {name: open_column(f"{name}.codes.i4") for name in DICT_COLUMNS}
+        self._id_offsets.write(np.zeros(1, dtype="<i8").tobytes())
+
+    def _encode(self, name: str, values) -> np.ndarray:
+        mapping = self._dicts[name]
+        codes = np.empty(len(values), dtype="<i4")
+        for i, v in enumerate(values):
+            if v is None:
+                codes[i] = -1
+                continue
+            code = mapping.get(v)
+            if code is None:
+                code = mapping[v] = len(mapping)
+            codes[i] = code
+        return codes
+
+    def append(self, batch: TransactionBatch):
+        """Append one batch (rows keep their order)."""
+        n = len(batch)
+        if not n:
+            return
+        self._amount.write(np.asarray(batch.amount, dtype="<f8").tobytes())
+        self._timestamp.write(np.asarray(batch.timestamp, dtype="<i8").tobytes())
+
+        encoded = [str(t).encode("utf-8") for t in batch.transaction_id]
+        lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=n)
+        offsets = self._id_bytes + np.cumsum(lengths)
+        self._id_data.write(b"".join(encoded))
+        self._id_offsets.write(offsets.astype("<i8").tobytes())
+        self._id_bytes = int(offsets[-1])
+
+        # User ids arrive interned: encode only the part of the interner's
+        # table not seen before, then translate codes with one gather
+        if batch.user_ids is not self._user_table:
+            self._user_table = batch.user_ids
+            self._user_table_codes = np.zeros(0, dtype="<i4")
+        known = len(self._user_table_codes)
+        if len(batch.user_ids) > known:
+            self._user_table_codes = np.concatenate(
+                [self._user_table_codes, self._encode("user_id", batch.user_ids[known:])])
+        self._codes["user_id"].write(self._user_table_codes[batch.user_code].tobytes())
+        for name in ("location", "payment_method", "merchant_id"):
+            values = getattr(batch, name)
+            if values is None:
+                values = [None] * n
+            elif name == "merchant_id":
+                self._has_merchant = True
+            self._codes[name].write(self._encode(name, values).tobytes())
+        self.rows += n
+
+    def _close_files(self):
+        for f in (self._amount, self._timestamp, self._id_offsets, self._id_data,
+                  *self._codes.values()):
+            f.close()
+
+    def close(self):
+        """Flush all columns and write the dictionaries and `meta.json`."""
+        self._close_files()
+        for name, mapping in self._dicts.items():
+            with open(os.path.join(self.directory, f"{name}.dict.json"), "w", encoding="utf-8") as f:
+                json.dump(list(mapping), f)
+        meta = {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "rows": self.rows,
+            "has_merchant_id": self._has_merchant,
+            "columns": {
+                "amount": "<f8",
+                "timestamp": "<i8",
+                "transaction_id": "offsets <i8 + utf-8 bytes",
+                **{name: "dictionary <i4" for name in DICT_COLUMNS},
+            },
+        }
+        tmp_path = os.path.join(self.directory, _META + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.directory, _META))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Leave no meta.json behind: the partial store stays unreadable
+            self._close_files()
+
+
+class ColumnarStore:
+    """
+    Read-only, memory-mapped view of a columnar store.
+
+    Args:
+        directory (str): Store directory written by `ColumnarWriter`.
+
+    Raises:
+        InvalidTransactionError: If the directory is not a complete store of
+            a supported version.
+    """
+
+    def __init__(self, directory: str):
+        meta_path = os.path.join(directory, _META)
+        if not os.path.exists(meta_path):
+            raise InvalidTransactionError(f"{directory} is not a (complete) columnar store")
+        with open(meta_path, "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != FORMAT_NAME or self.meta.get("version") != FORMAT_VERSION:
+            raise InvalidTransactionError(
+                f"{directory} has format {self.meta.get('format')} v{self.meta.get('version')}, "
+                f"expected {FORMAT_NAME} v{FORMAT_VERSION}")
+        self.directory = directory
+        self.rows = self.meta["rows"]
+
+        self.amount = self._map("amount.f8", "<f8", self.rows)
+        self.timestamp = self._map("timestamp.i8", "<i8", self.rows)
+        self.id_offsets = self._map("transaction_id.offsets.i8", "<i8", self.rows + 1)
+        self.id_data = self._map("transaction_id.bytes", np.uint8, int(self.id_offsets[-1]))
+        self.codes = {name: self._map(f"{name}.codes.i4", "<i4", self.rows) for name in DICT_COLUMNS}
+        self.dicts = {}
+        self._tables = {}
+        for name in DICT_COLUMNS:
+            with open(os.path.join(directory, f"{name}.dict.json"), "r", encoding="utf-8") as f:
+                self.dicts[name] = json.load(f)
+            # Trailing None so that code -1 (missing) decodes to None
+            self._tables[name] = np.array(self.dicts[name] + [None], dtype=object)
+
+    def _map(self, name: str, dtype, length: int) -> np.ndarray:
+        if length == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(os.path.join(self.directory, name), dtype=dtype, mode="r", shape=(length,))
+
+    def __len__(self):
+        return self.rows
+
+    def transaction_ids(self, start: int, stop: int) -> List[str]:
+        offsets = self.id_offsets[start:stop + 1]
+        base = int(offsets[0])
+        raw = self.id_data[base:int(offsets[-1])].tobytes()
+        bounds = (offsets - base).tolist()
+        text = raw.decode("utf-8")
+        if len(text) == len(raw):
+            # ASCII: byte offsets are character offsets
+            return [text[a:b] for a, b in zip(bounds, bounds[1:])]
+        return [raw[a:b].decode("utf-8") for a, b in zip(bounds, bounds[1:])]
+
+    def _decoded(self, name: str, start: int, stop: int) -> np.ndarray:
+        return self._tables[name][self.codes[name][start:stop]]
+
+    def batches(self, batch_size: int = DEFAULT_BATCH_SIZE,
+                interner: Optional[UserInterner] = None) -> Iterator[TransactionBatch]:
+        """
+        Yield the store as `TransactionBatch` slices.
+
+        Amounts and timestamps are views of the memory-mapped files. User codes
+        are the store's own dictionary codes, unless an `interner` is given,
+        in which case they are translated into it.
+        """
+        user_ids = self.dicts["user_id"]
+        remap = None
+        if interner is not None:
+            remap = interner.intern_many(user_ids)
+            user_ids = interner.user_ids
+
+        for start in range(0, self.rows, batch_size):
+            stop = min(start + batch_size, self.rows)
+            codes = self.codes["user_id"][start:stop]
+            yield TransactionBatch(
+                transaction_id=self.transaction_ids(start, stop),
+                user_code=remap[codes] if remap is not None else codes,
+                user_ids=user_ids,
+                amount=self.amount[start:stop],
+                timestamp=self.timestamp[start:stop],
+                location=self._decoded("location", start, stop),
+                payment_method=self._decoded("payment_method", start, stop),
+                merchant_id=(self._decoded("merchant_id", start, stop)
+                             if self.meta.get("has_merchant_id") else None),
+            )
+
+
+def convert_to_columnar(source: str, directory: str, source_type: str = "csv",
+                        batch_size: int = DEFAULT_BATCH_SIZE,
+                        rejects: Optional[list] = None) -> int:
+    """
+    Convert a CSV, JSON or NDJSON transaction file into a columnar store.
+
+    Args:
+        source (str): Input file.
+        directory (str): Output store directory.
+        source_type (str): 'csv', 'json' or 'ndjson'.
+        batch_size (int): Rows converted per step.
+        rejects (list, optional): Invalid CSV rows, as `RejectedRow`.
+
+    Returns:
+        int: Rows written.
+    """
+    from fraud_engine.pipeline import batch_pipeline, pipeline
+
+    with ColumnarWriter(directory) as writer:
+        if source_type == "csv":
+            collected = rejects if rejects is not None else []
+            for batch in batch_pipeline(source, "csv", batch_size=batch_size, rejects=collected):
+                writer.append(batch)
+        elif source_type in ("json", "ndjson"):
+            interner = UserInterner()
+            pending = []
+            for txn in pipeline(source, source_type):
+                pending.append(txn)
+                if len(pending) == batch_size:
+                    writer.append(TransactionBatch.from_transactions(pending, interner))
+                    pending = []
+            writer.append(TransactionBatch.from_transactions(pending, interner))
+        else:
+            raise ValueError("Unsupported source_type for conversion. Use 'csv', 'json' or 'ndjson'.")
+    return writer.rows
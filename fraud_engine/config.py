@@ -0,0 +1,193 @@
+"""
+config.py
+
+Loading and validation of the YAML configuration files, with a compiled cache.
+
+Parsing YAML (and importing PyYAML) and checking every rule entry against
+its class costs more than a short detection job's own startup. A file is
+parsed and validated once; the result is stored as JSON in a cache
+directory, keyed by a hash of the file's bytes, the installed package
+version and what validation depends on (for rules, the registered rule
+types and where they are defined), and later loads of the same content
+read the JSON back without importing PyYAML or any rule module. Editing
+the file, upgrading the package or registering other rules changes the
+key, so a stale entry is never used.
+
+The cache lives in `$FRAUDX_CACHE_DIR`, else `$XDG_CACHE_HOME/fraudx`, else
+`~/.cache/fraudx`. Setting `FRAUDX_CACHE_DIR=off` disables it. An
+unwritable cache directory only costs the parse; it is never an error.
+
+Key Responsibilities:
+    - Validate rules.config.yaml: known rule types, parameters their
+      constructors accept, and a well-formed `plan:` section.
+    - Cache parsed and validated configurations (`load_yaml`, `load_rules_config`).
+
+Typical usage:
+    from fraud_engine.config import load_rules_config
+
+    rules_config = load_rules_config("config/rules.config.yaml")
+    rules = build_rules(copy.deepcopy(rules_config["rules"]))
+"""
+import hashlib
+import json
+import logging
+import os
+from typing import Callable, Optional
+
+from fraud_engine.exceptions import ConfigError
+
+logger = logging.getLogger("fraud_engine")
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config")
+DEFAULT_RULES_CONFIG = os.path.join(CONFIG_DIR, "rules.config.yaml")
+DEFAULT_LOGGING_CONFIG = os.path.join(CONFIG_DIR, "logging.yaml")
+
+# Bump when validation or the cached layout changes, to ignore older entries
+CACHE_VERSION = 1
+CACHE_ENV = "FRAUDX_CACHE_DIR"
+
+
+def default_cache_dir() -> Optional[str]:
+    """The configured cache directory, or None when caching is disabled."""
+    configured = os.environ.get(CACHE_ENV)
+    if configured:
+        return None if configured.lower() == "off" else configured
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "fraudx")
+
+
+def package_version() -> str:
+    """Installed version of the package ("source" when running from a checkout)."""
+    from importlib.metadata import PackageNotFoundError, version
+    try:
+        return version("fraudx")
+    except PackageNotFoundError:
+        return "source"
+
+
+def _read_cache(path: str) -> Optional[dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(path: str, config: dict):
+    try:
+        text = json.dumps(config)
+        if json.loads(text) != config:
+            return      # not representable in JSON (tuples, non-string keys, dates)
+        import tempfile
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except (OSError, TypeError, ValueError) as e:
+        logger.debug(f"Not caching compiled config {path}: {e}")
+
+
+def load_yaml(path: str, validate: Optional[Callable[[dict], None]] = None,
+              kind: str = "yaml", cache_dir: Optional[str] = None, cache_key: str = "") -> dict:
+    """
+    Parse and validate a YAML mapping, reusing the cached result for unchanged content.
+
+    Args:
+        path (str): YAML file.
+        validate (callable, optional): Raises `ConfigError` for an invalid
+            configuration; only called when the file is parsed.
+        kind (str): Cache namespace, so one file validated two ways is cached twice.
+        cache_dir (str, optional): Cache directory (default: `default_cache_dir()`).
+        cache_key (str): Fingerprint of anything else `validate` depends on;
+            a cached result is only reused for the same key.
+
+    Returns:
+        dict: The configuration (a new object on every call).
+
+    Raises:
+        ConfigError: The file is not valid YAML, not a mapping, or fails `validate`.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    cache_dir = cache_dir if cache_dir is not None else default_cache_dir()
+    cache_file = None
+    if cache_dir:
+        header = f"{kind}:{CACHE_VERSION}:{package_version()}:{cache_key}:"
+        digest = hashlib.sha256(header.encode() + data).hexdigest()
+        cache_file = os.path.join(cache_dir, f"{kind}-{digest[:32]}.json")
+        cached = _read_cache(cache_file)
+        if cached is not None:
+            return cached
+
+    import yaml
+    try:
+        config = yaml.safe_load(data)
+    except yaml.YAMLError as e:
+        raise ConfigError(f"{path}: invalid YAML: {e}") from e
+    if config is None:
+        config = {}
+    if not isinstance(config, dict):
+        raise ConfigError(f"{path}: expected a mapping at the top level")
+    if validate is not None:
+        try:
+            validate(config)
+        except ConfigError as e:
+            raise ConfigError(f"{path}: {e}") from e
+    if cache_file:
+        _write_cache(cache_file, config)
+    return config
+
+
+def validate_rules_config(config: dict, registry=None):
+    """
+    Check a rules configuration without building any rule.
+
+    Every entry under `rules:` must name a registered type and pass
+    parameters its constructor accepts; `plan:` must use a known mode and
+    `RulePlan` options.
+
+    Raises:
+        ConfigError: Describing the first problem found.
+    """
+    import inspect
+    from fraud_engine.plan import PLAN_MODES, RulePlan
+    if registry is None:
+        from fraud_engine.rules.registry import RULES as registry
+
+    rules = config.get("rules", [])
+    if not isinstance(rules, list):
+        raise ConfigError("'rules' must be a list")
+    for i, conf in enumerate(rules):
+        if not isinstance(conf, dict) or not isinstance(conf.get("type"), str):
+            raise ConfigError(f"rules[{i}]: expected a mapping with a 'type'")
+        params = {k: v for k, v in conf.items() if k != "type"}
+        cls = registry.get(conf["type"])
+        if cls is None:
+            raise ConfigError(f"rules[{i}]: unknown rule type {conf['type']!r}")
+        try:
+            inspect.signature(cls).bind(**params)
+        except TypeError as e:
+            raise ConfigError(f"rules[{i}] ({conf['type']}): {e}") from e
+
+    plan = config.get("plan")
+    if plan is not None:
+        if not isinstance(plan, dict):
+            raise ConfigError("'plan' must be a mapping")
+        options = dict(plan)
+        mode = options.pop("mode", "all")
+        if mode not in PLAN_MODES:
+            raise ConfigError(f"plan: unknown mode {mode!r}, use one of {PLAN_MODES}")
+        try:
+            inspect.signature(RulePlan).bind([], **options)
+        except TypeError as e:
+            raise ConfigError(f"plan: {e}") from e
+
+
+def load_rules_config(path: str, registry=None, cache_dir: Optional[str] = None) -> dict:
+    """Load and validate rules.config.yaml (cached per rule registry; see `load_yaml`)."""
+    if registry is None:
+        from fraud_engine.rules.registry import RULES as registry
+    return load_yaml(path, validate=lambda config: validate_rules_config(config, registry),
+                     kind="rules", cache_dir=cache_dir, cache_key=registry.fingerprint())
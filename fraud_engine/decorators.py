@@ -7,9 +7,9 @@ def log_execution(func):
     """Logs start, end, and duration of a function"""
     def wrapper(*args, **kwargs):
         logger.info(f"Running {func.__name__}...")
-        start = time.time()
+        start = time.perf_counter()
         result = func(*args, **kwargs)
-        end = time.time()
+        end = time.perf_counter()
         logger.info(f"{func.__name__} finished in {end - start:.4f}s")
         return result
     return wrapper
@@ -0,0 +1,310 @@
+"""
+dedup.py
+
+Bounded-memory replay deduplication on `transaction_id`.
+
+Upstream retries and source re-reads deliver the same transaction several
+times; every copy would count again in window rules and user profiles.
+Remembering every id ever seen grows without bound, so `Deduplicator` keeps
+a time-partitioned set of Bloom filters instead: event time is cut into
+`slices` equal parts of the retention horizon, each with its own filter,
+and the oldest part is dropped as event time moves past the horizon. A
+transaction is a duplicate if any live filter may contain its id.
+
+Guarantees:
+    - No false negatives within the horizon: a re-delivered id whose event
+      time is within `horizon_seconds` of the newest event time is dropped.
+    - False positives (a new id dropped as a duplicate) at about `error_rate`
+      per transaction while each slice holds at most its share of `capacity`
+      ids; beyond that, extra filters are added to the slice (counted in
+      `overflows`) and the rate grows slowly with their number.
+    - Memory: about (slices + 1) filters of `capacity / slices` ids each.
+
+Key Responsibilities:
+    - Drop repeated transaction ids per transaction (`filter`) or per columnar
+      batch (`filter_batch`, vectorized).
+    - Size filters from a false-positive rate and an expected id count.
+    - Count checked and dropped transactions (`collect()` for `MetricsRegistry`).
+
+Typical usage:
+    from fraud_engine.dedup import Deduplicator
+
+    dedup = Deduplicator(horizon_seconds=24 * 3600, error_rate=1e-4, capacity=5_000_000)
+    for txn in pipeline("data/transactions.csv", dedup=dedup):
+        detector.evaluate(txn)
+"""
+import hashlib
+import math
+from collections import OrderedDict
+from typing import Iterable, Iterator, List
+
+import numpy as np
+
+from fraud_engine.batch import TransactionBatch, to_epoch_us
+from fraud_engine.metrics import NAMESPACE, MetricFamily
+
+DEFAULT_HORIZON = 24 * 3600.0
+DEFAULT_ERROR_RATE = 1e-4
+DEFAULT_CAPACITY = 1_000_000
+DEFAULT_SLICES = 8
+_MASK64 = (1 << 64) - 1
+_HASH_DTYPE = np.dtype("<u8")
+
+
+def _hash_pair(key: str):
+    """Two 64-bit hashes of a key for double hashing (the second one odd)."""
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+def _hash_pairs(keys: Iterable[str]) -> np.ndarray:
+    """`_hash_pair` for many keys, as an (n, 2) uint64 array."""
+    blake2b = hashlib.blake2b
+    raw = b"".join(blake2b(k.encode("utf-8"), digest_size=16).digest() for k in keys)
+    pairs = np.frombuffer(raw, dtype=_HASH_DTYPE).reshape(-1, 2).copy()
+    pairs[:, 1] |= np.uint64(1)
+    return pairs
+
+
+def _bloom_shape(capacity: int, error_rate: float):
+    """Bit count (a multiple of 64) and hash count for a Bloom filter."""
+    if not 0 < error_rate < 1:
+        raise ValueError("error_rate must be between 0 and 1")
+    size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    size = max(64, (size + 63) // 64 * 64)
+    return size, max(1, round(size / capacity * math.log(2)))
+
+
+def _positions(h1: int, h2: int, size: int, hashes: int) -> List[int]:
+    """Bit positions of a key by double hashing (shared by filters of one shape)."""
+    return [((h1 + i * h2) & _MASK64) % size for i in range(hashes)]
+
+
+def _positions_many(pairs: np.ndarray, size: int, hashes: int) -> np.ndarray:
+    """`_positions` for an (n, 2) array of hash pairs, as an (n, hashes) array."""
+    steps = np.arange(hashes, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        return ((pairs[:, :1] + steps * pairs[:, 1:]) % np.uint64(size)).astype(np.int64)
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter addressed by bit positions (see `_positions`),
+    so that a key is hashed once for all filters of the same shape.
+
+    Args:
+        capacity (int): Ids it is sized for.
+        error_rate (float): False-positive rate at `capacity` ids.
+    """
+
+    __slots__ = ("bits", "view", "size", "hashes", "count", "capacity")
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(int(capacity), 1)
+        self.size, self.hashes = _bloom_shape(self.capacity, error_rate)
+        self.bits = bytearray(self.size // 8)
+        self.view = np.frombuffer(self.bits, dtype=np.uint8)
+        self.count = 0
+
+    def contains(self, positions: List[int]) -> bool:
+        bits = self.bits
+        for pos in positions:
+            if not bits[pos >> 3] >> (pos & 7) & 1:
+                return False
+        return True
+
+    def add(self, positions: List[int]):
+        bits = self.bits
+        for pos in positions:
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def contains_many(self, positions: np.ndarray) -> np.ndarray:
+        return (self.view[positions >> 3] >> (positions & 7) & 1).all(axis=1)
+
+    def add_many(self, positions: np.ndarray):
+        positions = positions.ravel()
+        np.bitwise_or.at(self.view, positions >> 3,
+                         np.left_shift(1, positions & 7).astype(np.uint8))
+        self.count += len(positions) // self.hashes
+
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+
+class Deduplicator:
+    """
+    Drops transactions whose id was already seen within a retention horizon.
+
+    Args:
+        horizon_seconds (float): Event-time span over which repeats are caught.
+        error_rate (float): Target false-positive rate per transaction.
+        capacity (int): Expected distinct ids per horizon.
+        slices (int): Filters the horizon is split into; more slices free
+            memory in smaller steps but cost more lookups.
+        key (str): Transaction field identifying a transaction.
+    """
+
+    def __init__(self, horizon_seconds: float = DEFAULT_HORIZON,
+                 error_rate: float = DEFAULT_ERROR_RATE, capacity: int = DEFAULT_CAPACITY,
+                 slices: int = DEFAULT_SLICES, key: str = "transaction_id"):
+        if horizon_seconds <= 0:
+            raise ValueError("horizon_seconds must be positive")
+        if slices < 1:
+            raise ValueError("slices must be at least 1")
+        self.horizon_us = int(horizon_seconds * 1_000_000)
+        self.slices = slices
+        self.slice_us = max(1, -(-self.horizon_us // slices))
+        self.key = key
+        # A lookup probes every live filter: split the error budget between them
+        self.filter_error_rate = error_rate / (slices + 1)
+        self.filter_capacity = max(1, -(-capacity // slices))
+        self._size, self._hashes = _bloom_shape(self.filter_capacity, self.filter_error_rate)
+        self._buckets: "OrderedDict[int, List[BloomFilter]]" = OrderedDict()
+        self._newest = None
+
+        self.checked = 0
+        self.dropped = 0
+        self.expired_slices = 0
+        self.overflows = 0
+
+    # ---- internals -------------------------------------------------------
+
+    def _filters(self):
+        for filters in self._buckets.values():
+            yield from filters
+
+    def _bucket_filters(self, bucket: int) -> List[BloomFilter]:
+        """Filters of an event-time bucket (ids older than the horizon go to the oldest one)."""
+        bucket = max(bucket, self._newest - self.slices)
+        filters = self._buckets.get(bucket)
+        if filters is None:
+            filters = self._buckets[bucket] = [self._new_filter()]
+            if len(self._buckets) > 1 and bucket < next(reversed(self._buckets)):
+                self._buckets = OrderedDict(sorted(self._buckets.items()))
+        return filters
+
+    def _new_filter(self) -> BloomFilter:
+        return BloomFilter(self.filter_capacity, self.filter_error_rate)
+
+    def _writable(self, filters: List[BloomFilter]) -> BloomFilter:
+        last = filters[-1]
+        if last.count >= last.capacity:
+            self.overflows += 1
+            last = self._new_filter()
+            filters.append(last)
+        return last
+
+    def _advance(self, bucket: int):
+        """Move event time forward to `bucket` and drop slices past the horizon."""
+        if self._newest is None or bucket > self._newest:
+            self._newest = bucket
+        buckets = self._buckets
+        cutoff = self._newest - self.slices
+        while buckets and next(iter(buckets)) < cutoff:
+            buckets.popitem(last=False)
+            self.expired_slices += 1
+
+    # ---- public API ------------------------------------------------------
+
+    def is_duplicate(self, txn) -> bool:
+        """Check one transaction and remember its id; True if it is a repeat."""
+        self.checked += 1
+        positions = _positions(*_hash_pair(str(getattr(txn, self.key))), self._size, self._hashes)
+        for filters in self._buckets.values():
+            for f in filters:
+                if f.contains(positions):
+                    self.dropped += 1
+                    return True
+        bucket = to_epoch_us(txn.timestamp) // self.slice_us
+        self._advance(bucket)
+        self._writable(self._bucket_filters(bucket)).add(positions)
+        return False
+
+    def filter(self, transactions: Iterable) -> Iterator:
+        """Yield the transactions that are not repeats, in order."""
+        is_duplicate = self.is_duplicate
+        for txn in transactions:
+            if not is_duplicate(txn):
+                yield txn
+
+    def filter_batch(self, batch: TransactionBatch) -> TransactionBatch:
+        """
+        Drop repeated ids from a columnar batch (earlier batches and earlier
+        rows of the same batch both count).
+        """
+        n = len(batch)
+        if n == 0:
+            return batch
+        if self.key != "transaction_id":
+            raise ValueError("Batch deduplication is keyed on transaction_id only.")
+        self.checked += n
+        pairs = _hash_pairs(str(t) for t in batch.transaction_id.tolist())
+        positions = _positions_many(pairs, self._size, self._hashes)
+
+        # Rotate where a row-by-row pass would: split the batch wherever event
+        # time enters a newer bucket, and filter the segments in order
+        buckets = batch.timestamp // self.slice_us
+        newest = np.maximum.accumulate(buckets)
+        if self._newest is not None:
+            newest = np.maximum(newest, self._newest)
+        bounds = [0, *(np.flatnonzero(np.diff(newest)) + 1).tolist(), n]
+        keep = np.empty(n, dtype=bool)
+        for lo, hi in zip(bounds, bounds[1:]):
+            keep[lo:hi] = self._filter_segment(pairs[lo:hi], positions[lo:hi],
+                                               buckets[lo:hi], int(newest[lo]))
+
+        dropped = n - int(keep.sum())
+        self.dropped += dropped
+        return batch if dropped == 0 else batch.take(keep)
+
+    def _filter_segment(self, pairs, positions, buckets, newest: int) -> np.ndarray:
+        """Check and insert rows that share one newest bucket; returns the keep mask."""
+        seen = np.zeros(len(pairs), dtype=bool)
+        for f in self._filters():
+            seen |= f.contains_many(positions)
+        # Repeats inside the segment: keep the first copy of each 128-bit hash
+        _, first = np.unique(pairs.view([("a", _HASH_DTYPE), ("b", _HASH_DTYPE)]).ravel(),
+                             return_index=True)
+        keep = np.zeros(len(pairs), dtype=bool)
+        keep[first] = True
+        keep &= ~seen
+
+        self._advance(newest)
+        buckets = np.maximum(buckets, self._newest - self.slices)
+        for bucket in np.unique(buckets[keep]).tolist():
+            rows = positions[keep & (buckets == bucket)]
+            filters = self._bucket_filters(bucket)
+            while len(rows):
+                f = self._writable(filters)
+                room = f.capacity - f.count
+                f.add_many(rows[:room])
+                rows = rows[room:]
+        return keep
+
+    def filter_batches(self, batches: Iterable[TransactionBatch]) -> Iterator[TransactionBatch]:
+        """`filter_batch` over a stream of batches; batches left empty are skipped."""
+        for batch in batches:
+            batch = self.filter_batch(batch)
+            if len(batch):
+                yield batch
+
+    def memory_usage(self) -> int:
+        """Bytes held by the live filters."""
+        return sum(f.nbytes() for f in self._filters())
+
+    def collect(self) -> List[MetricFamily]:
+        return [
+            MetricFamily(f"{NAMESPACE}_dedup_checked_total", "counter",
+                         "Transactions checked for repeated ids.", [({}, self.checked)]),
+            MetricFamily(f"{NAMESPACE}_dedup_dropped_total", "counter",
+                         "Transactions dropped as repeats.", [({}, self.dropped)]),
+            MetricFamily(f"{NAMESPACE}_dedup_expired_slices_total", "counter",
+                         "Filter slices dropped past the retention horizon.",
+                         [({}, self.expired_slices)]),
+            MetricFamily(f"{NAMESPACE}_dedup_overflows_total", "counter",
+                         "Extra filters added to slices holding more ids than planned.",
+                         [({}, self.overflows)]),
+            MetricFamily(f"{NAMESPACE}_dedup_filter_bytes", "gauge",
+                         "Memory held by the live dedup filters.", [({}, self.memory_usage())]),
+        ]
@@ -11,19 +11,41 @@ Typical usage:
         print(flagged_txn, triggered_rules)
 """
 # fraud_engine/detector.py
+import logging
+from time import perf_counter_ns
 from typing import List, Dict
+import numpy as np
 from fraud_engine.schema import Transaction
+from fraud_engine.batch import TransactionBatch
 from fraud_engine.rules.base import Rule
 
+MAX_BATCH_RULES = 64
+
+logger = logging.getLogger("fraud_engine")
+
 
 class FraudDetector:
     """
     Central fraud detection engine.
     Loads and executes rules against incoming transactions.
+
+    Args:
+        rules (List[Rule]): Rules to run, in flag order.
+        plan (RulePlan, optional): Compiled plan built from the same rules;
+            when given, `evaluate` runs the plan (fused thresholds, adaptive
+            ordering, optional first-match) instead of every rule in order.
+        metrics (DetectorMetrics, optional): Per-rule counters and sampled
+            latency histograms. Without it the evaluation loop is untouched.
     """
 
-    def __init__(self, rules: List[Rule]):
+    def __init__(self, rules: List[Rule], plan=None, metrics=None):
+        if plan is not None and plan.rules is not rules:
+            raise ValueError("RulePlan must be built from the detector's rules.")
         self.rules = rules
+        self.plan = plan
+        self.metrics = metrics
+        if plan is not None and metrics is not None:
+            plan.metrics = metrics
 
     def evaluate(self, transaction: Transaction) -> Dict:
         """
@@ -36,18 +58,101 @@ class FraudDetector:
                 "is_fraud": bool
             }
         """
-        flags = []
-
-        for rule in self.rules:
-            try:
-                if rule.check(transaction):
-                    flags.append(rule.__class__.__name__)
-            except Exception as e:
-                # optional: log instead of breaking
-                print(f"[ERROR] Rule {rule.__class__.__name__} failed: {e}")
+        if self.metrics is not None:
+            flags = self._evaluate_measured(transaction)
+        elif self.plan is not None:
+            flags = self.plan.run(transaction)
+        else:
+            flags = []
+            for rule in self.rules:
+                try:
+                    if rule.check(transaction):
+                        flags.append(rule.name)
+                except Exception as e:
+                    logger.error(f"Rule {rule.name} failed: {e}")
 
         return {
             "transaction_id": transaction.transaction_id,
             "flags": flags,
             "is_fraud": len(flags) > 0
         }
+
+    def _evaluate_measured(self, transaction: Transaction) -> List[str]:
+        """`evaluate` with per-rule counters; times rules on sampled evaluations."""
+        m = self.metrics
+        sample = m.tick()
+        start = perf_counter_ns() if sample else 0
+
+        if self.plan is not None:
+            flags = self.plan.run(transaction, sample=sample)
+        else:
+            flags = []
+            for i, rule in enumerate(self.rules):
+                m.calls[i] += 1
+                try:
+                    if sample:
+                        t0 = perf_counter_ns()
+                        hit = rule.check(transaction)
+                        m.latency[i].observe(perf_counter_ns() - t0)
+                    else:
+                        hit = rule.check(transaction)
+                except Exception as e:
+                    m.errors[i] += 1
+                    logger.error(f"Rule {rule.name} failed: {e}")
+                    continue
+                if hit:
+                    m.hits[i] += 1
+                    flags.append(rule.name)
+
+        if flags:
+            m.flagged += 1
+        if sample:
+            m.evaluate_latency.observe(perf_counter_ns() - start)
+        return flags
+
+    def _flags_dtype(self):
+        n = len(self.rules)
+        if n > MAX_BATCH_RULES:
+            raise ValueError(f"evaluate_batch supports at most {MAX_BATCH_RULES} rules, got {n}.")
+        for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+            if n <= np.dtype(dtype).itemsize * 8:
+                return dtype
+
+    def evaluate_batch(self, batch: TransactionBatch) -> np.ndarray:
+        """
+        Run all rules on a columnar batch.
+
+        Bit `i` of each mask is set when `self.rules[i]` flagged that row.
+        Rules without a vectorized `check_batch` fall back to the per-row path.
+
+        Returns:
+            np.ndarray: Unsigned integer flag masks, one per row.
+        """
+        dtype = self._flags_dtype()
+        masks = np.zeros(len(batch), dtype=dtype)
+
+        m = self.metrics
+        for bit, rule in enumerate(self.rules):
+            try:
+                hits = np.asarray(rule.check_batch(batch), dtype=bool)
+            except Exception as e:
+                if m is not None:
+                    m.errors[bit] += 1
+                logger.error(f"Rule {rule.name} failed: {e}")
+                continue
+            masks[hits] |= dtype(1 << bit)
+            if m is not None:
+                m.calls[bit] += len(batch)
+                m.hits[bit] += int(hits.sum())
+
+        if m is not None:
+            m.evaluations += len(batch)
+            m.flagged += int(np.count_nonzero(masks))
+
+        return masks
+
+    def flag_names(self, mask) -> List[str]:
+        """Decode a flags mask from `evaluate_batch` into rule names."""
+        mask = int(mask)
+        return [rule.name
+                for bit, rule in enumerate(self.rules) if mask >> bit & 1]
@@ -0,0 +1,266 @@
+"""
+event_time.py
+
+Event-time ordering for out-of-order transaction streams.
+
+Stateful rules assume each key's timestamps never go backwards, but upstream
+feeds deliver transactions late by seconds to minutes. `EventTimeBuffer`
+sits between the pipeline and the detector: it holds arriving transactions
+in a reorder buffer (a heap on event time) and releases them in event-time
+order once the watermark passes them. The watermark of a partition is the
+newest event time seen there minus the allowed lateness; a transaction
+older than what has already been released is too late to be placed in
+order and goes to a side output instead.
+
+Bounds:
+    - Memory: at most `max_buffered` transactions per partition; on overflow
+      the oldest ones are released early (the watermark jumps forward).
+    - Latency: with `max_delay_seconds`, no transaction waits longer than that
+      in processing time (checked on every push and on `poll()`).
+
+Partitions (`partitions > 1`, hashed on `partition_by` like the sharded
+runner) each keep their own buffer and watermark, so one key's late data
+does not hold back the others. Order is then only guaranteed within a
+partition, which is all that per-key rules need as long as the partition
+key is the key of every stateful rule.
+
+Key Responsibilities:
+    - Reorder transactions by event time behind a per-partition watermark.
+    - Route too-late transactions to a side output (`on_late`, `CsvLateEventSink`).
+    - Enforce explicit memory and added-latency bounds.
+    - Count late and force-released events (`collect()` for `MetricsRegistry`).
+
+Typical usage:
+    from fraud_engine.event_time import EventTimeBuffer
+
+    buffer = EventTimeBuffer(allowed_lateness_seconds=120, max_delay_seconds=5)
+    for seq, txn in buffer.reorder(enumerate(pipeline(source))):
+        detector.evaluate(txn)
+"""
+import csv
+import heapq
+import io
+import itertools
+import time
+from collections import deque
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from fraud_engine.alerts import AlertSink
+from fraud_engine.batch import from_epoch_us, to_epoch_us
+from fraud_engine.metrics import NAMESPACE, MetricFamily
+from fraud_engine.parallel import shard_for
+
+DEFAULT_ALLOWED_LATENESS = 60.0
+DEFAULT_MAX_BUFFERED = 100_000
+_NEVER = np.iinfo(np.int64).min
+
+
+class _Partition:
+    """Reorder heap and watermark state of one partition."""
+
+    __slots__ = ("heap", "arrivals", "max_time", "released")
+
+    def __init__(self):
+        self.heap: list = []            # (event time, arrival no., seq, txn)
+        self.arrivals: deque = deque()  # (arrival clock, event time) for the delay bound
+        self.max_time = _NEVER          # newest event time seen
+        self.released = _NEVER          # everything up to here has been emitted
+
+
+class EventTimeBuffer:
+    """
+    Bounded reorder buffer with watermarks and a late-event side output.
+
+    Args:
+        allowed_lateness_seconds (float): How far behind the newest event time
+            of its partition a transaction may arrive and still be ordered.
+        max_buffered (int): Transactions held per partition before the oldest
+            are released early.
+        max_delay_seconds (float, optional): Longest a transaction may wait in
+            the buffer (processing time).
+        partitions (int): Independent buffers, chosen by hashing `partition_by`.
+        partition_by (str): Transaction field used to pick the partition.
+        on_late (callable, optional): Called as on_late(seq, txn, watermark_us)
+            for each too-late transaction; they are dropped otherwise (and counted).
+        clock (callable): Processing-time clock in seconds (for tests).
+    """
+
+    def __init__(self, allowed_lateness_seconds: float = DEFAULT_ALLOWED_LATENESS,
+                 max_buffered: int = DEFAULT_MAX_BUFFERED,
+                 max_delay_seconds: Optional[float] = None,
+                 partitions: int = 1, partition_by: str = "user_id",
+                 on_late: Optional[Callable] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if max_buffered < 1:
+            raise ValueError("max_buffered must be at least 1")
+        if partitions < 1:
+            raise ValueError("partitions must be at least 1")
+        self.lateness_us = int(allowed_lateness_seconds * 1_000_000)
+        self.max_buffered = max_buffered
+        self.max_delay = max_delay_seconds
+        self.partition_by = partition_by
+        self.on_late = on_late
+        self.clock = clock
+        self._partitions = [_Partition() for _ in range(partitions)]
+        self._arrival = itertools.count()
+
+        self.buffered = 0
+        self.peak_buffered = 0
+        self.released_count = 0
+        self.late_count = 0
+        self.forced_count = 0
+
+    # ---- internals -------------------------------------------------------
+
+    def _partition(self, txn) -> _Partition:
+        if len(self._partitions) == 1:
+            return self._partitions[0]
+        return self._partitions[shard_for(str(getattr(txn, self.partition_by)), len(self._partitions))]
+
+    def _release(self, p: _Partition, upto: int, out: list, forced: bool = False):
+        """Emit every buffered transaction with event time <= `upto`, in order."""
+        if upto > p.released:
+            p.released = upto
+        heap = p.heap
+        n = 0
+        while heap and heap[0][0] <= upto:
+            _, _, seq, txn = heapq.heappop(heap)
+            out.append((seq, txn))
+            n += 1
+        self.buffered -= n
+        self.released_count += n
+        if forced:
+            self.forced_count += n
+
+    def _expire(self, p: _Partition, now: float, out: list):
+        """Force out transactions that have waited longer than `max_delay`."""
+        arrivals = p.arrivals
+        deadline = now - self.max_delay
+        while arrivals and (arrivals[0][0] <= deadline or arrivals[0][1] <= p.released):
+            _, t = arrivals.popleft()
+            if t > p.released:
+                self._release(p, t, out, forced=True)
+        # Entries of already released transactions can pile up behind a
+        # waiting one; drop them in bulk so the deque stays O(buffer size)
+        if len(arrivals) > 2 * len(p.heap) + 64:
+            p.arrivals = deque(a for a in arrivals if a[1] > p.released)
+
+    # ---- public API ------------------------------------------------------
+
+    def push(self, seq: int, txn) -> List[Tuple[int, object]]:
+        """
+        Add one transaction.
+
+        Returns:
+            list: (seq, transaction) pairs now released, in event-time order
+            per partition.
+        """
+        t = to_epoch_us(txn.timestamp)
+        p = self._partition(txn)
+        out: list = []
+        now = self.clock() if self.max_delay is not None else 0.0
+
+        if t < p.released:
+            self.late_count += 1
+            if self.on_late is not None:
+                self.on_late(seq, txn, p.released)
+        elif t == p.released:
+            # Ties with the last released time are still in order: pass straight through
+            out.append((seq, txn))
+            self.released_count += 1
+        else:
+            heapq.heappush(p.heap, (t, next(self._arrival), seq, txn))
+            self.buffered += 1
+            if self.buffered > self.peak_buffered:
+                self.peak_buffered = self.buffered
+            if self.max_delay is not None:
+                p.arrivals.append((now, t))
+            if t > p.max_time:
+                p.max_time = t
+                self._release(p, t - self.lateness_us, out)
+            if len(p.heap) > self.max_buffered:
+                self._release(p, p.heap[0][0], out, forced=True)
+
+        if self.max_delay is not None:
+            self._expire(p, now, out)
+        return out
+
+    def poll(self) -> List[Tuple[int, object]]:
+        """Release transactions past `max_delay_seconds` in every partition."""
+        out: list = []
+        if self.max_delay is not None:
+            now = self.clock()
+            for p in self._partitions:
+                self._expire(p, now, out)
+        return out
+
+    def flush(self) -> List[Tuple[int, object]]:
+        """Release everything still buffered (end of stream)."""
+        out: list = []
+        for p in self._partitions:
+            if p.heap:
+                self._release(p, max(t for t, _, _, _ in p.heap), out)
+            p.arrivals.clear()
+        return out
+
+    def reorder(self, numbered_txns: Iterable[Tuple[int, object]]) -> Iterator[Tuple[int, object]]:
+        """Reorder a (seq, transaction) stream; the buffer is flushed when it ends."""
+        push = self.push
+        for seq, txn in numbered_txns:
+            yield from push(seq, txn)
+        yield from self.flush()
+
+    def watermark(self, partition: int = 0) -> Optional[object]:
+        """Event time (datetime) up to which a partition has been released, if any."""
+        released = self._partitions[partition].released
+        return None if released == _NEVER else from_epoch_us(released)
+
+    def collect(self) -> List[MetricFamily]:
+        return [
+            MetricFamily(f"{NAMESPACE}_reorder_buffered", "gauge",
+                         "Transactions waiting in the event-time reorder buffer.",
+                         [({}, self.buffered)]),
+            MetricFamily(f"{NAMESPACE}_reorder_buffered_peak", "gauge",
+                         "Most transactions held in the reorder buffer at once.",
+                         [({}, self.peak_buffered)]),
+            MetricFamily(f"{NAMESPACE}_reorder_released_total", "counter",
+                         "Transactions released in event-time order.",
+                         [({}, self.released_count)]),
+            MetricFamily(f"{NAMESPACE}_reorder_forced_total", "counter",
+                         "Transactions released early by the size or delay bound.",
+                         [({}, self.forced_count)]),
+            MetricFamily(f"{NAMESPACE}_late_events_total", "counter",
+                         "Transactions older than the watermark (sent to the side output).",
+                         [({}, self.late_count)]),
+        ]
+
+
+class CsvLateEventSink(AlertSink):
+    """
+    Side output for too-late transactions, as CSV: the stream sequence
+    number, the watermark they missed, and the transaction fields.
+    Buffering and rotation options are those of `AlertSink`.
+    """
+
+    FIELDS = ["seq", "watermark", "transaction_id", "user_id", "amount", "timestamp",
+              "location", "payment_method", "merchant_id"]
+
+    def _header(self) -> bytes:
+        return (",".join(self.FIELDS) + "\r\n").encode("utf-8")
+
+    def write_event(self, seq: int, txn, watermark_us: int):
+        self._add((seq, watermark_us, txn))
+
+    __call__ = write_event
+
+    def _encode(self, items: List[tuple]) -> bytes:
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerows(
+            (seq, from_epoch_us(watermark).isoformat(), txn.transaction_id, txn.user_id,
+             txn.amount, txn.timestamp.isoformat(), txn.location, txn.payment_method,
+             txn.merchant_id or "")
+            for seq, watermark, txn in items)
+        return out.getvalue().encode("utf-8")
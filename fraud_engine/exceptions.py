@@ -1,3 +1,13 @@
 class InvalidTransactionError(Exception):
     """Raised when a transaction fails schema validation."""
     pass
+
+
+class CheckpointError(Exception):
+    """Raised when a checkpoint cannot be read or does not match the running configuration."""
+    pass
+
+
+class ConfigError(Exception):
+    """Raised when a configuration file is malformed or refers to unknown rules or parameters."""
+    pass
@@ -0,0 +1,222 @@
+"""
+ingest.py
+
+High-throughput, column-at-a-time ingestion for the Fraud Detection Engine.
+
+Building a Pydantic `Transaction` for every CSV row spends most of its time on
+dict creation, model validation and datetime parsing. This module reads CSV
+files in large chunks and validates whole columns at once with NumPy, producing
+`TransactionBatch` objects. Invalid rows are collected as `RejectedRow` records
+with a reason instead of being printed one by one.
+
+Key Responsibilities:
+    - Read CSV files in fixed-size chunks of rows.
+    - Parse and type-check whole columns (float amounts, timestamps in the
+      `schema.TIMESTAMP_RE` format, as the strict path accepts them).
+    - Collect invalid rows into a reject list with reasons.
+    - Yield columnar `TransactionBatch` objects sharing one user interner.
+
+Typical usage:
+    from fraud_engine.ingest import read_csv_batches
+
+    rejects = []
+    for batch in read_csv_batches("data/sample_transaction.csv", rejects=rejects):
+        masks = detector.evaluate_batch(batch)
+"""
+import csv
+import warnings
+from collections import namedtuple
+from itertools import compress, islice
+from typing import Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from fraud_engine.batch import MAX_EPOCH_US, MIN_EPOCH_US, TransactionBatch, UserInterner
+from fraud_engine.exceptions import InvalidTransactionError
+from fraud_engine.schema import TIMESTAMP_RE
+
+REQUIRED_COLUMNS = ("transaction_id", "user_id", "amount", "timestamp", "location", "payment_method")
+OPTIONAL_COLUMNS = ("merchant_id",)
+DEFAULT_BATCH_SIZE = 65536
+
+RejectedRow = namedtuple("RejectedRow", ["index", "reason", "row"])
+RejectedRow.__doc__ = "An input row that failed validation (`index` is the 0-based data row)."
+
+
+def _column_positions(header: Sequence[str]) -> dict:
+    positions = {name: i for i, name in enumerate(header)}
+    missing = [c for c in REQUIRED_COLUMNS if c not in positions]
+    if missing:
+        raise InvalidTransactionError(f"CSV header is missing required columns: {missing}")
+    return positions
+
+
+def _parse_amounts(values: List[str], bad: np.ndarray, reasons: dict) -> np.ndarray:
+    try:
+        return np.array(values, dtype=np.str_).astype(np.float64)
+    except ValueError:
+        pass
+    out = np.zeros(len(values), dtype=np.float64)
+    for i, v in enumerate(values):
+        try:
+            out[i] = float(v)
+        except ValueError:
+            bad[i] = True
+            reasons.setdefault(i, f"invalid amount {v!r}")
+    return out
+
+
+# "YYYY-MM-DD HH:MM:SS" as byte ranges: character i must lie in
+# _LOW[i] .. _LOW[i] + _SPAN[i]. The date/time separator (" " or "T") is
+# checked on its own.
+_LOW = np.frombuffer(b"0000-00-00 00:00:00", dtype=np.uint8)
+_SPAN = np.where(_LOW == ord("0"), 9, 0).astype(np.uint8)
+_SEP = 10
+_SPAN[_SEP] = 255
+
+
+def _timestamp_shapes(values: List[str]) -> np.ndarray:
+    """True where a value has the shape `schema.TIMESTAMP_RE` accepts."""
+    n = len(values)
+    width = len(_LOW)
+    fixed = np.fromiter(map(len, values), dtype=np.int64, count=n) == width
+    text = "".join(compress(values, fixed))
+    if not text.isascii():
+        return np.fromiter((TIMESTAMP_RE.fullmatch(v) is not None for v in values), dtype=bool, count=n)
+
+    # Common case "YYYY-MM-DD HH:MM:SS": check every character of those values at once
+    ok = np.zeros(n, dtype=bool)
+    chars = np.frombuffer(text.encode("ascii"), dtype=np.uint8).reshape(-1, width)
+    sep = chars[:, _SEP]
+    ok[fixed] = ((chars - _LOW) <= _SPAN).all(axis=1) & ((sep == ord(" ")) | (sep == ord("T")))
+    for i in np.flatnonzero(~fixed):
+        ok[i] = TIMESTAMP_RE.fullmatch(values[i]) is not None
+    return ok
+
+
+def _parse_timestamps(values: List[str], bad: np.ndarray, reasons: dict) -> np.ndarray:
+    # Only the fixed shape is handed to NumPy, which would otherwise read
+    # "now" as the current time and "2025" as 2025-01-01
+    shaped = _timestamp_shapes(values)
+    # NumPy converts explicit UTC offsets correctly but warns about them
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        try:
+            if shaped.all():
+                parsed = np.array(values, dtype="datetime64[us]")
+            else:
+                parsed = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[us]")
+                parsed[shaped] = np.array(list(compress(values, shaped)), dtype="datetime64[us]")
+        except ValueError:
+            # An impossible date or time (2025-02-30, 25:00:00) among the values
+            parsed = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[us]")
+            for i in np.flatnonzero(shaped):
+                try:
+                    parsed[i] = np.datetime64(values[i], "us")
+                except ValueError:
+                    pass
+
+    missing = np.isnat(parsed)
+    epoch_us = parsed.astype(np.int64)
+    out_of_range = ~missing & ((epoch_us < MIN_EPOCH_US) | (epoch_us > MAX_EPOCH_US))
+    for i in np.flatnonzero(missing):
+        bad[i] = True
+        reasons.setdefault(int(i), f"invalid timestamp {values[i]!r}")
+    for i in np.flatnonzero(out_of_range):
+        bad[i] = True
+        reasons.setdefault(int(i), f"timestamp out of range {values[i]!r}")
+    return epoch_us
+
+
+def parse_rows(header: Sequence[str], rows: List[List[str]], interner: UserInterner,
+               first_index: int = 0, rejects: Optional[list] = None) -> TransactionBatch:
+    """
+    Validate a block of raw CSV rows column by column.
+
+    Args:
+        header (Sequence[str]): CSV header names.
+        rows (List[List[str]]): Raw rows as returned by `csv.reader`.
+        interner (UserInterner): Interner used for `user_id` codes.
+        first_index (int): Data row index of `rows[0]`, used in reject records.
+        rejects (list, optional): Invalid rows are appended here as `RejectedRow`.
+
+    Returns:
+        TransactionBatch: The valid rows, in input order.
+    """
+    positions = _column_positions(header)
+    width = len(header)
+
+    reasons = {}
+    shaped = []
+    for i, row in enumerate(rows):
+        if len(row) == width:
+            shaped.append(i)
+        else:
+            reasons[i] = f"expected {width} fields, got {len(row)}"
+    good_rows = rows if len(shaped) == len(rows) else [rows[i] for i in shaped]
+
+    columns = list(zip(*good_rows)) if good_rows else [()] * width
+    bad = np.zeros(len(good_rows), dtype=bool)
+    column_reasons = {}
+    amount = _parse_amounts(list(columns[positions["amount"]]), bad, column_reasons)
+    timestamp = _parse_timestamps(list(columns[positions["timestamp"]]), bad, column_reasons)
+    for i, reason in column_reasons.items():
+        reasons[shaped[i]] = reason
+
+    if rejects is not None:
+        for i in sorted(reasons):
+            rejects.append(RejectedRow(first_index + i, reasons[i], rows[i]))
+
+    keep = ~bad
+    everything_valid = not bad.any()
+
+    def column(name):
+        values = np.array(columns[positions[name]], dtype=object)
+        return values if everything_valid else values[keep]
+
+    user_ids = column("user_id")
+    return TransactionBatch(
+        transaction_id=column("transaction_id"),
+        user_code=interner.intern_many(user_ids),
+        user_ids=interner.user_ids,
+        amount=amount if everything_valid else amount[keep],
+        timestamp=timestamp if everything_valid else timestamp[keep],
+        location=column("location"),
+        payment_method=column("payment_method"),
+        merchant_id=column("merchant_id") if "merchant_id" in positions else None,
+    )
+
+
+def read_csv_batches(path: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                     rejects: Optional[list] = None,
+                     interner: Optional[UserInterner] = None) -> Iterator[TransactionBatch]:
+    """
+    Stream a CSV file as validated columnar batches.
+
+    Args:
+        path (str): Path to the CSV file.
+        batch_size (int): Number of rows parsed per batch.
+        rejects (list, optional): Invalid rows are appended here as `RejectedRow`.
+        interner (UserInterner, optional): Shared interner for user codes.
+
+    Yields:
+        TransactionBatch: Up to `batch_size` valid transactions.
+    """
+    interner = interner if interner is not None else UserInterner()
+    with open(path, mode="r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        _column_positions(header)
+
+        index = 0
+        while True:
+            chunk = list(islice(reader, batch_size))
+            if not chunk:
+                break
+            rows = [row for row in chunk if row]
+            batch = parse_rows(header, rows, interner, first_index=index, rejects=rejects)
+            index += len(rows)
+            if len(batch):
+                yield batch
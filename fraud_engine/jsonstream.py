@@ -0,0 +1,159 @@
+"""
+jsonstream.py
+
+Incremental decoding of JSON record streams.
+
+`json.load` needs the whole document in memory before it returns anything.
+`JsonRecordDecoder` is a push parser: feed it text as it arrives (from a socket
+or a file) and it returns every record completed so far, keeping only the
+unfinished tail buffered. It accepts either a top-level JSON array of records
+or newline-delimited JSON (NDJSON), detected from the first character.
+
+Key Responsibilities:
+    - Decode records from a top-level JSON array one element at a time.
+    - Decode NDJSON / concatenated JSON objects.
+    - Keep memory bounded by the size of a single record.
+    - Stream records from memory-mapped files (`iter_json_records`).
+
+Typical usage:
+    from fraud_engine.jsonstream import JsonRecordDecoder
+
+    decoder = JsonRecordDecoder()
+    for chunk in chunks:
+        for record in decoder.feed(chunk):
+            ...
+    for record in decoder.close():
+        ...
+"""
+import codecs
+import json
+import mmap
+import os
+from typing import Iterator, List
+
+_WHITESPACE = " \t\n\r"
+DEFAULT_MAX_RECORD_CHARS = 16 * 1024 * 1024
+DEFAULT_FILE_CHUNK_BYTES = 1024 * 1024
+
+
+class JsonRecordDecoder:
+    """
+    Push parser for a JSON array of records or an NDJSON stream.
+
+    Raises:
+        ValueError: On malformed input, or when a single record grows
+            beyond `max_record_chars` without completing.
+    """
+
+    # Parser states
+    _START, _FIRST_ITEM, _ITEM, _AFTER_ITEM, _NDJSON, _DONE = range(6)
+
+    def __init__(self, max_record_chars: int = DEFAULT_MAX_RECORD_CHARS):
+        self.max_record_chars = max_record_chars
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._state = self._START
+
+    def _skip_ws(self, pos: int) -> int:
+        buf = self._buf
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        return pos
+
+    def _decode(self, records: List, pos: int, final: bool):
+        """Decode one value at `pos`; return the new position or None if incomplete."""
+        try:
+            record, end = self._decoder.raw_decode(self._buf, pos)
+        except json.JSONDecodeError as e:
+            if final:
+                raise ValueError(f"Truncated or malformed JSON stream: {e}")
+            return None
+        if end == len(self._buf) and not final and not isinstance(record, (dict, list)):
+            # A bare scalar at the end of the buffer may still be growing
+            return None
+        records.append(record)
+        return end
+
+    def _run(self, final: bool) -> List:
+        records = []
+        buf = self._buf
+        pos = self._skip_ws(0)
+
+        while pos < len(buf):
+            state = self._state
+            ch = buf[pos]
+            if state == self._START:
+                if ch == "[":
+                    self._state = self._FIRST_ITEM
+                    pos += 1
+                else:
+                    self._state = self._NDJSON
+                continue
+            if state == self._DONE:
+                raise ValueError(f"Unexpected data after end of JSON array: {buf[pos:pos + 20]!r}")
+            if state == self._AFTER_ITEM:
+                if ch not in ",]":
+                    raise ValueError(f"Expected ',' or ']' in JSON array, got {ch!r}")
+                self._state = self._ITEM if ch == "," else self._DONE
+                pos = self._skip_ws(pos + 1)
+                continue
+            if state == self._FIRST_ITEM and ch == "]":
+                self._state = self._DONE
+                pos = self._skip_ws(pos + 1)
+                continue
+
+            end = self._decode(records, pos, final)
+            if end is None:
+                break
+            if state != self._NDJSON:
+                self._state = self._AFTER_ITEM
+            pos = self._skip_ws(end)
+
+        self._buf = buf[pos:]
+        if len(self._buf) > self.max_record_chars:
+            raise ValueError(f"JSON record exceeds {self.max_record_chars} characters")
+        return records
+
+    def feed(self, text: str) -> List:
+        """Add text and return the records completed by it."""
+        self._buf += text
+        return self._run(final=False)
+
+    def close(self) -> List:
+        """
+        Signal end of input and return any final records.
+
+        Raises:
+            ValueError: If the stream ended mid-record or mid-array.
+        """
+        records = self._run(final=True)
+        if self._buf.strip():
+            raise ValueError(f"Unexpected trailing data in JSON stream: {self._buf[:20]!r}")
+        if self._state in (self._FIRST_ITEM, self._ITEM, self._AFTER_ITEM):
+            raise ValueError("JSON array is not terminated")
+        return records
+
+
+def iter_json_records(path: str, chunk_bytes: int = DEFAULT_FILE_CHUNK_BYTES) -> Iterator:
+    """
+    Stream records from a JSON array or NDJSON file without loading it whole.
+
+    The file is memory-mapped and decoded `chunk_bytes` at a time, so memory
+    stays constant and the first record is available after the first chunk.
+
+    Args:
+        path (str): Path to a .json (array) or .ndjson file.
+        chunk_bytes (int): Bytes decoded per step.
+
+    Yields:
+        dict: One decoded record at a time.
+    """
+    if os.path.getsize(path) == 0:
+        return
+    text = codecs.getincrementaldecoder("utf-8-sig")()
+    decoder = JsonRecordDecoder()
+    with open(path, mode="rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for start in range(0, len(mm), chunk_bytes):
+            yield from decoder.feed(text.decode(mm[start:start + chunk_bytes]))
+        yield from decoder.feed(text.decode(b"", final=True))
+        yield from decoder.close()
@@ -0,0 +1,50 @@
+"""
+log_queue.py
+
+Non-blocking logging for the detection loop.
+
+`config/logging.yaml` attaches console and file handlers to the root logger,
+so every `logger.warning(...)` in the hot loop waits for terminal and disk
+I/O. `start_queue_logging` moves those handlers behind a
+`logging.handlers.QueueHandler`: the calling thread only enqueues the record,
+and a `QueueListener` thread does the formatting and I/O.
+
+Typical usage:
+    logging.config.dictConfig(config)
+    listener = start_queue_logging()      # stopped automatically at exit
+"""
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+
+def start_queue_logging(logger: Optional[logging.Logger] = None) -> Optional[QueueListener]:
+    """
+    Route `logger`'s handlers (the root logger by default) through a queue.
+
+    Returns:
+        QueueListener: The running listener (already registered with atexit),
+            or None if the logger has no handlers or is already queued.
+    """
+    logger = logger if logger is not None else logging.getLogger()
+    handlers = list(logger.handlers)
+    if not handlers or any(isinstance(h, QueueHandler) for h in handlers):
+        return None
+
+    records = queue.SimpleQueue()
+    for h in handlers:
+        logger.removeHandler(h)
+    logger.addHandler(QueueHandler(records))
+
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(stop_queue_logging, listener)
+    return listener
+
+
+def stop_queue_logging(listener: QueueListener):
+    """Drain pending records and stop the listener thread (idempotent)."""
+    if listener._thread is not None:
+        listener.stop()
@@ -0,0 +1,310 @@
+"""
+metrics.py
+
+Low-overhead runtime metrics for the Fraud Detection Engine.
+
+Hot paths only bump plain Python integers held in lists; nothing is formatted,
+locked or allocated per transaction. Latency is measured with
+`perf_counter_ns` on one in `sample_every` evaluations (never, when sampling
+is off) and recorded in fixed-bucket histograms. Collectors turn those raw
+counters into metric families only when the registry is scraped.
+
+Key Responsibilities:
+    - Count per-rule invocations, hits and exceptions (`DetectorMetrics`).
+    - Record sampled per-rule and per-evaluation latency histograms.
+    - Track pipeline throughput and the validation reject rate (`PipelineMetrics`).
+    - Expose a snapshot API and Prometheus text format (`MetricsRegistry`).
+    - Periodically write a Prometheus text file (`PrometheusFileExporter`).
+
+Typical usage:
+    from fraud_engine.metrics import MetricsRegistry, DetectorMetrics, PrometheusFileExporter
+
+    registry = MetricsRegistry()
+    metrics = registry.register(DetectorMetrics(rules, sample_every=100))
+    detector = FraudDetector(rules, metrics=metrics)
+    with PrometheusFileExporter(registry, "logs/metrics.prom", interval=15):
+        ...
+    print(registry.snapshot())
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import namedtuple
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger("fraud_engine")
+
+NAMESPACE = "fraudx"
+
+# 250ns .. ~33ms, doubling: fine enough for single rule checks and whole evaluations
+DEFAULT_LATENCY_BUCKETS_NS = tuple(250 * 2 ** i for i in range(18))
+
+MetricFamily = namedtuple("MetricFamily", ["name", "kind", "help", "samples"])
+MetricFamily.__doc__ = ("One metric: `kind` is 'counter', 'gauge' or 'histogram'; "
+                        "`samples` is a list of (labels dict, value or Histogram).")
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram.
+
+    Args:
+        bounds (Sequence[int]): Ascending inclusive upper bounds; an implicit
+            +Inf bucket follows the last one.
+        scale (float): Factor applied to bounds and sum when exported
+            (1e-9 turns nanoseconds into Prometheus' seconds).
+    """
+
+    __slots__ = ("bounds", "counts", "sum", "count", "scale")
+
+    def __init__(self, bounds: Sequence[int] = DEFAULT_LATENCY_BUCKETS_NS, scale: float = 1e-9):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0
+        self.count = 0
+        self.scale = scale
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        """Cumulative counts per bucket (the last entry is the +Inf bucket)."""
+        out, running = [], 0
+        for c in self.counts:
+            running += c
+            out.append(running)
+        return out
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding quantile `q` (scaled), or None if empty."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, total in zip(self.bounds, self.cumulative()):
+            if total >= rank:
+                return bound * self.scale
+        return float("inf")
+
+
+class DetectorMetrics:
+    """
+    Per-rule counters and sampled latency for `FraudDetector` / `RulePlan`.
+
+    Args:
+        rules (list): The detector's rules (labelled by `rule.name`).
+        sample_every (int): Time one in N evaluations; 0 disables timing.
+        buckets (Sequence[int]): Latency histogram bounds in nanoseconds.
+    """
+
+    def __init__(self, rules, sample_every: int = 0,
+                 buckets: Sequence[int] = DEFAULT_LATENCY_BUCKETS_NS):
+        self.names = [r.name for r in rules]
+        n = len(self.names)
+        self.sample_every = sample_every
+        self.calls = [0] * n
+        self.hits = [0] * n
+        self.errors = [0] * n
+        self.latency = [Histogram(buckets) for _ in range(n)]
+        self.evaluations = 0
+        self.flagged = 0
+        self.evaluate_latency = Histogram(buckets)
+
+    def tick(self) -> bool:
+        """Count one evaluation; return True if it should be timed."""
+        self.evaluations += 1
+        return bool(self.sample_every) and self.evaluations % self.sample_every == 0
+
+    def collect(self) -> List[MetricFamily]:
+        rule_labels = [{"rule": name} for name in self.names]
+        return [
+            MetricFamily(f"{NAMESPACE}_evaluations_total", "counter",
+                         "Transactions evaluated.", [({}, self.evaluations)]),
+            MetricFamily(f"{NAMESPACE}_flagged_total", "counter",
+                         "Transactions flagged by at least one rule.", [({}, self.flagged)]),
+            MetricFamily(f"{NAMESPACE}_rule_invocations_total", "counter",
+                         "Rule checks run.", list(zip(rule_labels, self.calls))),
+            MetricFamily(f"{NAMESPACE}_rule_hits_total", "counter",
+                         "Rule checks that flagged the transaction.",
+                         list(zip(rule_labels, self.hits))),
+            MetricFamily(f"{NAMESPACE}_rule_exceptions_total", "counter",
+                         "Rule checks that raised.", list(zip(rule_labels, self.errors))),
+            MetricFamily(f"{NAMESPACE}_rule_latency_seconds", "histogram",
+                         "Sampled latency of a single rule check.",
+                         list(zip(rule_labels, self.latency))),
+            MetricFamily(f"{NAMESPACE}_evaluate_latency_seconds", "histogram",
+                         "Sampled latency of a whole evaluation.",
+                         [({}, self.evaluate_latency)]),
+        ]
+
+
+class PipelineMetrics:
+    """
+    Ingestion counters: records accepted and rejected, and the throughput
+    since the first record.
+    """
+
+    def __init__(self):
+        self.records = 0
+        self.rejected = 0
+        self.started: Optional[float] = None
+
+    def start(self):
+        if self.started is None:
+            self.started = time.perf_counter()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started if self.started is not None else 0.0
+
+    def throughput(self) -> float:
+        elapsed = self.elapsed()
+        return self.records / elapsed if elapsed > 0 else 0.0
+
+    def reject_rate(self) -> float:
+        seen = self.records + self.rejected
+        return self.rejected / seen if seen else 0.0
+
+    def collect(self) -> List[MetricFamily]:
+        return [
+            MetricFamily(f"{NAMESPACE}_pipeline_records_total", "counter",
+                         "Valid records delivered by the pipeline.", [({}, self.records)]),
+            MetricFamily(f"{NAMESPACE}_pipeline_rejected_total", "counter",
+                         "Input records that failed validation.", [({}, self.rejected)]),
+            MetricFamily(f"{NAMESPACE}_pipeline_reject_ratio", "gauge",
+                         "Rejected share of all input records.", [({}, self.reject_rate())]),
+            MetricFamily(f"{NAMESPACE}_pipeline_throughput_records_per_second", "gauge",
+                         "Valid records per second since the first record.",
+                         [({}, self.throughput())]),
+            MetricFamily(f"{NAMESPACE}_pipeline_elapsed_seconds", "gauge",
+                         "Seconds since the first record.", [({}, self.elapsed())]),
+        ]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str], extra: Optional[Dict[str, str]] = None) -> str:
+    items = dict(labels, **(extra or {}))
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items.items()) + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    # 12 significant digits hides binary noise such as 2.5000000000000004e-07
+    return repr(float(f"{value:.12g}")) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    Collection point for metric collectors (anything with `collect()`).
+    """
+
+    def __init__(self):
+        self._collectors = []
+
+    def register(self, collector):
+        """Add a collector and return it."""
+        self._collectors.append(collector)
+        return collector
+
+    def collect(self) -> List[MetricFamily]:
+        return [family for c in self._collectors for family in c.collect()]
+
+    def snapshot(self) -> Dict[str, dict]:
+        """
+        Current values as plain data, e.g. for JSON or tests.
+
+        Returns:
+            dict: name -> {"type", "help", "samples": [{"labels", "value"}]}.
+                Histogram values are {"buckets": {le: cumulative count}, "sum", "count"}.
+        """
+        out = {}
+        for family in self.collect():
+            samples = []
+            for labels, value in family.samples:
+                if isinstance(value, Histogram):
+                    les = [_format_value(b * value.scale) for b in value.bounds] + ["+Inf"]
+                    value = {"buckets": dict(zip(les, value.cumulative())),
+                             "sum": value.sum * value.scale, "count": value.count}
+                samples.append({"labels": dict(labels), "value": value})
+            out[family.name] = {"type": family.kind, "help": family.help, "samples": samples}
+        return out
+
+    def render_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for family in self.collect():
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for labels, value in family.samples:
+                if isinstance(value, Histogram):
+                    les = [b * value.scale for b in value.bounds] + [float("inf")]
+                    for le, total in zip(les, value.cumulative()):
+                        lines.append(f"{family.name}_bucket"
+                                     f"{_format_labels(labels, {'le': _format_value(le)})} {total}")
+                    lines.append(f"{family.name}_sum{_format_labels(labels)} "
+                                 f"{_format_value(value.sum * value.scale)}")
+                    lines.append(f"{family.name}_count{_format_labels(labels)} {value.count}")
+                else:
+                    lines.append(f"{family.name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class PrometheusFileExporter:
+    """
+    Write the registry to a Prometheus text file (e.g. for node_exporter's
+    textfile collector) every `interval` seconds from a background thread.
+    Files are replaced atomically, so scrapers never see a partial write.
+
+    Args:
+        registry (MetricsRegistry): Metrics to export.
+        path (str): Output .prom file.
+        interval (float): Seconds between writes.
+    """
+
+    def __init__(self, registry: MetricsRegistry, path: str, interval: float = 15.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def write(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.registry.render_prometheus())
+        os.replace(tmp_path, self.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except Exception as e:
+                logger.warning(f"Metrics export to {self.path} failed: {e}")
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the background thread and write a final snapshot."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.write()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,470 @@
+"""
+parallel.py
+
+Multi-process sharded fraud detection, partitioned by user_id.
+
+Stateful rules (`RapidTransactionsRule`) and user profiles (`ProfileEngine`)
+are only correct when each user's transactions are seen in order. Hashing
+every transaction to a shard by `user_id` keeps all of a user's transactions
+in one worker process, in input order, so each worker can run the normal
+single-process detection loop on its share of the stream. Every record
+carries its input sequence number, which lets the parent merge the per-shard
+alert streams and profiles back into exactly the single-process output.
+
+Key Responsibilities:
+    - Run the per-transaction detection loop and record its results (`detect_transactions`).
+    - Hash-partition input records by `user_id` across N worker processes.
+    - Parse CSV byte ranges in a process pool that also partitions the rows.
+    - Send records to workers in batches over pipes, preserving per-user order.
+    - Stream the shards' alerts back in input order while they run.
+    - Merge alerts, top-k counters, amount sketches and profiles into one `DetectionSummary`.
+    - Checkpoint a `DetectionSummary` alongside rule and profile state.
+
+Typical usage:
+    from fraud_engine.parallel import run_sharded
+
+    summary = run_sharded("data/sample_transaction.csv", rules, workers=4)
+    for seq, txn_id, user_id, flags in summary.alerts:
+        ...
+"""
+import copy
+import functools
+import heapq
+import itertools
+import json
+import logging
+import multiprocessing
+import multiprocessing.connection
+import pickle
+import threading
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from fraud_engine.detector import FraudDetector
+from fraud_engine.ingest import _column_positions
+from fraud_engine.parallel_ingest import _parse_range, _parsed_ranges, split_byte_ranges
+from fraud_engine.pipeline import pipeline, _resolve_path
+from fraud_engine.rules.base import Rule
+from fraud_engine.sketches import (DEFAULT_SAMPLE_SIZE, DEFAULT_TOP_K, QuantileSketch,
+                                   Reservoir, SpaceSaving)
+from scripts.profile_engine import ProfileEngine
+
+DEFAULT_SHARD_BATCH_SIZE = 2048
+DEFAULT_SHARD_CHUNK_BYTES = 4 * 1024 * 1024
+
+logger = logging.getLogger("fraud_engine")
+
+
+def shard_for(user_id: str, shards: int) -> int:
+    """Stable shard index for a user (independent of PYTHONHASHSEED)."""
+    return zlib.crc32(user_id.encode("utf-8")) % shards
+
+
+class DetectionSummary:
+    """
+    Results of a detection run over a stream (or one shard of it).
+
+    Everything except `alerts`, `profiles` and `profile_first_seen` has a
+    fixed size however many transactions and users the run sees; the last
+    two are only filled by shard workers, whose summaries are merged.
+
+    Attributes:
+        total (int): Valid transactions processed.
+        fraud_count (int): Transactions flagged by at least one rule.
+        rejected (int): Input records that failed validation.
+        alerts (list): (seq, transaction_id, user_id, flags) in input order
+            (left empty when alerts are streamed to a sink instead).
+        rule_counts (SpaceSaving): Alerts per rule.
+        user_counts (SpaceSaving): Most flagged users (top `top_k`).
+        amounts (QuantileSketch): Amounts of all valid transactions.
+        flagged_amounts (QuantileSketch): Amounts of flagged transactions.
+        alert_sample (Reservoir): Uniform sample of alerts.
+        profiles (dict): user_id -> profile stats, in first-seen order
+            (filled for sharded runs only).
+        profile_first_seen (dict, optional): user_id -> seq of the user's
+            first transaction, used to merge shard profiles; None unless
+            `track_first_seen=True` (set by the shard workers only).
+    """
+
+    def __init__(self, top_k: int = DEFAULT_TOP_K, sample_size: int = DEFAULT_SAMPLE_SIZE,
+                 track_first_seen: bool = False):
+        self.total = 0
+        self.fraud_count = 0
+        self.rejected = 0
+        self.alerts: List[Tuple[int, str, str, List[str]]] = []
+        self.rule_counts = SpaceSaving(max(top_k, 64))
+        self.user_counts = SpaceSaving(top_k)
+        self.amounts = QuantileSketch()
+        self.flagged_amounts = QuantileSketch()
+        self.alert_sample = Reservoir(sample_size)
+        self.profiles = {}
+        self.profile_first_seen = {} if track_first_seen else None
+
+    def count_alert(self, alert: Tuple[int, str, str, List[str]]):
+        """Count one (seq, transaction_id, user_id, flags) alert."""
+        for r in alert[3]:
+            self.rule_counts.add(r)
+        self.user_counts.add(alert[2])
+        self.alert_sample.add(alert)
+
+    def counters(self) -> Tuple[SpaceSaving, SpaceSaving]:
+        """Rule and user hit counters (top-k sketches)."""
+        return self.rule_counts, self.user_counts
+
+    def snapshot_state(self, incremental: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Export totals, counters, sketches and the alert sample for a checkpoint.
+
+        The state has a fixed size, so incremental checkpoints store all of
+        it too. `alerts` and `profiles` are not included: a checkpointed run
+        streams its alerts to a sink and keeps profiles in its profiler.
+
+        Returns:
+            dict: {"summary": JSON document as a uint8 array}.
+        """
+        state = {
+            "total": self.total,
+            "fraud_count": self.fraud_count,
+            "rejected": self.rejected,
+            "rule_counts": self.rule_counts.getstate(),
+            "user_counts": self.user_counts.getstate(),
+            "amounts": self.amounts.getstate(),
+            "flagged_amounts": self.flagged_amounts.getstate(),
+            "alert_sample": self.alert_sample.getstate(),
+        }
+        return {"summary": np.frombuffer(json.dumps(state).encode("utf-8"), dtype=np.uint8)}
+
+    def restore_state(self, state: Dict[str, np.ndarray], incremental: bool = False):
+        """Load the state produced by `snapshot_state`."""
+        state = json.loads(bytes(state["summary"]).decode("utf-8"))
+        self.total = state["total"]
+        self.fraud_count = state["fraud_count"]
+        self.rejected = state["rejected"]
+        self.rule_counts.setstate(state["rule_counts"])
+        self.user_counts.setstate(state["user_counts"])
+        self.amounts.setstate(state["amounts"])
+        self.flagged_amounts.setstate(state["flagged_amounts"])
+        self.alert_sample.setstate(state["alert_sample"], item=tuple)
+
+    @classmethod
+    def merge(cls, parts: Iterable["DetectionSummary"],
+              into: Optional["DetectionSummary"] = None) -> "DetectionSummary":
+        """
+        Merge shard summaries back into single-process order.
+
+        Args:
+            parts (Iterable[DetectionSummary]): Shard summaries.
+            into (DetectionSummary, optional): Summary to merge into, e.g.
+                one whose alerts were already counted as they streamed in.
+
+        Returns:
+            DetectionSummary: `into`, or a new summary.
+        """
+        parts = list(parts)
+        merged = into
+        if merged is None:
+            merged = cls(parts[0].user_counts.capacity, parts[0].alert_sample.size,
+                         track_first_seen=True) if parts else cls(track_first_seen=True)
+        for part in parts:
+            merged.total += part.total
+            merged.fraud_count += part.fraud_count
+            merged.rejected += part.rejected
+            merged.amounts.merge(part.amounts)
+            merged.flagged_amounts.merge(part.flagged_amounts)
+        # Re-count in input order so counters and samples match a single-process run
+        for alert in heapq.merge(*(p.alerts for p in parts), key=lambda a: a[0]):
+            merged.count_alert(alert)
+            merged.alerts.append(alert)
+
+        first_seen = [(seq, user, part) for part in parts
+                      for user, seq in (part.profile_first_seen or {}).items()]
+        for seq, user, part in sorted(first_seen, key=lambda x: x[0]):
+            merged.profiles[user] = part.profiles[user]
+            merged.profile_first_seen[user] = seq
+        return merged
+
+
+def detect_transactions(numbered_txns, detector: FraudDetector, profiler: ProfileEngine,
+                        summary: Optional[DetectionSummary] = None,
+                        on_alert: Optional[Callable] = None,
+                        keep_alerts: bool = True) -> DetectionSummary:
+    """
+    The per-transaction detection loop: update the user's profile,
+    evaluate every rule and record any alert.
+
+    Args:
+        numbered_txns (Iterable[Tuple[int, Transaction]]): (seq, transaction) pairs.
+        detector (FraudDetector): Detector holding the rules.
+        profiler (ProfileEngine): Profile store updated with every transaction.
+        summary (DetectionSummary, optional): Summary to accumulate into.
+        on_alert (callable, optional): Called as on_alert(seq, txn, flags) for each alert.
+        keep_alerts (bool): Keep every alert in `summary.alerts`. Pass False
+            when `on_alert` streams them elsewhere, to keep memory bounded.
+
+    Returns:
+        DetectionSummary: The updated summary (profiles not yet snapshotted).
+    """
+    summary = summary if summary is not None else DetectionSummary()
+    first_seen = summary.profile_first_seen
+
+    for seq, txn in numbered_txns:
+        summary.total += 1
+        if first_seen is not None and txn.user_id not in first_seen:
+            first_seen[txn.user_id] = seq
+        profiler.update_profile(txn)
+        summary.amounts.add(txn.amount)
+
+        try:
+            result = detector.evaluate(txn)
+        except Exception as e:
+            logger.warning(f"Error evaluating txn {txn.transaction_id}: {e}")
+            continue
+
+        if result.get("is_fraud"):
+            flags = result.get("flags", [])
+            alert = (seq, txn.transaction_id, txn.user_id, flags)
+            summary.fraud_count += 1
+            summary.count_alert(alert)
+            summary.flagged_amounts.add(txn.amount)
+            if keep_alerts:
+                summary.alerts.append(alert)
+            if on_alert is not None:
+                on_alert(seq, txn, flags)
+
+    return summary
+
+
+def _worker_main(tasks, results, rules: List[Rule]):
+    detector = FraudDetector(rules)
+    profiler = ProfileEngine()
+    # The parent orders the merged profiles by each user's first transaction
+    summary = DetectionSummary(track_first_seen=True)
+    found = []
+
+    def on_alert(seq, txn, flags):
+        found.append((seq, txn.transaction_id, txn.user_id, flags))
+
+    while True:
+        msg = tasks.recv()
+        if msg is None:
+            break
+        seqs, records, upto = msg
+        if isinstance(records, bytes):
+            # A shard's share of one parsed byte range: seqs is the range's first seq
+            positions, batch = pickle.loads(records)
+            seqs = (seqs + positions).tolist()
+            records = batch.rows()
+        if records is not None:
+            detect_transactions(zip(seqs, records), detector, profiler, summary,
+                                on_alert=on_alert, keep_alerts=False)
+        # Every record before `upto` that belongs to this shard is done
+        results.send((upto, found))
+        found = []
+
+    summary.profiles = profiler.summary()
+    results.send(summary)
+    results.close()
+
+
+class _AlertMerger:
+    """
+    Merge the shards' alert streams into input order while they run.
+
+    Each shard reports its alerts with the sequence number it has
+    processed up to; an alert is released once every shard is past it.
+    """
+
+    def __init__(self, shards: int, emit: Callable):
+        self.emit = emit
+        self._done = [0] * shards
+        self._heap: list = []
+
+    def add(self, shard: int, upto: int, alerts: list):
+        for alert in alerts:
+            heapq.heappush(self._heap, alert)
+        self._done[shard] = upto
+        safe = min(self._done)
+        while self._heap and self._heap[0][0] < safe:
+            self.emit(heapq.heappop(self._heap))
+
+    def finish(self):
+        while self._heap:
+            self.emit(heapq.heappop(self._heap))
+
+
+def _collect(results, procs, merger: _AlertMerger, parts: list, errors: list):
+    """Collector thread: feed alert chunks to `merger`, then gather shard summaries."""
+    pending = dict(zip(results, range(len(results))))
+    try:
+        while pending:
+            for conn in multiprocessing.connection.wait(list(pending)):
+                try:
+                    msg = conn.recv()
+                except EOFError:
+                    raise RuntimeError("Detection worker exited before returning results")
+                shard = pending[conn]
+                if isinstance(msg, DetectionSummary):
+                    parts[shard] = msg
+                    del pending[conn]
+                else:
+                    merger.add(shard, *msg)
+        merger.finish()
+    except BaseException as e:
+        errors.append(e)
+        # Unblock the sending thread
+        for proc in procs:
+            proc.terminate()
+
+
+def _partition_range(path: str, start: int, end: int, header: List[str], shards: int):
+    """
+    Parse-pool task: parse one byte range and split its valid rows by shard.
+
+    Returns:
+        tuple: (valid rows, rejected rows, pieces) where pieces[s] is None or
+        the pickled (positions among the range's valid rows, batch) for shard s.
+    """
+    batch, rejects, _ = _parse_range(path, start, end, header)
+    user_shards = np.fromiter((shard_for(u, shards) for u in batch.user_ids),
+                              dtype=np.int64, count=len(batch.user_ids))
+    row_shards = user_shards[batch.user_code]
+    pieces = []
+    for shard in range(shards):
+        positions = np.flatnonzero(row_shards == shard)
+        if not len(positions):
+            pieces.append(None)
+            continue
+        part = batch.take(positions)
+        # Ship only this shard's users, not the whole range's user table
+        codes, part.user_code = np.unique(part.user_code, return_inverse=True)
+        part.user_ids = [batch.user_ids[c] for c in codes.tolist()]
+        pieces.append(pickle.dumps((positions, part), protocol=pickle.HIGHEST_PROTOCOL))
+    return len(batch), len(rejects), pieces
+
+
+def run_sharded(source, rules: List[Rule], workers: int, source_type='csv',
+                batch_size: int = DEFAULT_SHARD_BATCH_SIZE,
+                parse_workers: Optional[int] = None,
+                chunk_bytes: int = DEFAULT_SHARD_CHUNK_BYTES,
+                on_alert: Optional[Callable] = None) -> DetectionSummary:
+    """
+    Run detection over `source` across `workers` processes.
+
+    Every worker gets its own deep copy of `rules`, so pass rules without
+    accumulated state. The result is identical to running the same rules
+    over the stream in a single process, sequence numbers included.
+
+    A CSV file is split into row-aligned byte ranges (see
+    `fraud_engine.parallel_ingest`) that a pool of parse workers validates
+    and partitions by user; the parent only forwards each range's pickled
+    pieces to the detection workers, in file order. Other sources are
+    validated by `pipeline` in the parent and routed in rounds of
+    `batch_size` records per worker.
+
+    Workers report their alerts after each range or round, and a collector
+    thread releases them in input order as soon as every worker has moved
+    past them, so only the alerts of the rounds in flight are held.
+
+    Args:
+        source (str): Path to file or API endpoint.
+        rules (List[Rule]): Rule instances to replicate into each worker.
+        workers (int): Number of worker processes.
+        source_type (str): 'csv', 'json', or 'api'
+        batch_size (int): Records per worker per round (non-CSV sources).
+        parse_workers (int, optional): CSV parse processes (default: `workers`).
+        chunk_bytes (int): Approximate bytes per parsed CSV range.
+        on_alert (callable, optional): Called as on_alert(seq, transaction_id,
+            user_id, flags) for each alert, in input order, from the collector
+            thread. Without it alerts are kept in the summary's `alerts`.
+
+    Returns:
+        DetectionSummary: Merged results in input order.
+    """
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+
+    header, ranges = None, []
+    if source_type == 'csv':
+        path = _resolve_path(source)
+        header, ranges = split_byte_ranges(path, chunk_bytes)
+        if ranges:
+            _column_positions(header)
+
+    merged = DetectionSummary(track_first_seen=True)
+
+    def emit(alert):
+        merged.count_alert(alert)
+        if on_alert is None:
+            merged.alerts.append(alert)
+        else:
+            on_alert(*alert)
+
+    ctx = multiprocessing.get_context()
+    tasks, results, procs = [], [], []
+    for _ in range(workers):
+        task_recv, task_send = ctx.Pipe(duplex=False)
+        result_recv, result_send = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_worker_main,
+                           args=(task_recv, result_send, copy.deepcopy(rules)), daemon=True)
+        proc.start()
+        task_recv.close()
+        result_send.close()
+        tasks.append(task_send)
+        results.append(result_recv)
+        procs.append(proc)
+
+    parts, errors = [None] * workers, []
+    collector = threading.Thread(target=_collect, daemon=True,
+                                 args=(results, procs, _AlertMerger(workers, emit), parts, errors))
+    collector.start()
+    rejected = 0
+    try:
+        try:
+            if source_type == 'csv':
+                seq = 0
+                task = functools.partial(_partition_range, shards=workers)
+                parsed = _parsed_ranges(path, header, ranges, parse_workers or workers,
+                                        ordered=True, task=task)
+                for _, (valid, invalid, pieces) in parsed:
+                    # Every worker hears about every range, so all can report progress
+                    for conn, piece in zip(tasks, pieces):
+                        conn.send((seq, piece, seq + valid))
+                    seq += valid
+                    rejected += invalid
+            else:
+                records = enumerate(pipeline(source, source_type))
+                while True:
+                    round_ = list(itertools.islice(records, batch_size * workers))
+                    if not round_:
+                        break
+                    shares = [([], []) for _ in range(workers)]
+                    for seq, txn in round_:
+                        seqs, txns = shares[shard_for(txn.user_id, workers)]
+                        seqs.append(seq)
+                        txns.append(txn)
+                    for conn, (seqs, txns) in zip(tasks, shares):
+                        conn.send((seqs, txns, round_[-1][0] + 1))
+            for conn in tasks:
+                conn.send(None)
+        except OSError:
+            if not errors:
+                raise
+        collector.join()
+        if errors:
+            raise errors[0]
+    finally:
+        for conn in tasks:
+            conn.close()
+        for proc in procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        collector.join()
+        for conn in results:
+            conn.close()
+
+    DetectionSummary.merge(parts, into=merged)
+    merged.rejected += rejected
+    return merged
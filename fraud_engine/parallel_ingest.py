@@ -0,0 +1,207 @@
+"""
+parallel_ingest.py
+
+Multi-process CSV parsing by byte range.
+
+`read_csv_batches` parses on a single core. For large files,
+`read_csv_parallel` splits the data section of the file into byte ranges that
+start and end on row boundaries, parses and validates each range in a worker
+process with `parse_rows`, and returns the columnar batches to the parent.
+
+Boundaries are placed at a newline that is outside any quoted field: quotes
+are counted from the start of the data section, and since an escaped quote
+("") adds two, an even count means the newline really ends a row. Files
+without any quote character skip the counting entirely.
+
+Key Responsibilities:
+    - Split a CSV file into row-aligned byte ranges (quote-aware).
+    - Parse ranges in a process pool with a bounded number in flight.
+    - Re-intern user ids into the parent's `UserInterner`.
+    - Deliver batches in file order (`ordered=True`, required by stateful
+      rules) or as soon as each range is parsed (`ordered=False`).
+
+Typical usage:
+    from fraud_engine.parallel_ingest import read_csv_parallel
+
+    for batch in read_csv_parallel("big.csv", workers=8):
+        masks = detector.evaluate_batch(batch)
+"""
+import csv
+import io
+import mmap
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from fraud_engine.batch import TransactionBatch, UserInterner
+from fraud_engine.ingest import RejectedRow, _column_positions, parse_rows
+
+DEFAULT_CHUNK_BYTES = 16 * 1024 * 1024
+
+
+def _next_row_end(mm, pos: int, parity: int, limit: int) -> Tuple[int, int]:
+    """
+    Find the first newline at or after `pos` that ends a row.
+
+    Args:
+        mm: Memory-mapped file.
+        pos (int): Where to start looking.
+        parity (int): Quote count parity (0/1) of the bytes before `pos`,
+            or -1 when the file has no quotes at all.
+        limit (int): End of the file.
+
+    Returns:
+        (int, int): Offset just past the newline (or `limit`), and the
+            quote parity at that offset.
+    """
+    while True:
+        nl = mm.find(b"\n", pos)
+        if nl == -1:
+            return limit, 0
+        if parity < 0:
+            return nl + 1, -1
+        parity = (parity + mm[pos:nl + 1].count(b'"')) % 2
+        if parity == 0:
+            return nl + 1, 0
+        pos = nl + 1
+
+
+def split_byte_ranges(path: str, chunk_bytes: int = DEFAULT_CHUNK_BYTES):
+    """
+    Read the header and split the rest of a CSV file into row-aligned ranges.
+
+    Returns:
+        (list, list): The parsed header and a list of (start, end) byte offsets.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return [], []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        parity = 0 if mm.find(b'"') != -1 else -1
+        data_start, parity = _next_row_end(mm, 0, parity, size)
+        header_text = mm[:data_start].decode("utf-8-sig")
+        header = next(csv.reader(io.StringIO(header_text)), [])
+
+        ranges = []
+        start = data_start
+        while start < size:
+            if start + chunk_bytes >= size:
+                ranges.append((start, size))
+                break
+            # Count quotes up to the candidate offset, then move to the row end
+            if parity >= 0:
+                parity = (parity + mm[start:start + chunk_bytes].count(b'"')) % 2
+            end, parity = _next_row_end(mm, start + chunk_bytes, parity, size)
+            ranges.append((start, end))
+            start = end
+    return header, ranges
+
+
+def _parse_range(path: str, start: int, end: int, header: List[str]):
+    """Worker: parse one byte range with a private interner."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+    rows = [row for row in csv.reader(io.StringIO(text, newline="")) if row]
+    rejects = []
+    batch = parse_rows(header, rows, UserInterner(), rejects=rejects)
+    return batch, rejects, len(rows)
+
+
+def _reintern(batch: TransactionBatch, interner: UserInterner) -> TransactionBatch:
+    """Translate a worker batch's user codes into the parent's interner."""
+    local_to_global = interner.intern_many(batch.user_ids)
+    if len(local_to_global):
+        batch.user_code = local_to_global[batch.user_code]
+    else:
+        batch.user_code = np.zeros(0, dtype=np.int64)
+    batch.user_ids = interner.user_ids
+    return batch
+
+
+def _parsed_ranges(path: str, header: List[str], ranges: list, workers: int, ordered: bool,
+                   task: Callable = _parse_range):
+    """
+    Yield (range index, worker result) in file order or in completion order.
+    `task(path, start, end, header)` runs in the workers (default: `_parse_range`).
+    """
+    if workers == 1 or len(ranges) == 1:
+        for i, (start, end) in enumerate(ranges):
+            yield i, task(path, start, end, header)
+        return
+
+    todo = deque(enumerate(ranges))
+    max_in_flight = 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        def submit(n_in_flight):
+            """Start ranges until `max_in_flight` are running; return (index, future) pairs."""
+            started = []
+            while todo and n_in_flight + len(started) < max_in_flight:
+                i, (start, end) = todo.popleft()
+                started.append((i, pool.submit(task, path, start, end, header)))
+            return started
+
+        if ordered:
+            queue = deque(submit(0))
+            while queue:
+                i, future = queue.popleft()
+                result = future.result()
+                queue.extend(submit(len(queue)))
+                yield i, result
+        else:
+            futures = {future: i for i, future in submit(0)}
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield futures.pop(future), future.result()
+                futures.update((future, i) for i, future in submit(len(futures)))
+
+
+def read_csv_parallel(path: str, workers: Optional[int] = None,
+                      chunk_bytes: int = DEFAULT_CHUNK_BYTES, ordered: bool = True,
+                      rejects: Optional[list] = None,
+                      interner: Optional[UserInterner] = None) -> Iterator[TransactionBatch]:
+    """
+    Stream a CSV file as validated columnar batches parsed in parallel.
+
+    Args:
+        path (str): Path to the CSV file.
+        workers (int, optional): Worker processes (default: CPU count).
+        chunk_bytes (int): Approximate bytes per parsed range (one batch each).
+        ordered (bool): Yield batches in file order. With False, batches come
+            in completion order and must only feed stateless processing.
+        rejects (list, optional): Invalid rows are appended as `RejectedRow`
+            with file-wide row indices, in file order, as soon as every
+            earlier range has been parsed.
+        interner (UserInterner, optional): Shared interner for user codes.
+
+    Yields:
+        TransactionBatch: The valid rows of one byte range.
+    """
+    interner = interner if interner is not None else UserInterner()
+    header, ranges = split_byte_ranges(path, chunk_bytes)
+    if not ranges:
+        return
+    _column_positions(header)
+    workers = workers or os.cpu_count() or 1
+
+    row_counts = [0] * len(ranges)
+    range_rejects = [None] * len(ranges)
+    next_range, rows_before = 0, 0
+
+    for i, (batch, bad, n_rows) in _parsed_ranges(path, header, ranges, workers, ordered):
+        row_counts[i], range_rejects[i] = n_rows, bad
+        # Reject indices are file-wide, so only emit them once every earlier range is counted
+        while next_range < len(ranges) and range_rejects[next_range] is not None:
+            if rejects is not None:
+                rejects.extend(RejectedRow(rows_before + r.index, r.reason, r.row)
+                               for r in range_rejects[next_range])
+            rows_before += row_counts[next_range]
+            range_rejects[next_range] = ()
+            next_range += 1
+        batch = _reintern(batch, interner)
+        if len(batch):
+            yield batch
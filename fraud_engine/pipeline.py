@@ -23,58 +23,149 @@ Author: Parth Tiwari
 Created: 2025-09-11
 """
 import csv
-import requests  # type: ignore
-import json
+import logging
 import os
 from fraud_engine.schema import validate_transaction
 from fraud_engine.exceptions import InvalidTransactionError
+from fraud_engine.ingest import read_csv_batches, DEFAULT_BATCH_SIZE, RejectedRow
+from fraud_engine.jsonstream import iter_json_records
+# The API (aiohttp), multi-process and columnar readers are imported by the
+# branches that use them: a CSV run should not pay for an HTTP client.
 
+logger = logging.getLogger("fraud_engine")
 
-def pipeline(source, source_type='csv'):
+
+def _resolve_path(source):
+    """Build absolute path relative to project root (absolute paths pass through)."""
+    base_dir = os.path.dirname(os.path.dirname(__file__))  # fraudx/
+    return os.path.join(base_dir, source)
+
+
+def pipeline(source, source_type='csv', strict=False, rejects=None, metrics=None, workers=1,
+             dedup=None):
     """
     Generic pipeline to read data from CSV, JSON, or API
     and validate each record using schema.py.
+
+    CSV files are read through the columnar fast path in `ingest.py` by default;
+    pass `strict=True` to build every row through `validate_transaction` instead.
     
     Args:
-        source (str): Path to file or API endpoint.
-        source_type (str): 'csv', 'json', or 'api'
+        source (str): Path to file or API endpoint (or an AsyncApiSource).
+        source_type (str): 'csv', 'json', 'ndjson', 'api', or 'columnar'
+            (a store directory written by `columnar.convert_to_columnar`)
+        strict (bool): Use full per-row Pydantic validation for CSV.
+        rejects (list, optional): Collects invalid records as `RejectedRow`
+            (otherwise the CSV fast path logs how many were skipped and
+            the other sources print each one).
+        metrics (PipelineMetrics, optional): Counts delivered and rejected records.
+        workers (int): Processes parsing the CSV fast path (file order is kept).
+        dedup (Deduplicator, optional): Drop transactions whose id was already
+            delivered within its retention horizon (see `dedup.py`).
         
     Yields:
         Transaction: Validated Pydantic Transaction object
     """
-    if source_type == 'csv':
-        # Build absolute path relative to project root
-        base_dir = os.path.dirname(os.path.dirname(__file__))  # fraudx/
-        file_path = os.path.join(base_dir, source)
+    if metrics is not None:
+        yield from _counted(source, source_type, strict, rejects, metrics, workers, dedup)
+        return
 
-        with open(file_path, mode="r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                try:
-                    yield validate_transaction(row)
-                except InvalidTransactionError as e:
-                    print(f"Skipping invalid transaction: {e}")
+    if dedup is not None and not (source_type == 'csv' and not strict or source_type == 'columnar'):
+        # Batch sources deduplicate whole batches in `batch_pipeline` instead
+        yield from dedup.filter(pipeline(source, source_type, strict, rejects, workers=workers))
+        return
+
+    if source_type == 'csv' and not strict:
+        collected = rejects if rejects is not None else []
+        for batch in batch_pipeline(source, source_type, rejects=collected, workers=workers,
+                                    dedup=dedup):
+            yield from batch.rows()
+        if rejects is None and collected:
+            logger.warning(f"Skipped {len(collected)} invalid transactions")
 
-    elif source_type == 'json':
-        base_dir = os.path.dirname(os.path.dirname(__file__))
-        file_path = os.path.join(base_dir, source)
+    elif source_type == 'csv':
+        file_path = _resolve_path(source)
 
         with open(file_path, mode="r", encoding="utf-8") as f:
-            data = json.load(f)
-            for row in data:
-                try:
-                    yield validate_transaction(row)
-                except InvalidTransactionError as e:
-                    print(f"Skipping invalid transaction: {e}")
+            yield from _validated(csv.DictReader(f), rejects)
+
+    elif source_type in ('json', 'ndjson'):
+        # Both a top-level JSON array and NDJSON are streamed record by record
+        file_path = _resolve_path(source)
+        yield from _validated(iter_json_records(file_path), rejects)
+
+    elif source_type == 'columnar':
+        # Already validated and typed on conversion: no parsing, only memory-mapped reads
+        for batch in batch_pipeline(source, source_type, dedup=dedup):
+            yield from batch.rows()
 
     elif source_type == 'api':
-        response = requests.get(source)
-        data = response.json()
-        for row in data:
-            try:
-                yield validate_transaction(row)
-            except InvalidTransactionError as e:
+        from fraud_engine.api_source import AsyncApiSource
+        # `source` may be a URL or a configured AsyncApiSource (pagination, concurrency)
+        api_source = source if isinstance(source, AsyncApiSource) else AsyncApiSource(source)
+        yield from api_source
+
+    else:
+        raise ValueError("Unsupported source_type. Use 'csv', 'json', 'ndjson', 'api', or 'columnar'.")
+
+
+def _validated(rows, rejects=None):
+    """Validate raw record dicts one by one; invalid ones go to `rejects` or are printed."""
+    for index, row in enumerate(rows):
+        try:
+            yield validate_transaction(row)
+        except InvalidTransactionError as e:
+            if rejects is None:
                 print(f"Skipping invalid transaction: {e}")
+            else:
+                rejects.append(RejectedRow(index, str(e), row))
+
+
+def _counted(source, source_type, strict, rejects, metrics, workers, dedup=None):
+    """`pipeline` with record / reject counting (see PipelineMetrics)."""
+    metrics.start()
+    collected = rejects if rejects is not None else []
+    already_rejected = metrics.rejected - len(collected)
+    for txn in pipeline(source, source_type, strict, collected, workers=workers, dedup=dedup):
+        metrics.records += 1
+        metrics.rejected = already_rejected + len(collected)
+        yield txn
+    metrics.rejected = already_rejected + len(collected)
+    if rejects is None and collected:
+        logger.warning(f"Skipped {len(collected)} invalid transactions")
+
+
+def batch_pipeline(source, source_type='csv', batch_size=DEFAULT_BATCH_SIZE,
+                   rejects=None, interner=None, workers=1, ordered=True, dedup=None):
+    """
+    High-throughput pipeline yielding columnar batches instead of
+    one Transaction per row. Invalid rows are appended to `rejects`.
+
+    Args:
+        source (str): Path to file.
+        source_type (str): 'csv' or 'columnar'
+        batch_size (int): Rows per batch.
+        rejects (list, optional): Collects `RejectedRow` records.
+        interner (UserInterner, optional): Shared user id interner.
+        workers (int): Parse byte ranges of the file in this many processes
+            (see `parallel_ingest.read_csv_parallel`); 1 parses in-process.
+        ordered (bool): With workers > 1, keep file order (needed by stateful
+            rules). False yields batches as soon as they are parsed.
+        dedup (Deduplicator, optional): Drop rows whose id was already seen.
 
+    Yields:
+        TransactionBatch: Validated columnar batch
+    """
+    if source_type == 'csv' and workers > 1:
+        from fraud_engine.parallel_ingest import read_csv_parallel
+        batches = read_csv_parallel(_resolve_path(source), workers=workers, ordered=ordered,
+                                    rejects=rejects, interner=interner)
+    elif source_type == 'csv':
+        batches = read_csv_batches(_resolve_path(source), batch_size=batch_size,
+                                   rejects=rejects, interner=interner)
+    elif source_type == 'columnar':
+        from fraud_engine.columnar import ColumnarStore
+        batches = ColumnarStore(_resolve_path(source)).batches(batch_size, interner=interner)
     else:
-        raise ValueError("Unsupported source_type. Use 'csv', 'json', or 'api'.")
+        raise ValueError("Unsupported source_type for batch_pipeline. Use 'csv' or 'columnar'.")
+    yield from batches if dedup is None else dedup.filter_batches(batches)
@@ -0,0 +1,292 @@
+"""
+plan.py
+
+Rule plan compiler for the Fraud Detection Engine.
+
+`FraudDetector.evaluate` runs every rule in list order. A `RulePlan` compiles
+the configured rules into an execution plan instead:
+
+    1. Stateful rules always run, so their history sees every transaction.
+    2. Threshold-style rules (see `Rule.threshold_predicate`) are fused into
+       one predicate per (field, operator): a single comparison against the
+       loosest threshold rejects most transactions, and a bisect over the
+       sorted thresholds finds which rules fired otherwise.
+    3. The remaining stateless rules run in an adaptive order. Each rule's
+       cost (sampled with `perf_counter_ns`) and hit rate are measured while
+       running, and the rules are periodically re-sorted so cheap, selective
+       rules run first.
+
+In "first match" mode the plan stops evaluating stateless rules as soon as a
+transaction is flagged. In the default "all" mode every rule runs and the
+flags are identical to `FraudDetector.evaluate`. Flags are always reported in
+the configured rule order.
+
+Key Responsibilities:
+    - Fuse threshold rules into one predicate per field and operator.
+    - Measure per-rule cost and selectivity at runtime.
+    - Reorder stateless rules cheapest-and-most-selective first.
+    - Optionally short-circuit after the first match, never skipping stateful rules.
+
+Typical usage:
+    from fraud_engine.plan import RulePlan
+
+    plan = RulePlan(rules, first_match=True)
+    detector = FraudDetector(rules, plan=plan)
+"""
+import logging
+import operator
+from bisect import bisect_left, bisect_right
+from time import perf_counter_ns
+from typing import Dict, List
+
+from fraud_engine.rules.base import Rule
+
+PLAN_MODES = ("all", "first_match")
+DEFAULT_REORDER_EVERY = 4096
+DEFAULT_SAMPLE_EVERY = 16
+
+logger = logging.getLogger("fraud_engine")
+
+
+class RuleStats:
+    """Runtime counters for one plan step."""
+
+    __slots__ = ("calls", "hits", "sampled_calls", "sampled_ns")
+
+    def __init__(self):
+        self.calls = 0
+        self.hits = 0
+        self.sampled_calls = 0
+        self.sampled_ns = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.calls if self.calls else 0.0
+
+    @property
+    def avg_ns(self) -> float:
+        return self.sampled_ns / self.sampled_calls if self.sampled_calls else 0.0
+
+
+class FusedThresholds:
+    """
+    All threshold rules on one (field, op), evaluated with one comparison
+    plus a bisect. Returns the indices of the rules that fired.
+    """
+
+    _OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+    def __init__(self, field: str, op: str, thresholds: List[float], rule_indices: List[int]):
+        if op not in self._OPS:
+            raise ValueError(f"Unsupported threshold operator: {op!r}")
+        self.field = field
+        self.op = op
+        # Sort so the rules that fire for a value form a prefix (for > / >=)
+        # or a suffix (for < / <=) of the sorted thresholds.
+        pairs = sorted(zip(thresholds, rule_indices))
+        self.thresholds = [t for t, _ in pairs]
+        self.rule_indices = [i for _, i in pairs]
+
+    def __call__(self, txn) -> List[int]:
+        value = getattr(txn, self.field)
+        op, thresholds = self.op, self.thresholds
+        if op == ">":
+            if value <= thresholds[0]:
+                return []
+            return self.rule_indices[:bisect_left(thresholds, value)]
+        if op == ">=":
+            if value < thresholds[0]:
+                return []
+            return self.rule_indices[:bisect_right(thresholds, value)]
+        if op == "<":
+            if value >= thresholds[-1]:
+                return []
+            return self.rule_indices[bisect_right(thresholds, value):]
+        if value > thresholds[-1]:
+            return []
+        return self.rule_indices[bisect_left(thresholds, value):]
+
+
+class RulePlan:
+    """
+    Compiled, adaptive execution plan for a list of rules.
+
+    Args:
+        rules (List[Rule]): Rules in configured order (defines flag order).
+        first_match (bool): Stop running stateless rules once flagged.
+        reorder_every (int): Re-sort stateless rules every N evaluations.
+        sample_every (int): Time one in N evaluations with perf_counter_ns.
+    """
+
+    def __init__(self, rules: List[Rule], first_match: bool = False,
+                 reorder_every: int = DEFAULT_REORDER_EVERY,
+                 sample_every: int = DEFAULT_SAMPLE_EVERY):
+        self.rules = rules
+        self.first_match = first_match
+        self.reorder_every = reorder_every
+        self.sample_every = max(1, sample_every)
+        self.names = [r.name for r in rules]
+
+        self.stateful = [i for i, r in enumerate(rules) if r.stateful]
+        groups: Dict[tuple, tuple] = {}
+        self.stateless = []
+        for i, rule in enumerate(rules):
+            if rule.stateful:
+                continue
+            predicate = rule.threshold_predicate()
+            if predicate is None:
+                self.stateless.append(i)
+                continue
+            field, op, value = predicate
+            thresholds, indices = groups.setdefault((field, op), ([], []))
+            thresholds.append(value)
+            indices.append(i)
+        self.fused = [FusedThresholds(field, op, t, idx) for (field, op), (t, idx) in groups.items()]
+
+        self.stats = {i: RuleStats() for i in range(len(rules))}
+        self.fused_stats = [RuleStats() for _ in self.fused]
+        self._evaluations = 0
+        # Optional DetectorMetrics, attached by FraudDetector
+        self.metrics = None
+
+    @classmethod
+    def from_config(cls, plan_config: dict, rules: List[Rule]) -> "RulePlan":
+        """
+        Build a plan from the `plan:` section of rules.config.yaml, e.g.
+
+            plan:
+              mode: "first_match"     # or "all"
+              reorder_every: 4096
+              sample_every: 16
+        """
+        plan_config = dict(plan_config or {})
+        mode = plan_config.pop("mode", "all")
+        if mode not in PLAN_MODES:
+            raise ValueError(f"Unknown plan mode: {mode!r}. Use one of {PLAN_MODES}.")
+        return cls(rules, first_match=(mode == "first_match"), **plan_config)
+
+    def _run_rule(self, i: int, txn, sample: bool, hits: List[int]):
+        rule, stats, m = self.rules[i], self.stats[i], self.metrics
+        stats.calls += 1
+        if m is not None:
+            m.calls[i] += 1
+        try:
+            if sample:
+                start = perf_counter_ns()
+                hit = rule.check(txn)
+                elapsed = perf_counter_ns() - start
+                stats.sampled_ns += elapsed
+                stats.sampled_calls += 1
+                if m is not None:
+                    m.latency[i].observe(elapsed)
+            else:
+                hit = rule.check(txn)
+        except Exception as e:
+            if m is not None:
+                m.errors[i] += 1
+            logger.error(f"Rule {self.names[i]} failed: {e}")
+            return
+        if hit:
+            stats.hits += 1
+            hits.append(i)
+            if m is not None:
+                m.hits[i] += 1
+
+    def _run_fused(self, k: int, txn, sample: bool, hits: List[int]):
+        fused, stats, m = self.fused[k], self.fused_stats[k], self.metrics
+        stats.calls += 1
+        for i in fused.rule_indices:
+            self.stats[i].calls += 1
+            if m is not None:
+                m.calls[i] += 1
+        try:
+            if sample:
+                start = perf_counter_ns()
+                fired = fused(txn)
+                elapsed = perf_counter_ns() - start
+                stats.sampled_ns += elapsed
+                stats.sampled_calls += 1
+                if m is not None:
+                    # The fused check is one comparison shared by its rules
+                    for i in fused.rule_indices:
+                        m.latency[i].observe(elapsed)
+            else:
+                fired = fused(txn)
+        except Exception as e:
+            names = ", ".join(self.names[i] for i in fused.rule_indices)
+            if m is not None:
+                for i in fused.rule_indices:
+                    m.errors[i] += 1
+            logger.error(f"Fused threshold rules ({names}) failed: {e}")
+            return
+        if fired:
+            if self.first_match:
+                # One flag is enough; report the first in configured order
+                fired = [min(fired)]
+            stats.hits += 1
+            hits.extend(fired)
+            for i in fired:
+                self.stats[i].hits += 1
+                if m is not None:
+                    m.hits[i] += 1
+
+    def run(self, txn, sample: bool = False) -> List[str]:
+        """
+        Evaluate the plan on one transaction; return flag names in rule order.
+        `sample` forces timing of this evaluation (on top of `sample_every`).
+        """
+        self._evaluations += 1
+        sample = sample or self._evaluations % self.sample_every == 0
+        hits: List[int] = []
+
+        for i in self.stateful:
+            self._run_rule(i, txn, sample, hits)
+
+        for k in range(len(self.fused)):
+            if self.first_match and hits:
+                break
+            self._run_fused(k, txn, sample, hits)
+
+        for i in self.stateless:
+            if self.first_match and hits:
+                break
+            self._run_rule(i, txn, sample, hits)
+
+        if self._evaluations % self.reorder_every == 0:
+            self.reorder()
+
+        if len(hits) > 1:
+            hits.sort()
+        return [self.names[i] for i in hits]
+
+    def reorder(self):
+        """
+        Re-sort stateless rules by expected cost per flag (cost / hit rate),
+        so cheap and selective rules run first; fused predicates likewise.
+        Unsampled rules keep their relative position at the front.
+        """
+        def rank(stats: RuleStats):
+            if not stats.sampled_calls:
+                return 0.0
+            return stats.avg_ns / max(stats.hit_rate, 1e-6)
+
+        self.stateless.sort(key=lambda i: rank(self.stats[i]))
+        order = sorted(range(len(self.fused)), key=lambda k: rank(self.fused_stats[k]))
+        self.fused = [self.fused[k] for k in order]
+        self.fused_stats = [self.fused_stats[k] for k in order]
+
+    def report(self) -> List[dict]:
+        """Per-rule runtime statistics, in current execution order."""
+        order = self.stateful + [i for f in self.fused for i in f.rule_indices] + self.stateless
+        fused_of = {i: f"{f.field} {f.op}" for f in self.fused for i in f.rule_indices}
+        fused_ns = {i: stats.avg_ns for f, stats in zip(self.fused, self.fused_stats)
+                    for i in f.rule_indices}
+        return [{
+            "rule": self.names[i],
+            "stateful": i in self.stateful,
+            "fused": fused_of.get(i),
+            "calls": self.stats[i].calls,
+            "hits": self.stats[i].hits,
+            "hit_rate": self.stats[i].hit_rate,
+            "avg_ns": fused_ns.get(i, self.stats[i].avg_ns),
+        } for i in order]
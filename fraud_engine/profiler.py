@@ -5,31 +5,50 @@ class Profiler:
     """
     Evaluates transactions against dynamic user profiles.
     Returns flags based on deviations from user's historical behavior.
+
+    Args:
+        z_threshold (float): Flag amounts this many standard deviations above
+            the user's mean.
+        min_history (int): Transactions needed before z-scores are trusted.
+        profile_engine (ProfileEngine, optional): Profiles shared with the rest
+            of the engine. Their owner updates them; the profiler only reads,
+            so evaluate each transaction before its profile update. Without
+            it the profiler keeps and updates profiles of its own.
     """
 
-    def __init__(self):
-        self.profile_engine = ProfileEngine()
+    def __init__(self, z_threshold=3.0, min_history=5, profile_engine=None):
+        self._owns_profiles = profile_engine is None
+        self.profile_engine = ProfileEngine() if profile_engine is None else profile_engine
+        self.z_threshold = z_threshold
+        self.min_history = min_history
 
     def evaluate(self, txn):
         """
         Returns list of dynamic flags for the transaction.
-        Updates user profile after evaluation.
+        Updates user profile after evaluation (own profiles only).
         """
         flags = []
 
-        # Fetch user's profile
-        profile = self.profile_engine.get_profile(txn.user_id)
-        avg_amount = profile["avg_amount"]
+        # Fetch user's (count, mean, std) straight from the profile arrays
+        stats = self.profile_engine.stats(txn.user_id)
+        if stats is not None:
+            count, avg_amount, std_amount = stats
+
+            # Dynamic large transaction: amount >= 3x user's average
+            if avg_amount > 0 and txn.amount >= 3 * avg_amount:
+                flags.append("DynamicLargeTransactionRule")
 
-        # Dynamic large transaction: amount >= 3x user's average
-        if avg_amount > 0 and txn.amount >= 3 * avg_amount:
-            flags.append("DynamicLargeTransactionRule")
+            # Statistical outlier: z-score against the user's own history
+            if (count >= self.min_history and std_amount > 0
+                    and (txn.amount - avg_amount) / std_amount >= self.z_threshold):
+                flags.append("ZScoreDeviationRule")
 
         # Absolute threshold rule
         if is_large_transaction(txn):
             flags.append("LargeTransactionRule")
 
         # Update user profile after evaluation
-        self.profile_engine.update_profile(txn)
+        if self._owns_profiles:
+            self.profile_engine.update_profile(txn)
 
         return flags
@@ -13,6 +13,7 @@ Key Responsibilities:
     - Enforce a consistent interface for rule registration, configuration, and application.
     - Enable extensibility (easy to add, remove, or swap rules without changing the engine core).
     - Support both simple (stateless) and complex (stateful/history-aware) rules.
+    - Offer an optional vectorized `check_batch` hook for columnar batches.
 
 Typical usage:
     class MyRule(FraudRule):
@@ -24,11 +25,26 @@ Typical usage:
 # fraud_engine/rules/base.py
 
 from abc import ABC, abstractmethod
+import numpy as np
 from fraud_engine.schema import Transaction
+from fraud_engine.batch import TransactionBatch
 
 
 class Rule(ABC):
-    """Abstract base class for all fraud detection rules."""
+    """
+    Abstract base class for all fraud detection rules.
+
+    Attributes:
+        stateful (bool): True if the rule keeps history and must therefore
+            see every transaction (the rule planner never skips it).
+    """
+
+    stateful = False
+
+    @property
+    def name(self) -> str:
+        """Name used in flags, metrics and alerts (the class name by default)."""
+        return self.__class__.__name__
 
     @abstractmethod
     def check(self, transaction: Transaction) -> bool:
@@ -42,3 +58,32 @@ class Rule(ABC):
             bool: True if transaction is suspicious/fraudulent, False otherwise.
         """
         pass
+
+    def threshold_predicate(self):
+        """
+        Describe this rule as a plain threshold comparison, if it is one.
+
+        Rules that return (field, op, value), e.g. ("amount", ">", 10000.0),
+        can be fused with other threshold rules by the rule planner.
+        `op` is one of ">", ">=", "<", "<=".
+
+        Returns:
+            tuple or None: (field, op, value), or None if not a threshold rule.
+        """
+        return None
+
+    def check_batch(self, batch: TransactionBatch) -> np.ndarray:
+        """
+        Check every transaction in a columnar batch.
+
+        Rules with a vectorized implementation should override this.
+        The default falls back to calling `check` once per row, in order.
+
+        Args:
+            batch (TransactionBatch): Columnar batch of transactions.
+
+        Returns:
+            np.ndarray: Boolean array, True where the transaction is suspicious.
+        """
+        return np.fromiter((self.check(txn) for txn in batch.rows()),
+                           dtype=bool, count=len(batch))
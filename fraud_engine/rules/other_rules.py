@@ -1,5 +1,7 @@
+import numpy as np
 from fraud_engine.rules.base import Rule
 from fraud_engine.schema import Transaction
+from fraud_engine.batch import TransactionBatch
 
 
 class LargeTransactionRule(Rule):
@@ -11,4 +13,8 @@ class LargeTransactionRule(Rule):
     def check(self, transaction: Transaction) -> bool:
         return transaction.amount > self.threshold
 
+    def threshold_predicate(self):
+        return ("amount", ">", self.threshold)
 
+    def check_batch(self, batch: TransactionBatch) -> np.ndarray:
+        return batch.amount > self.threshold
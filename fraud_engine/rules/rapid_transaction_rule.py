@@ -1,4 +1,3 @@
-
 """
     Fraud detection rule to flag rapid-fire transactions by a single user.
 
@@ -8,7 +7,9 @@
     Attributes:
         max_txns (int): Maximum allowed transactions in the window before flagging as fraud.
         window (timedelta): Duration of the rolling time window to consider.
-        _user_txn_times (defaultdict): Tracks recent transaction timestamps for each user.
+        aggregator (SlidingWindowAggregator): Per-user window counts. A private
+            aggregator keeps at most `max_txns + 1` timestamps per user; idle
+            users are evicted.
 
     Example:
         Flags if a user makes >3 transactions in any 1-minute window.
@@ -20,31 +21,23 @@
 
 
 
-from fraud_engine.rules.base import Rule
-from fraud_engine.schema import Transaction
-from collections import defaultdict, deque
-from datetime import timedelta
+from fraud_engine.rules.velocity_rule import VelocityRule
+
 
-class RapidTransactionsRule(Rule):
+class RapidTransactionsRule(VelocityRule):
     """
     Flags users who make more than `max_txns` within `window_minutes`.
+
+    A count velocity rule over `user_id`. Only the newest `max_txns + 1`
+    timestamps matter for that decision, so unless the rule shares an
+    aggregator with other velocity rules, each user's history is capped
+    there. Users idle for longer than `idle_minutes` (default: one window)
+    are evicted.
     """
 
-    def __init__(self, max_txns=3, window_minutes=1):
+    def __init__(self, max_txns=3, window_minutes=1, idle_minutes=None, aggregators=None):
         self.max_txns = max_txns
-        self.window = timedelta(minutes=window_minutes)
-        # Store recent transaction times per user
-        self._user_txn_times = defaultdict(deque)
-
-    def check(self, transaction: Transaction) -> bool:
-        now = transaction.timestamp
-        user = transaction.user_id
-        txns = self._user_txn_times[user]
-
-        # Add new timestamp, drop old ones outside the window
-        txns.append(now)
-        while txns and (now - txns[0] > self.window):
-            txns.popleft()
-
-        # Flag if count exceeds allowed
-        return len(txns) > self.max_txns
+        super().__init__(key="user_id", aggregate="count", window_minutes=window_minutes,
+                         op=">", threshold=max_txns, idle_minutes=idle_minutes,
+                         aggregators=aggregators,
+                         max_events=max_txns + 1 if aggregators is None else None)
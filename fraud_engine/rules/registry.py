@@ -0,0 +1,135 @@
+"""
+registry.py
+
+Lazily loaded registry of rule types.
+
+Rule configurations name their class by `type`. The registry maps those
+names to import targets ("module:Class") and imports a rule's module only
+when a configuration actually uses it, so listing or validating rule types
+does not pull in NumPy, Pydantic and the window machinery.
+
+Rules shipped with the engine are registered by name. Other packages add
+rules without editing this file, either at runtime (`register`) or by
+declaring an entry point in the `fraudx.rules` group:
+
+    [project.entry-points."fraudx.rules"]
+    MerchantBlocklistRule = "my_package.rules:MerchantBlocklistRule"
+
+Installed entry points are only scanned when a name is not found among the
+registered rules, or when every name is listed.
+
+Key Responsibilities:
+    - Resolve rule type names to classes on first use (`RuleRegistry.get`).
+    - Discover third-party rules through `fraudx.rules` entry points.
+    - Behave as a read-only mapping, so it can stand in for a name -> class dict.
+
+Typical usage:
+    from fraud_engine.rules.registry import RULES
+
+    cls = RULES.get("VelocityRule")
+    RULES.register("MyRule", "my_package.rules:MyRule")
+    sorted(RULES)
+"""
+import hashlib
+import importlib
+import logging
+from collections.abc import Mapping
+from typing import Dict, Iterator, Optional, Union
+
+logger = logging.getLogger("fraud_engine")
+
+ENTRY_POINT_GROUP = "fraudx.rules"
+
+BUILTIN_RULES = {
+    "RapidTransactionsRule": "fraud_engine.rules.rapid_transaction_rule:RapidTransactionsRule",
+    "LargeTransactionRule": "fraud_engine.rules.other_rules:LargeTransactionRule",
+    "VelocityRule": "fraud_engine.rules.velocity_rule:VelocityRule",
+}
+
+
+def _import_target(target: str) -> type:
+    module, _, attr = target.partition(":")
+    if not module or not attr:
+        raise ValueError(f"Rule target must look like 'package.module:Class', got {target!r}")
+    return getattr(importlib.import_module(module), attr)
+
+
+class RuleRegistry(Mapping):
+    """
+    Rule type name -> rule class, imported on first lookup.
+
+    Args:
+        rules (dict, optional): Name -> "module:Class" target or class
+            (default: the built-in rules).
+        group (str, optional): Entry point group scanned for more rules
+            (None: do not scan).
+    """
+
+    def __init__(self, rules: Optional[Dict[str, Union[str, type]]] = None,
+                 group: Optional[str] = ENTRY_POINT_GROUP):
+        self._targets: Dict[str, Union[str, type]] = dict(BUILTIN_RULES if rules is None else rules)
+        self._classes: Dict[str, type] = {}
+        self._group = group
+        self._scanned = group is None
+
+    def register(self, name: str, target: Union[str, type]):
+        """Add or replace a rule type; `target` is a class or a "module:Class" string."""
+        self._targets[name] = target
+        self._classes.pop(name, None)
+
+    def _scan_entry_points(self):
+        if self._scanned:
+            return
+        self._scanned = True
+        from importlib.metadata import entry_points
+        for ep in entry_points(group=self._group):
+            # Explicit registrations win over installed plugins
+            self._targets.setdefault(ep.name, ep.value)
+
+    def __getitem__(self, name: str) -> type:
+        cls = self._classes.get(name)
+        if cls is not None:
+            return cls
+        if name not in self._targets:
+            self._scan_entry_points()
+            if name not in self._targets:
+                raise KeyError(name)
+        target = self._targets[name]
+        cls = target if isinstance(target, type) else _import_target(target)
+        self._classes[name] = cls
+        return cls
+
+    def __contains__(self, name) -> bool:
+        if name not in self._targets:
+            self._scan_entry_points()
+        return name in self._targets
+
+    def __iter__(self) -> Iterator[str]:
+        self._scan_entry_points()
+        return iter(list(self._targets))
+
+    def __len__(self) -> int:
+        self._scan_entry_points()
+        return len(self._targets)
+
+    def target(self, name: str) -> str:
+        """Where a rule type is defined ("module:Class"), without importing it."""
+        if name not in self:
+            raise KeyError(name)
+        return self._describe(self._targets[name])
+
+    @staticmethod
+    def _describe(target: Union[str, type]) -> str:
+        return target if isinstance(target, str) else f"{target.__module__}:{target.__qualname__}"
+
+    def fingerprint(self) -> str:
+        """
+        Hash of the registered names and targets, without importing or
+        scanning entry points (used to key cached validation results).
+        """
+        entries = sorted(f"{name}={self._describe(t)}" for name, t in self._targets.items())
+        return hashlib.sha256("\n".join(entries).encode("utf-8")).hexdigest()[:16]
+
+
+# Default registry used by the scripts and the CLI
+RULES = RuleRegistry()
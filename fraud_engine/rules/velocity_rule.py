@@ -0,0 +1,104 @@
+"""
+    Configurable velocity rule over a keyed sliding window.
+
+    Flags a transaction when an aggregate of the recent transactions sharing
+    its key (the transaction included) crosses a threshold, e.g. more than
+    20000 spent per user per hour, or more than 5 distinct locations per user
+    per day. Aggregates are maintained by a `SlidingWindowAggregator`; rules
+    over the same key share one aggregator and are computed in one pass.
+
+    Attributes:
+        key (str): Transaction field the window is grouped by.
+        aggregate (str): 'count', 'sum', 'min', 'max' or 'distinct'.
+        field (str): Aggregated field (not used by 'count').
+        window (timedelta): Window length.
+        op (str), threshold (float): Flag when `value <op> threshold`.
+        aggregator (SlidingWindowAggregator): Shared window state.
+
+    Usage (rules.config.yaml):
+        - type: "VelocityRule"
+          name: "HourlySpend"
+          key: "user_id"
+          aggregate: "sum"
+          field: "amount"
+          window_minutes: 60
+          threshold: 20000.0
+"""
+import operator
+from datetime import timedelta
+
+import numpy as np
+
+from fraud_engine.batch import TransactionBatch
+from fraud_engine.rules.base import Rule
+from fraud_engine.schema import Transaction
+from fraud_engine.windows import SlidingWindowAggregator, WindowMetric
+
+_OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+
+class VelocityRule(Rule):
+    """
+    Flags transactions whose windowed aggregate crosses a threshold.
+
+    Args:
+        name (str, optional): Rule name in flags and metrics (default: class name).
+        key, aggregate, field: See the module docstring.
+        window_minutes (float): Window length.
+        op (str): '>', '>=', '<' or '<='.
+        threshold (float): Value compared against.
+        idle_minutes (float, optional): Keep idle keys at least this long.
+        aggregators (dict, optional): Shared key field -> aggregator map;
+            rules built with the same dict share state per key.
+        max_events (int, optional): Cap on events kept per key in a private
+            count-only aggregator (see `SlidingWindowAggregator`).
+    """
+
+    stateful = True
+    windowed = True
+
+    def __init__(self, name=None, key="user_id", aggregate="count", field=None,
+                 window_minutes=60, op=">", threshold=0.0, idle_minutes=None,
+                 aggregators=None, max_events=None):
+        if op not in _OPS:
+            raise ValueError(f"Unsupported threshold operator: {op!r}")
+        self._name = name or self.__class__.__name__
+        self.key = key
+        self.aggregate = aggregate
+        self.field = field
+        self.window = timedelta(minutes=window_minutes)
+        self.op = op
+        self.threshold = threshold
+        self._compare = _OPS[op]
+
+        if aggregators is None:
+            self.aggregator = SlidingWindowAggregator(key, max_events=max_events)
+        else:
+            self.aggregator = aggregators.setdefault(key, SlidingWindowAggregator(key))
+        # The first rule on an aggregator checkpoints it for all of them
+        self._owns_state = not self.aggregator.metrics
+        idle = None if idle_minutes is None else idle_minutes * 60
+        self._index = self.aggregator.add_metric(
+            WindowMetric(aggregate, window_minutes * 60, field), idle_seconds=idle)
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def check(self, transaction: Transaction) -> bool:
+        return self._compare(self.aggregator.update(transaction)[self._index], self.threshold)
+
+    def check_batch(self, batch: TransactionBatch) -> np.ndarray:
+        return self._compare(self.aggregator.update_batch(batch)[:, self._index], self.threshold)
+
+    def memory_usage(self) -> int:
+        """Approximate bytes of window state (shared with rules on the same key)."""
+        return self.aggregator.memory_usage()
+
+    def snapshot_state(self, incremental: bool = False) -> dict:
+        """Export window state for a checkpoint (see `SlidingWindowAggregator`)."""
+        return self.aggregator.snapshot_state(incremental) if self._owns_state else {}
+
+    def restore_state(self, state: dict, incremental: bool = False):
+        if self._owns_state:
+            self.aggregator.restore_state(state, incremental)
@@ -20,11 +20,18 @@ Typical usage:
     cleaned_txn = validate_transaction(raw_txn_dict)
     # Now safe for rule processing
 """
+import re
 from fraud_engine.exceptions import InvalidTransactionError
 from pydantic import BaseModel, Field, ValidationError 
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional
 
+# Timestamp text accepted from files and APIs: "YYYY-MM-DD HH:MM:SS" (or "T"
+# between date and time), optional fraction of a second and UTC offset.
+# Pydantic alone would also take "2025" or "1694858400" as epoch seconds.
+# The columnar CSV parser (ingest.py) applies the same pattern.
+TIMESTAMP_RE = re.compile(r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:\.\d{1,6})?(?:Z|[+-]\d{2}:\d{2})?")
+
 class Transaction(BaseModel):
     transaction_id: str
     user_id: str
@@ -37,9 +44,17 @@ class Transaction(BaseModel):
 def validate_transaction(raw_txn: dict):
     """
     Validate and normalize a single transaction record.
+
+    Timestamps with a UTC offset are converted to naive UTC datetimes, the
+    representation the columnar CSV path (`TransactionBatch.rows`) produces.
     """
+    timestamp = raw_txn.get("timestamp")
+    if isinstance(timestamp, str) and TIMESTAMP_RE.fullmatch(timestamp) is None:
+        raise InvalidTransactionError(f"Transaction validation failed: invalid timestamp {timestamp!r}")
     try:
         txn = Transaction(**raw_txn)
-        return txn
     except ValidationError as e:
         raise InvalidTransactionError(f"Transaction validation failed: {e}")
+    if txn.timestamp.tzinfo is not None:
+        txn.timestamp = txn.timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return txn
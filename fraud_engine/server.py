@@ -0,0 +1,362 @@
+"""
+server.py
+
+Online scoring server with micro-batching.
+
+`scripts/run_detection.py` scores whole files. `ScoringServer` scores
+transactions on request over a local TCP or Unix socket (asyncio streams),
+so a payment path can ask for a verdict synchronously. Requests from all
+connections are gathered into micro-batches: the first transaction of a
+batch waits at most `latency_budget_ms` for others to arrive (or until
+`max_batch_size` is reached), then the whole batch is evaluated with one
+`FraudDetector.evaluate_batch` call and every waiting request is answered.
+
+Protocol (newline-delimited JSON, responses in request order per connection):
+    {"transaction_id": "t1", "user_id": "U1", ...}      -> {"transaction_id": "t1",
+                                                           "is_fraud": false, "flags": []}
+    [{...}, {...}]                                       -> [{verdict}, {verdict}]
+    {"command": "stats"}                                 -> {"transactions": ..., "p50_ms": ...}
+Invalid transactions are answered with {"error": "..."} in place of a verdict.
+
+Key Responsibilities:
+    - Serve newline-delimited JSON over TCP or a Unix socket.
+    - Batch concurrent requests under a latency budget and a size cap.
+    - Report p50/p99 latency and sustained throughput (`stats`, `collect`).
+    - Provide an asyncio client (`ScoringClient`) for callers and tests.
+
+Typical usage:
+    server = ScoringServer(FraudDetector(rules), latency_budget_ms=2.0)
+    await server.start()                       # server.address -> ("127.0.0.1", port)
+    async with ScoringClient(*server.address) as client:
+        verdict = await client.score(record)
+    await server.close()
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import List, Optional
+
+import numpy as np
+
+from fraud_engine.batch import TransactionBatch, UserInterner
+from fraud_engine.exceptions import InvalidTransactionError
+from fraud_engine.metrics import NAMESPACE, Histogram, MetricFamily
+from fraud_engine.schema import validate_transaction
+
+logger = logging.getLogger("fraud_engine")
+
+DEFAULT_LATENCY_BUDGET_MS = 2.0
+DEFAULT_MAX_BATCH_SIZE = 256
+DEFAULT_LATENCY_WINDOW = 100_000
+_STREAM_LIMIT = 16 * 1024 * 1024
+
+
+class ServerStats:
+    """
+    Serving counters and latencies.
+
+    Latency is measured per transaction, from the moment its request line is
+    parsed to the moment its verdict is ready. Percentiles are exact over the
+    most recent `window` transactions; the histogram covers the whole run.
+    """
+
+    def __init__(self, window: int = DEFAULT_LATENCY_WINDOW):
+        self.requests = 0
+        self.transactions = 0
+        self.errors = 0
+        self.batches = 0
+        self.started: Optional[float] = None
+        self.recent_ns = deque(maxlen=window)
+        self.latency = Histogram()
+
+    def record_batch(self, latencies_ns: List[int]):
+        self.batches += 1
+        self.transactions += len(latencies_ns)
+        self.recent_ns.extend(latencies_ns)
+        for ns in latencies_ns:
+            self.latency.observe(ns)
+
+    def percentile_ms(self, q: float) -> Optional[float]:
+        if not self.recent_ns:
+            return None
+        return float(np.percentile(np.fromiter(self.recent_ns, dtype=np.int64), q)) / 1e6
+
+    def throughput(self) -> float:
+        """Transactions scored per second since the first request."""
+        if self.started is None:
+            return 0.0
+        elapsed = time.perf_counter() - self.started
+        return self.transactions / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": self.requests,
+            "transactions": self.transactions,
+            "errors": self.errors,
+            "batches": self.batches,
+            "mean_batch_size": self.transactions / self.batches if self.batches else 0.0,
+            "p50_ms": self.percentile_ms(50),
+            "p99_ms": self.percentile_ms(99),
+            "throughput_per_sec": self.throughput(),
+        }
+
+    def collect(self) -> List[MetricFamily]:
+        return [
+            MetricFamily(f"{NAMESPACE}_server_requests_total", "counter",
+                         "Scoring requests received.", [({}, self.requests)]),
+            MetricFamily(f"{NAMESPACE}_server_transactions_total", "counter",
+                         "Transactions scored.", [({}, self.transactions)]),
+            MetricFamily(f"{NAMESPACE}_server_errors_total", "counter",
+                         "Transactions rejected as invalid.", [({}, self.errors)]),
+            MetricFamily(f"{NAMESPACE}_server_batches_total", "counter",
+                         "Micro-batches evaluated.", [({}, self.batches)]),
+            MetricFamily(f"{NAMESPACE}_server_latency_seconds", "histogram",
+                         "Time from request to verdict, per transaction.",
+                         [({}, self.latency)]),
+        ]
+
+
+class ScoringServer:
+    """
+    Micro-batching scoring server.
+
+    Args:
+        detector (FraudDetector): Detector used for every batch. Stateful
+            rules see transactions in the order requests arrive.
+        latency_budget_ms (float): Longest a request waits for a batch to fill.
+        max_batch_size (int): Transactions evaluated together at most.
+        host (str), port (int): TCP address (port 0 picks a free port).
+        path (str, optional): Serve on this Unix socket instead of TCP.
+    """
+
+    def __init__(self, detector, latency_budget_ms: float = DEFAULT_LATENCY_BUDGET_MS,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 host: str = "127.0.0.1", port: int = 0, path: Optional[str] = None):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.detector = detector
+        self.latency_budget = latency_budget_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.host, self.port, self.path = host, port, path
+        self.stats = ServerStats()
+        self.address = None
+        self._interner = UserInterner()
+        self._queue: Optional[asyncio.Queue] = None
+        self._server = None
+        self._batcher = None
+
+    # ---- lifecycle -------------------------------------------------------
+
+    async def start(self) -> "ScoringServer":
+        """Bind the socket and start the batching task."""
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._batch_loop())
+        if self.path is not None:
+            self._server = await asyncio.start_unix_server(self._handle, path=self.path,
+                                                           limit=_STREAM_LIMIT)
+            self.address = self.path
+        else:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port,
+                                                      limit=_STREAM_LIMIT)
+            self.address = self._server.sockets[0].getsockname()[:2]
+        logger.info(f"Scoring server listening on {self.address} "
+                    f"(budget {self.latency_budget * 1000:g} ms, batch <= {self.max_batch_size})")
+        return self
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        """Stop accepting connections and finish the batches already queued."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._batcher is not None:
+            await self._queue.put(None)
+            await self._batcher
+            self._batcher = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    # ---- batching --------------------------------------------------------
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            first = await queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = first[2] / 1e9 - time.perf_counter() + loop.time() + self.latency_budget
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    # Shutting down: score what we have, then stop
+                    self._score(batch)
+                    return
+                batch.append(item)
+            self._score(batch)
+
+    def _score(self, batch: list):
+        """Evaluate one micro-batch and resolve its futures."""
+        txns = [txn for txn, _, _ in batch]
+        try:
+            masks = self.detector.evaluate_batch(
+                TransactionBatch.from_transactions(txns, self._interner))
+        except Exception as e:
+            logger.error(f"Scoring batch of {len(batch)} failed: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_result({"error": f"scoring failed: {e}"})
+            return
+
+        flag_names = self.detector.flag_names
+        now = time.perf_counter_ns()
+        for (txn, future, arrived), mask in zip(batch, masks.tolist()):
+            flags = flag_names(mask) if mask else []
+            if not future.done():
+                future.set_result({"transaction_id": txn.transaction_id,
+                                   "is_fraud": bool(flags), "flags": flags})
+        self.stats.record_batch([now - arrived for _, _, arrived in batch])
+
+    # ---- connections -----------------------------------------------------
+
+    def _submit(self, record, arrived: int) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        try:
+            if not isinstance(record, dict):
+                raise InvalidTransactionError("Expected a JSON object")
+            txn = validate_transaction(record)
+        except InvalidTransactionError as e:
+            self.stats.errors += 1
+            future.set_result({"error": str(e)})
+            return future
+        self._queue.put_nowait((txn, future, arrived))
+        return future
+
+    async def _respond(self, writer, responses: asyncio.Queue):
+        """Write responses in request order as they complete."""
+        while True:
+            pending = await responses.get()
+            if pending is None:
+                return
+            if isinstance(pending, list):
+                payload = [await f for f in pending]
+            elif isinstance(pending, dict):
+                payload = pending
+            else:
+                payload = await pending
+            writer.write(json.dumps(payload).encode("utf-8") + b"\n")
+            if responses.empty():
+                await writer.drain()
+
+    async def _handle(self, reader, writer):
+        responses: asyncio.Queue = asyncio.Queue()
+        responder = asyncio.create_task(self._respond(writer, responses))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                arrived = time.perf_counter_ns()
+                if self.stats.started is None:
+                    self.stats.started = time.perf_counter()
+                self.stats.requests += 1
+                try:
+                    request = json.loads(line)
+                except ValueError as e:
+                    responses.put_nowait({"error": f"invalid JSON: {e}"})
+                    continue
+                if isinstance(request, list):
+                    responses.put_nowait([self._submit(r, arrived) for r in request])
+                elif isinstance(request, dict) and "command" in request:
+                    if request["command"] == "stats":
+                        responses.put_nowait(self.stats.snapshot())
+                    else:
+                        responses.put_nowait({"error": f"unknown command {request['command']!r}"})
+                else:
+                    responses.put_nowait(self._submit(request, arrived))
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            responses.put_nowait(None)
+            try:
+                await responder
+            except ConnectionError:
+                pass
+            writer.close()
+
+
+class ScoringClient:
+    """
+    Minimal asyncio client for `ScoringServer`.
+
+    Requests on one client are answered in order, so concurrent callers
+    should use one client each (or serialize their calls).
+
+    Args:
+        host (str): Host name, or the Unix socket path when `port` is None.
+        port (int, optional): TCP port.
+    """
+
+    def __init__(self, host: str, port: Optional[int] = None):
+        self.host, self.port = host, port
+        self._reader = self._writer = None
+
+    async def connect(self) -> "ScoringClient":
+        if self.port is None:
+            self._reader, self._writer = await asyncio.open_unix_connection(
+                self.host, limit=_STREAM_LIMIT)
+        else:
+            self._reader, self._writer = await asyncio.open_connection(
+                self.host, self.port, limit=_STREAM_LIMIT)
+        return self
+
+    async def request(self, payload):
+        self._writer.write(json.dumps(payload, default=str).encode("utf-8") + b"\n")
+        await self._writer.drain()
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("Scoring server closed the connection")
+        return json.loads(line)
+
+    async def score(self, record: dict) -> dict:
+        """Score one transaction record."""
+        return await self.request(record)
+
+    async def score_many(self, records: List[dict]) -> List[dict]:
+        """Score several records in one request."""
+        return await self.request(list(records))
+
+    async def server_stats(self) -> dict:
+        return await self.request({"command": "stats"})
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
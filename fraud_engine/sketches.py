@@ -0,0 +1,311 @@
+"""
+sketches.py
+
+Bounded-memory summaries for run reports.
+
+A detection run over millions of transactions should not end with exact
+per-user counters and a log line per user. These streaming structures keep
+a fixed-size summary however many distinct users or values pass through:
+
+    - `SpaceSaving`: top-k heavy hitters (flagged users, rules) with a
+      per-item overestimation bound; exact while fewer than k items are seen.
+    - `QuantileSketch`: DDSketch quantiles with a relative-error guarantee
+      (amount distributions); mergeable across shards.
+    - `Reservoir`: uniform random sample of a stream (example alerts).
+
+Key Responsibilities:
+    - Track heavy hitters, quantiles and samples in O(capacity) memory.
+    - Report bounded, deterministic summaries (`most_common`, `quantiles`, `items`).
+    - Export and restore their exact state as JSON-compatible values (checkpoints).
+
+Typical usage:
+    from fraud_engine.sketches import QuantileSketch, SpaceSaving
+
+    top_users = SpaceSaving(capacity=100)
+    amounts = QuantileSketch(relative_accuracy=0.01)
+    for txn in stream:
+        amounts.add(txn.amount)
+        if flagged:
+            top_users.add(txn.user_id)
+    top_users.most_common(10), amounts.quantiles([0.5, 0.99])
+"""
+import heapq
+import itertools
+import math
+import random
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_TOP_K = 100
+DEFAULT_RELATIVE_ACCURACY = 0.01
+DEFAULT_MAX_BINS = 2048
+DEFAULT_SAMPLE_SIZE = 20
+
+
+class SpaceSaving:
+    """
+    Space-Saving top-k counter (Metwally et al.).
+
+    Tracks at most `capacity` items. An untracked item replaces the one with
+    the smallest count and inherits that count as its error, so every
+    reported count overestimates the true one by at most `error(item)`, and
+    any item seen more than total / capacity times is guaranteed tracked.
+
+    Args:
+        capacity (int): Items tracked.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_TOP_K):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.total = 0
+        self._counts: Dict[Hashable, int] = {}
+        self._errors: Dict[Hashable, int] = {}
+        # Min-heap of (count, tiebreak, item); entries go stale as counts grow
+        self._heap: List[tuple] = []
+        self._tiebreak = itertools.count()
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, item):
+        return item in self._counts
+
+    def add(self, item: Hashable, count: int = 1):
+        self.total += count
+        counts = self._counts
+        current = counts.get(item)
+        if current is not None:
+            counts[item] = current + count
+            return
+        error = 0
+        if len(counts) >= self.capacity:
+            error = self._evict()
+        counts[item] = error + count
+        self._errors[item] = error
+        heapq.heappush(self._heap, (error + count, next(self._tiebreak), item))
+
+    def _evict(self) -> int:
+        """Drop the item with the smallest count and return that count."""
+        heap, counts = self._heap, self._counts
+        while True:
+            count, _, item = heapq.heappop(heap)
+            current = counts[item]
+            if current == count:
+                del counts[item]
+                del self._errors[item]
+                return count
+            # Counted since this entry was pushed: re-queue at its real count
+            heapq.heappush(heap, (current, next(self._tiebreak), item))
+
+    def count(self, item: Hashable) -> int:
+        """Estimated count (0 if not tracked)."""
+        return self._counts.get(item, 0)
+
+    def error(self, item: Hashable) -> int:
+        """Most by which `count(item)` may exceed the true count."""
+        return self._errors.get(item, 0)
+
+    def most_common(self, n: Optional[int] = None) -> List[Tuple[Hashable, int]]:
+        """Tracked items by descending count (ties in first-tracked order)."""
+        items = sorted(self._counts.items(), key=lambda kv: -kv[1])
+        return items if n is None else items[:n]
+
+    def getstate(self) -> dict:
+        """Exact state as JSON-compatible values (items must be strings or numbers)."""
+        tiebreak = next(self._tiebreak)
+        self._tiebreak = itertools.count(tiebreak)
+        return {"total": self.total,
+                "counts": [[item, count, self._errors[item]] for item, count in self._counts.items()],
+                "heap": [list(entry) for entry in self._heap],
+                "tiebreak": tiebreak}
+
+    def setstate(self, state: dict):
+        """Restore a state returned by `getstate`."""
+        self.total = state["total"]
+        self._counts = {item: count for item, count, _ in state["counts"]}
+        self._errors = {item: error for item, _, error in state["counts"]}
+        self._heap = [tuple(entry) for entry in state["heap"]]
+        self._tiebreak = itertools.count(state["tiebreak"])
+
+
+class QuantileSketch:
+    """
+    DDSketch quantile summary.
+
+    Values are counted in logarithmic bins, so every quantile is returned
+    within `relative_accuracy` of a true value of that rank. At most
+    `max_bins` bins are kept per sign; beyond that the bins of the smallest
+    magnitudes are merged (only low quantiles lose accuracy).
+
+    Args:
+        relative_accuracy (float): Relative error bound, e.g. 0.01 for 1%.
+        max_bins (int): Bins kept for positive (and for negative) values.
+    """
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+                 max_bins: int = DEFAULT_MAX_BINS):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._positive: Dict[int, int] = {}
+        self._negative: Dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _index(self, magnitude: float) -> int:
+        return math.ceil(math.log(magnitude) / self._log_gamma)
+
+    def _value(self, index: int) -> float:
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def _collapse(self, bins: Dict[int, int]):
+        lowest = sorted(bins)[:len(bins) - self.max_bins + 1]
+        merged = sum(bins.pop(i) for i in lowest)
+        bins[lowest[-1]] = bins.get(lowest[-1], 0) + merged
+
+    def add(self, value: float):
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value > 0:
+            bins = self._positive
+            i = self._index(value)
+        elif value < 0:
+            bins = self._negative
+            i = self._index(-value)
+        else:
+            self.zero += 1
+            return
+        bins[i] = bins.get(i, 0) + 1
+        if len(bins) > self.max_bins:
+            self._collapse(bins)
+
+    def add_many(self, values: np.ndarray):
+        """Add an array of values in one vectorized step."""
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return
+        self.count += len(values)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.zero += int((values == 0).sum())
+        for bins, magnitudes in ((self._positive, values[values > 0]),
+                                 (self._negative, -values[values < 0])):
+            if len(magnitudes):
+                idx = np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64)
+                keys, counts = np.unique(idx, return_counts=True)
+                self._add_bins(bins, zip(keys.tolist(), counts.tolist()))
+
+    def _add_bins(self, bins: Dict[int, int], items: Iterable[Tuple[int, int]]):
+        for i, c in items:
+            bins[i] = bins.get(i, 0) + c
+        if len(bins) > self.max_bins:
+            self._collapse(bins)
+
+    def merge(self, other: "QuantileSketch"):
+        """Add another sketch with the same accuracy into this one."""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        self.count += other.count
+        self.sum += other.sum
+        self.zero += other.zero
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._add_bins(self._positive, other._positive.items())
+        self._add_bins(self._negative, other._negative.items())
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Value at quantile `q` (0..1), or None if empty."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for i in sorted(self._negative, reverse=True):
+            seen += self._negative[i]
+            if seen > rank:
+                return max(-self._value(i), self.min)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for i in sorted(self._positive):
+            seen += self._positive[i]
+            if seen > rank:
+                return min(self._value(i), self.max)
+        return self.max
+
+    def quantiles(self, qs: Iterable[float]) -> Dict[float, Optional[float]]:
+        return {q: self.quantile(q) for q in qs}
+
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def getstate(self) -> dict:
+        """Exact state as JSON-compatible values."""
+        return {"positive": list(self._positive.items()),
+                "negative": list(self._negative.items()),
+                "zero": self.zero, "count": self.count, "sum": self.sum,
+                "min": self.min, "max": self.max}
+
+    def setstate(self, state: dict):
+        """Restore a state returned by `getstate` (from a sketch of the same accuracy)."""
+        self._positive = {i: c for i, c in state["positive"]}
+        self._negative = {i: c for i, c in state["negative"]}
+        self.zero, self.count, self.sum = state["zero"], state["count"], state["sum"]
+        self.min, self.max = state["min"], state["max"]
+
+
+class Reservoir:
+    """
+    Uniform random sample of at most `size` items from a stream (Algorithm R).
+
+    Args:
+        size (int): Items kept.
+        seed (int, optional): Random seed, for reproducible reports.
+    """
+
+    def __init__(self, size: int = DEFAULT_SAMPLE_SIZE, seed: Optional[int] = 0):
+        self.size = size
+        self.seen = 0
+        self.items: list = []
+        self._random = random.Random(seed)
+
+    def add(self, item):
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(item)
+        else:
+            j = self._random.randrange(self.seen)
+            if j < self.size:
+                self.items[j] = item
+
+    def getstate(self) -> dict:
+        """Exact state, random generator included, as JSON-compatible values."""
+        version, internal, gauss_next = self._random.getstate()
+        return {"seen": self.seen, "items": list(self.items),
+                "random": [version, list(internal), gauss_next]}
+
+    def setstate(self, state: dict, item: Callable = lambda x: x):
+        """
+        Restore a state returned by `getstate`.
+
+        Args:
+            state (dict): The exported state.
+            item (callable): Rebuilds one item from its JSON form (e.g. list -> tuple).
+        """
+        self.seen = state["seen"]
+        self.items = [item(x) for x in state["items"]]
+        version, internal, gauss_next = state["random"]
+        self._random.setstate((version, tuple(internal), gauss_next))
@@ -0,0 +1,230 @@
+"""
+spill.py
+
+Disk spilling for per-key state that does not fit in memory.
+
+Window histories and user profiles grow with the number of distinct users.
+When that key space outgrows the memory budget, the owning store keeps only
+its most recently used keys in memory (a fixed key budget) and hands the
+state of the least recently used ones to a `StateSpill`, which serializes
+it to a local embedded store. A key that comes back is read back from disk.
+
+Writes are buffered and applied in batches (one SQLite transaction per
+`write_batch` spilled keys); reads of cold keys are single indexed lookups,
+or one query per columnar batch (`prefetch`). Entries older than the
+owner's retention horizon are deleted when the buffer is written.
+
+Backends implement:
+    get_many(keys: List[str]) -> Dict[str, bytes]
+    put_many(rows: List[Tuple[str, bytes, int]]) -> None   # (key, blob, last_seen)
+    delete_before(t: int) -> int
+    items() -> Iterator[Tuple[str, bytes]]
+    close() -> None
+
+Key Responsibilities:
+    - Store serialized per-key state in SQLite (`SqliteBackend`).
+    - Buffer spilled state and write it back in batches (`StateSpill`).
+    - Count lookups, memory hits, disk loads, new keys and spills, and time
+      disk reads (`collect()` for `MetricsRegistry`).
+
+Typical usage:
+    from fraud_engine.spill import SqliteBackend, StateSpill
+
+    spill = StateSpill(SqliteBackend("state/windows.db"), name="windows")
+    rule.aggregator.spill_to(spill, max_keys=100_000)
+    profiles = ProfileEngine(max_users=100_000,
+                             spill=StateSpill(SqliteBackend("state/profiles.db"), name="profiles"))
+"""
+import os
+import sqlite3
+from time import perf_counter_ns
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fraud_engine.metrics import NAMESPACE, Histogram, MetricFamily
+
+DEFAULT_WRITE_BATCH = 4096
+# SQLite's default limit on bound parameters per statement is 999 on older builds
+_QUERY_CHUNK = 900
+
+
+class SqliteBackend:
+    """
+    Key -> blob table in a local SQLite file.
+
+    The file is a working store, not a durable record: it is written without
+    fsync and, unless `reset` is False, emptied when opened so state left
+    over from an earlier run is never read back.
+
+    Args:
+        path (str): Database file.
+        table (str): Table name (several stores may share one file).
+        reset (bool): Drop existing rows on open.
+    """
+
+    def __init__(self, path: str, table: str = "state", reset: bool = True):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table!r}")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.table = table
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} "
+                           "(key TEXT PRIMARY KEY, value BLOB NOT NULL, last_seen INTEGER NOT NULL) "
+                           "WITHOUT ROWID")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_seen ON {table} (last_seen)")
+        if reset:
+            self._conn.execute(f"DELETE FROM {table}")
+
+    def __len__(self):
+        return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        out = {}
+        for lo in range(0, len(keys), _QUERY_CHUNK):
+            chunk = keys[lo:lo + _QUERY_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            out.update(self._conn.execute(
+                f"SELECT key, value FROM {self.table} WHERE key IN ({marks})", chunk))
+        return out
+
+    def put_many(self, rows: List[Tuple[str, bytes, int]]):
+        conn = self._conn
+        conn.execute("BEGIN")
+        conn.executemany(f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?)", rows)
+        conn.execute("COMMIT")
+
+    def delete_before(self, t: int) -> int:
+        return self._conn.execute(f"DELETE FROM {self.table} WHERE last_seen < ?", (t,)).rowcount
+
+    def items(self) -> Iterator[Tuple[str, bytes]]:
+        return iter(self._conn.execute(f"SELECT key, value FROM {self.table}"))
+
+    def close(self):
+        self._conn.close()
+
+
+class StateSpill:
+    """
+    Write-back buffer and metrics between an in-memory store and a backend.
+
+    The owner calls `put` for each key it evicts from memory and `take` when
+    a key it does not hold is looked up; `take` also answers from the write
+    buffer, so a key spilled moments ago never waits for a disk round trip.
+    The owner counts its lookups in `lookups`; hits are lookups answered
+    from memory.
+
+    Attributes:
+        horizon (int, optional): Entries last seen before this time (epoch µs)
+            are deleted from the backend at the next flush; set by the owner.
+
+    Args:
+        backend: Storage backend (see the module docstring), e.g. `SqliteBackend`.
+        name (str): Store name, used as the `store` metric label.
+        write_batch (int): Spilled keys buffered before one batched write.
+    """
+
+    def __init__(self, backend, name: str = "state", write_batch: int = DEFAULT_WRITE_BATCH):
+        if write_batch < 1:
+            raise ValueError("write_batch must be at least 1")
+        self.backend = backend
+        self.name = name
+        self.write_batch = write_batch
+        self.horizon: Optional[int] = None
+        self._pending: Dict[str, Tuple[bytes, int]] = {}
+        self._prefetched: Dict[str, Optional[bytes]] = {}
+        self.lookups = 0
+        self.loads = 0
+        self.misses = 0
+        self.spills = 0
+        self.flushes = 0
+        self.expired = 0
+        self.load_latency = Histogram()
+
+    @property
+    def hits(self) -> int:
+        return self.lookups - self.loads - self.misses
+
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 1.0
+
+    def put(self, key: str, blob: bytes, last_seen: int):
+        """Spill one key's serialized state; written with the next batch."""
+        self.spills += 1
+        self._pending[key] = (blob, last_seen)
+        if len(self._pending) >= self.write_batch:
+            self.flush()
+
+    def take(self, key: str) -> Optional[bytes]:
+        """Serialized state of a key not held in memory, or None for a new key."""
+        pending = self._pending.pop(key, None)
+        if pending is not None:
+            self.loads += 1
+            return pending[0]
+        if key in self._prefetched:
+            blob = self._prefetched.pop(key)
+        elif not self.spills:
+            blob = None             # nothing was ever spilled: no need to ask the backend
+        else:
+            start = perf_counter_ns()
+            blob = self.backend.get_many([key]).get(key)
+            self.load_latency.observe(perf_counter_ns() - start)
+        if blob is None:
+            self.misses += 1
+        else:
+            self.loads += 1
+        return blob
+
+    def prefetch(self, keys: Iterable[str]):
+        """Read several keys in one query ahead of the `take` calls for them."""
+        keys = [k for k in keys if k not in self._pending]
+        if not keys or not self.spills:
+            return
+        start = perf_counter_ns()
+        self._prefetched = dict.fromkeys(keys)
+        self._prefetched.update(self.backend.get_many(keys))
+        self.load_latency.observe(perf_counter_ns() - start)
+
+    def flush(self):
+        """Write buffered state in one batch and delete entries past the horizon."""
+        if self._pending:
+            self.backend.put_many([(key, blob, seen) for key, (blob, seen)
+                                   in self._pending.items()])
+            self._pending.clear()
+            self.flushes += 1
+        if self.horizon is not None:
+            self.expired += self.backend.delete_before(self.horizon)
+
+    def items(self) -> Iterator[Tuple[str, bytes]]:
+        """Every spilled key and its state (flushes the buffer first)."""
+        self.flush()
+        return self.backend.items()
+
+    def close(self):
+        self.flush()
+        self.backend.close()
+
+    def collect(self) -> List[MetricFamily]:
+        labels = {"store": self.name}
+        return [
+            MetricFamily(f"{NAMESPACE}_state_lookups_total", "counter",
+                         "Keyed state lookups.", [(labels, self.lookups)]),
+            MetricFamily(f"{NAMESPACE}_state_hits_total", "counter",
+                         "Lookups answered from memory.", [(labels, self.hits)]),
+            MetricFamily(f"{NAMESPACE}_state_loads_total", "counter",
+                         "Lookups of spilled keys read back into memory.", [(labels, self.loads)]),
+            MetricFamily(f"{NAMESPACE}_state_misses_total", "counter",
+                         "Lookups of keys not stored anywhere (new keys).", [(labels, self.misses)]),
+            MetricFamily(f"{NAMESPACE}_state_spills_total", "counter",
+                         "Keys evicted from memory to the spill store.", [(labels, self.spills)]),
+            MetricFamily(f"{NAMESPACE}_state_flushes_total", "counter",
+                         "Batched writes to the spill store.", [(labels, self.flushes)]),
+            MetricFamily(f"{NAMESPACE}_state_expired_total", "counter",
+                         "Spilled entries deleted past the retention horizon.",
+                         [(labels, self.expired)]),
+            MetricFamily(f"{NAMESPACE}_state_load_latency_seconds", "histogram",
+                         "Latency of reads from the spill store.", [(labels, self.load_latency)]),
+        ]
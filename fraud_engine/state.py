@@ -0,0 +1,311 @@
+"""
+state.py
+
+Compact, memory-bounded per-key state for stateful fraud rules.
+
+A `defaultdict(deque)` of `datetime` objects costs hundreds of bytes per user
+and never forgets users who have gone idle. `TimestampRingStore` keeps one
+fixed-size ring buffer of int64 epoch timestamps per key inside a single
+contiguous NumPy array, recycles the slots of idle keys, and can report how
+much memory it is using.
+
+Key Responsibilities:
+    - Map keys (user ids) to slots in contiguous int64 ring buffers.
+    - Cap each key's history at a fixed number of timestamps.
+    - Evict keys idle for longer than a horizon, amortized over appends.
+    - Expose vectorized gather/scatter helpers for batch evaluation.
+    - Export and bulk-restore state for checkpoints (full or dirty-only).
+
+Typical usage:
+    from fraud_engine.state import TimestampRingStore
+
+    store = TimestampRingStore(capacity=4, idle_us=60_000_000)
+    in_window = store.append("U101", now_us, window_us)
+"""
+import sys
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_INITIAL_SLOTS = 1024
+DEFAULT_SWEEP_PER_APPEND = 2
+
+
+class TimestampRingStore:
+    """
+    Per-key ring buffers of int64 timestamps, stored struct-of-arrays.
+
+    Every `append` also inspects a couple of slots at a sweep cursor and
+    evicts keys whose last timestamp is older than `idle_us` before the
+    newest timestamp seen, so idle keys are reclaimed in O(1) amortized
+    time without a separate timer. `evict_idle` performs a full sweep.
+
+    Attributes:
+        capacity (int): Maximum timestamps kept per key.
+        idle_us (int): Idle horizon in microseconds after which a key is evicted.
+    """
+
+    def __init__(self, capacity: int, idle_us: int,
+                 initial_slots: int = DEFAULT_INITIAL_SLOTS,
+                 sweep_per_append: int = DEFAULT_SWEEP_PER_APPEND):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.idle_us = idle_us
+        self.sweep_per_append = sweep_per_append
+
+        self._slots: Dict[str, int] = {}
+        self._keys: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._times = np.zeros(initial_slots * capacity, dtype=np.int64)
+        self._head = np.zeros(initial_slots, dtype=np.int32)
+        self._size = np.zeros(initial_slots, dtype=np.int32)
+        self._last_seen = np.zeros(initial_slots, dtype=np.int64)
+        self._dirty = np.zeros(initial_slots, dtype=bool)
+        self._clock = np.iinfo(np.int64).min
+        self._cursor = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, key):
+        return key in self._slots
+
+    # ---- slot management -------------------------------------------------
+
+    def _grow(self):
+        n = len(self._head)
+        extra = max(n, 1)
+        self._times = np.concatenate([self._times, np.zeros(extra * self.capacity, dtype=np.int64)])
+        self._head = np.concatenate([self._head, np.zeros(extra, dtype=np.int32)])
+        self._size = np.concatenate([self._size, np.zeros(extra, dtype=np.int32)])
+        self._last_seen = np.concatenate([self._last_seen, np.zeros(extra, dtype=np.int64)])
+        self._dirty = np.concatenate([self._dirty, np.zeros(extra, dtype=bool)])
+
+    def _allocate(self, key: str) -> int:
+        if self._free:
+            slot = self._free.pop()
+            self._keys[slot] = key
+        else:
+            slot = len(self._keys)
+            if slot == len(self._head):
+                self._grow()
+            self._keys.append(key)
+        self._slots[key] = slot
+        self._head[slot] = 0
+        self._size[slot] = 0
+        return slot
+
+    def _evict_slot(self, slot: int):
+        del self._slots[self._keys[slot]]
+        self._keys[slot] = None
+        self._size[slot] = 0
+        self._free.append(slot)
+
+    def _advance(self, now: int, steps: int):
+        """Move the clock forward and sweep `steps` slots for idle keys."""
+        if now > self._clock:
+            self._clock = now
+        used = len(self._keys)
+        if not used:
+            return
+        horizon = self._clock - self.idle_us
+        keys, last_seen = self._keys, self._last_seen
+        cursor = self._cursor
+        for _ in range(min(steps, used)):
+            if cursor >= used:
+                cursor = 0
+            if keys[cursor] is not None and last_seen[cursor] < horizon:
+                self._evict_slot(cursor)
+            cursor += 1
+        self._cursor = cursor
+
+    def evict_idle(self, now: Optional[int] = None) -> int:
+        """
+        Evict every key idle for longer than `idle_us`.
+
+        Args:
+            now (int, optional): Current time; defaults to the newest timestamp seen.
+
+        Returns:
+            int: Number of keys evicted.
+        """
+        if now is not None and now > self._clock:
+            self._clock = now
+        used = len(self._keys)
+        in_use = np.fromiter((k is not None for k in self._keys), dtype=bool, count=used)
+        idle = np.flatnonzero(in_use & (self._last_seen[:used] < self._clock - self.idle_us))
+        for slot in idle:
+            self._evict_slot(int(slot))
+        return len(idle)
+
+    # ---- per-row path ----------------------------------------------------
+
+    def append(self, key: str, t: int, window: int) -> int:
+        """
+        Record timestamp `t` for `key` and drop entries older than `t - window`.
+
+        Returns:
+            int: Number of stored timestamps inside the window, including `t`
+            (at most `capacity`).
+        """
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._allocate(key)
+
+        cap = self.capacity
+        base = slot * cap
+        head = int(self._head[slot])
+        size = int(self._size[slot])
+        pos = (head + size) % cap if size < cap else head
+        size = min(size + 1, cap)
+
+        times = self._times
+        times[base + pos] = t
+        self._last_seen[slot] = t
+        self._dirty[slot] = True
+
+        # Walk back from the newest entry while still inside the window
+        cutoff = t - window
+        count, i = 0, pos
+        while count < size and times[base + i] >= cutoff:
+            count += 1
+            i = (i - 1) % cap
+
+        self._size[slot] = count
+        self._head[slot] = (pos - count + 1) % cap
+        self._advance(t, self.sweep_per_append)
+        return count
+
+    # ---- batch path ------------------------------------------------------
+
+    def gather(self, keys: Sequence[str]):
+        """
+        Resolve slots for `keys` (allocating new ones) and return their histories.
+
+        Returns:
+            tuple: (slots, sizes, times) where `times` holds every key's stored
+            timestamps oldest-first, concatenated in `keys` order.
+        """
+        slots = np.fromiter(
+            (self._slots.get(k, -1) for k in keys), dtype=np.int64, count=len(keys))
+        for i in np.flatnonzero(slots < 0):
+            slots[i] = self._allocate(keys[i])
+
+        sizes = self._size[slots].astype(np.int64)
+        total = int(sizes.sum())
+        starts = np.cumsum(sizes) - sizes
+        within = np.arange(total) - np.repeat(starts, sizes)
+        ring_pos = (np.repeat(self._head[slots], sizes) + within) % self.capacity
+        times = self._times[np.repeat(slots * self.capacity, sizes) + ring_pos]
+        return slots, sizes, times
+
+    def scatter(self, slots: np.ndarray, sizes: np.ndarray, times: np.ndarray, now: int):
+        """
+        Overwrite the history of each slot with its newest `capacity` timestamps.
+
+        Args:
+            slots (np.ndarray): Slots returned by `gather`.
+            sizes (np.ndarray): Number of timestamps for each slot in `times`.
+            times (np.ndarray): Histories, oldest-first, concatenated in slot order.
+            now (int): Newest timestamp in the batch, used to advance eviction.
+        """
+        sizes = np.asarray(sizes, dtype=np.int64)
+        ends = np.cumsum(sizes)
+        within_from_end = np.repeat(ends, sizes) - np.arange(len(times)) - 1
+        keep = within_from_end < self.capacity
+        kept_sizes = np.minimum(sizes, self.capacity)
+
+        kept_starts = np.cumsum(kept_sizes) - kept_sizes
+        within = np.arange(int(kept_sizes.sum())) - np.repeat(kept_starts, kept_sizes)
+        self._times[np.repeat(slots * self.capacity, kept_sizes) + within] = times[keep]
+        self._head[slots] = 0
+        self._size[slots] = kept_sizes
+        filled = sizes > 0
+        self._last_seen[slots[filled]] = times[ends[filled] - 1]
+        self._dirty[slots] = True
+        self._advance(now, self.sweep_per_append * len(slots))
+
+    # ---- checkpoints -----------------------------------------------------
+
+    def snapshot_state(self, incremental: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Export stored histories as arrays and clear the dirty marks.
+
+        Args:
+            incremental (bool): Only export keys changed since the last snapshot.
+                Keys evicted in between are not recorded; they were idle, so a
+                stale copy restored later holds no in-window timestamps.
+
+        Returns:
+            dict: keys, sizes, times (rows oldest-first, zero padded), last_seen, clock.
+        """
+        used = len(self._keys)
+        in_use = np.fromiter((k is not None for k in self._keys), dtype=bool, count=used)
+        if incremental:
+            in_use &= self._dirty[:used]
+        slots = np.flatnonzero(in_use)
+
+        cap = self.capacity
+        sizes = self._size[slots]
+        columns = np.arange(cap)
+        ring_pos = (self._head[slots][:, None] + columns) % cap
+        times = self._times[slots[:, None] * cap + ring_pos]
+        times[columns >= sizes[:, None]] = 0
+
+        self._dirty[:used] = False
+        return {
+            "keys": np.array([self._keys[s] for s in slots], dtype=str),
+            "sizes": sizes,
+            "times": times,
+            "last_seen": self._last_seen[slots],
+            "clock": np.array([self._clock], dtype=np.int64),
+        }
+
+    def restore_state(self, state: Dict[str, np.ndarray], incremental: bool = False):
+        """
+        Load arrays produced by `snapshot_state`.
+
+        A full restore replaces the store contents in bulk; an incremental one
+        overwrites just the listed keys. Histories longer than `capacity`
+        (e.g. after lowering `max_txns`) keep their newest timestamps.
+        """
+        keys = state["keys"].tolist()
+        sizes = state["sizes"].astype(np.int64)
+        rows = state["times"]
+        if not incremental:
+            n = len(keys)
+            slots_total = max(n, DEFAULT_INITIAL_SLOTS)
+            self._times = np.zeros(slots_total * self.capacity, dtype=np.int64)
+            self._head = np.zeros(slots_total, dtype=np.int32)
+            self._size = np.zeros(slots_total, dtype=np.int32)
+            self._last_seen = np.zeros(slots_total, dtype=np.int64)
+            self._dirty = np.zeros(slots_total, dtype=bool)
+            self._keys = list(keys)
+            self._slots = dict(zip(keys, range(n)))
+            self._free = []
+            self._cursor = 0
+            slots = np.arange(n, dtype=np.int64)
+        else:
+            slots, _, _ = self.gather(keys)
+
+        filled = np.arange(rows.shape[1] if rows.ndim == 2 else 0) < sizes[:, None]
+        self.scatter(slots, sizes, rows[filled], now=int(state["clock"][0]))
+        self._last_seen[slots] = state["last_seen"]
+        self._dirty[slots] = False
+
+    # ---- introspection ---------------------------------------------------
+
+    def history(self, key: str) -> List[int]:
+        """Return the stored timestamps for `key`, oldest first."""
+        slot = self._slots.get(key)
+        if slot is None:
+            return []
+        _, _, times = self.gather([key])
+        return times.tolist()
+
+    def memory_usage(self) -> int:
+        """Approximate bytes used by the store, including the key index."""
+        arrays = self._times.nbytes + self._head.nbytes + self._size.nbytes + self._last_seen.nbytes
+        index = sys.getsizeof(self._slots) + sys.getsizeof(self._keys) + sys.getsizeof(self._free)
+        return arrays + index
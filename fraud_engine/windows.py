@@ -0,0 +1,746 @@
+"""
+windows.py
+
+Keyed sliding-window aggregation for velocity rules.
+
+Velocity checks ("more than N transactions per user per minute", "more than
+X spent per user per hour", "more than K locations per user per day") all
+aggregate the recent events of one key over a time window. Instead of one
+hand-written deque per rule, `SlidingWindowAggregator` keeps a single event
+log per key and maintains every registered aggregate incrementally: each
+event is appended once, and every window advances its own head past expired
+events, so the windows of one key are computed in the same pass.
+
+Aggregates (all O(1) amortized per event):
+    count      events in the window
+    sum        running sum of a numeric field (re-summed on compaction to shed float error)
+    min / max  monotonic deques of event indices
+    distinct   approximate distinct values of a field: a sliding HyperLogLog
+               that keeps, per register, the list of (time, rank) pairs that
+               can still become the register maximum
+
+Key Responsibilities:
+    - Maintain count / sum / min / max / distinct over several windows per key.
+    - Share one event log between all rules aggregating over the same key.
+    - Evict keys idle for longer than the largest window (amortized sweep).
+    - Optionally keep at most `max_keys` keys in memory and spill the least
+      recently used to disk (`spill_to`).
+    - Evaluate `Transaction` objects and columnar `TransactionBatch` blocks.
+    - Export and restore state for checkpoints (full or dirty keys only).
+
+Typical usage:
+    from fraud_engine.windows import SlidingWindowAggregator, WindowMetric
+
+    agg = SlidingWindowAggregator("user_id")
+    count_1m = agg.add_metric(WindowMetric("count", 60))
+    amount_1h = agg.add_metric(WindowMetric("sum", 3600, "amount"))
+    values = agg.update(txn)
+    if values[count_1m] > 3 or values[amount_1h] > 50000:
+        ...
+"""
+import hashlib
+import math
+import pickle
+import sys
+from collections import OrderedDict, deque
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from fraud_engine.batch import TransactionBatch, to_epoch_us
+
+AGGREGATES = ("count", "sum", "min", "max", "distinct")
+DEFAULT_HLL_PRECISION = 10
+_SWEEP_PER_UPDATE = 2
+_SWEEP_EVERY = 32
+_COMPACT_AFTER = 64
+_US_PER_SECOND = 1_000_000
+
+
+class WindowMetric(NamedTuple):
+    """`aggregate` of `field` over the last `window_seconds` of each key's events."""
+    aggregate: str
+    window_seconds: float
+    field: Optional[str] = None
+
+
+def _hll_position(value, precision: int):
+    """Register index and rank (position of the first 1-bit) of a value's 64-bit hash."""
+    h = int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "big")
+    rest_bits = 64 - precision
+    rest = h & ((1 << rest_bits) - 1)
+    return h >> rest_bits, rest_bits - rest.bit_length() + 1
+
+
+def _batch_column(batch: TransactionBatch, field: str) -> list:
+    """One column of a batch as a Python list (user codes are decoded to ids)."""
+    if field == "user_id":
+        ids = batch.user_ids
+        return [ids[c] for c in batch.user_code.tolist()]
+    column = getattr(batch, field)
+    if column is None:
+        return [None] * len(batch)
+    return column.tolist() if isinstance(column, np.ndarray) else list(column)
+
+
+class _KeyState:
+    """Event log and per-window aggregate state of one key."""
+
+    __slots__ = ("times", "values", "offset", "heads", "sums", "extrema", "hll",
+                 "last_seen", "dirty")
+
+    def __init__(self, n_windows, n_values, n_sums, n_extrema, n_distinct):
+        # Unused aggregates share an empty tuple: count-only keys hold two lists
+        self.times: List[int] = []
+        self.values = [[] for _ in range(n_values)] if n_values else ()
+        self.offset = 0                      # absolute index of times[0]
+        self.heads = [0] * n_windows         # absolute index of each window's oldest event
+        self.sums = [0.0] * n_sums if n_sums else ()
+        self.extrema = [deque() for _ in range(n_extrema)] if n_extrema else ()
+        self.hll = [{} for _ in range(n_distinct)] if n_distinct else ()  # register -> [(time, rank)]
+        self.last_seen = 0
+        self.dirty = True
+
+    _SPILLED = ("times", "values", "offset", "heads", "sums", "extrema", "hll", "last_seen")
+
+    def dump(self) -> bytes:
+        """Serialize the state for a spill store."""
+        return pickle.dumps(tuple(getattr(self, name) for name in self._SPILLED),
+                            protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, blob: bytes) -> "_KeyState":
+        s = cls.__new__(cls)
+        for name, value in zip(cls._SPILLED, pickle.loads(blob)):
+            setattr(s, name, value)
+        s.dirty = True
+        return s
+
+
+class SlidingWindowAggregator:
+    """
+    Sliding-window aggregates of transactions grouped by one key field.
+
+    Metrics are registered with `add_metric` before the first update;
+    identical metrics registered by several rules are computed once.
+    `update` returns the value of every metric, in registration order, for
+    the windows ending at (and including) the given transaction. Each key's
+    timestamps are assumed not to go backwards.
+
+    Rules sharing an aggregator evaluate the same transaction (or batch)
+    object, so the last input and its result are cached: only the first
+    rule to see an object updates the state.
+
+    Args:
+        key (str): Transaction field to group by (e.g. 'user_id', 'merchant_id').
+            Transactions without a key are aggregated on their own.
+        idle_seconds (float, optional): Evict keys idle for longer than this
+            (never shorter than the largest window).
+        max_events (int, optional): Keep at most this many events per key.
+            Only valid for count-only aggregators, whose counts then saturate
+            at `max_events`; enough for "more than N" checks with N < max_events.
+        precision (int): HyperLogLog precision p (2^p registers, ~1.04 / sqrt(2^p)
+            relative error) for distinct counts.
+    """
+
+    def __init__(self, key: str = "user_id", idle_seconds: Optional[float] = None,
+                 max_events: Optional[int] = None, precision: int = DEFAULT_HLL_PRECISION):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.key = key
+        self.metrics: List[WindowMetric] = []
+        self.idle_us = int((idle_seconds or 0) * _US_PER_SECOND)
+        self.max_events = max_events
+        self.precision = precision
+        self._states: "OrderedDict[object, _KeyState]" = OrderedDict()
+        self.spill = None
+        self.max_keys: Optional[int] = None
+        self._clock = np.iinfo(np.int64).min
+        self._compiled = False
+        self._updates = 0
+        self._last_input = None
+        self._last_output = None
+
+        m = 1 << precision
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        self._m = m
+        self._alpha_mm = alpha * m * m
+        self._rank_weight = [2.0 ** -r for r in range(66)]
+
+    # ---- configuration ---------------------------------------------------
+
+    def spill_to(self, spill, max_keys: int):
+        """
+        Keep at most `max_keys` keys in memory; spill the least recently used
+        to `spill` (a `StateSpill`) and read them back when they return.
+
+        Spilled keys are not part of checkpoints, so a spilling aggregator
+        cannot be snapshotted.
+        """
+        if max_keys < 1:
+            raise ValueError("max_keys must be at least 1")
+        self.spill = spill
+        self.max_keys = max_keys
+
+    def add_metric(self, metric: WindowMetric, idle_seconds: Optional[float] = None) -> int:
+        """
+        Register a metric (or find an identical one).
+
+        Returns:
+            int: Index of the metric in the tuples returned by `update`.
+        """
+        if metric.aggregate not in AGGREGATES:
+            raise ValueError(f"Unsupported aggregate {metric.aggregate!r}; use one of {AGGREGATES}")
+        if metric.aggregate != "count" and not metric.field:
+            raise ValueError(f"The {metric.aggregate} aggregate needs a field")
+        if metric.window_seconds <= 0:
+            raise ValueError("window_seconds must be positive")
+        if self.max_events is not None and metric.aggregate != "count":
+            raise ValueError("max_events is only supported for count-only aggregators")
+        if metric.aggregate == "count":
+            metric = metric._replace(field=None)
+        if metric in self.metrics:
+            return self.metrics.index(metric)
+        if self._compiled:
+            raise ValueError("Metrics must be added before the first update")
+        self.metrics.append(metric)
+        window_us = int(metric.window_seconds * _US_PER_SECOND)
+        self.idle_us = max(self.idle_us, window_us, int((idle_seconds or 0) * _US_PER_SECOND))
+        return len(self.metrics) - 1
+
+    def _compile(self):
+        """Lay out windows and aggregate slots for the registered metrics."""
+        def index(items, item):
+            if item not in items:
+                items.append(item)
+            return items.index(item)
+
+        windows, value_fields, distinct_fields = [], [], []
+        self._sum_slots, self._extrema_slots = [], []
+        self._distinct_keep = []
+        readers = []
+        for metric in self.metrics:
+            w = int(metric.window_seconds * _US_PER_SECOND)
+            if metric.aggregate == "distinct":
+                fi = index(distinct_fields, metric.field)
+                if fi == len(self._distinct_keep):
+                    self._distinct_keep.append(w)
+                self._distinct_keep[fi] = max(self._distinct_keep[fi], w)
+                readers.append(("distinct", fi, w))
+                continue
+            wi = index(windows, w)
+            if metric.aggregate == "count":
+                readers.append(("count", wi, None))
+            elif metric.aggregate == "sum":
+                slot = index(self._sum_slots, (wi, index(value_fields, metric.field)))
+                readers.append(("sum", slot, None))
+            else:
+                slot = index(self._extrema_slots,
+                             (wi, index(value_fields, metric.field), metric.aggregate == "max"))
+                readers.append(("extremum", slot, None))
+
+        self._window_us = windows
+        self._value_fields = value_fields
+        self._distinct_fields = distinct_fields
+        self._readers = readers
+        # Slots to adjust when a window's head moves
+        self._sums_of = [[s for s, (wi, _) in enumerate(self._sum_slots) if wi == w]
+                         for w in range(len(windows))]
+        self._extrema_of = [[s for s, (wi, _, _) in enumerate(self._extrema_slots) if wi == w]
+                            for w in range(len(windows))]
+        self._compact_after = min(_COMPACT_AFTER, self.max_events or _COMPACT_AFTER)
+        # Count-only aggregators read every metric straight off the window heads
+        self._count_windows = ([slot for _, slot, _ in readers]
+                               if readers and all(kind == "count" for kind, _, _ in readers) else None)
+        self._compiled = True
+
+    def _new_state(self) -> _KeyState:
+        return _KeyState(len(self._window_us), len(self._value_fields), len(self._sum_slots),
+                         len(self._extrema_slots), len(self._distinct_fields))
+
+    # ---- core update -----------------------------------------------------
+
+    def _observe(self, s: _KeyState, t: int, values, distinct):
+        """Add one event to a key's state (no key bookkeeping, no result)."""
+        s.last_seen = t
+        s.dirty = True
+        if self._window_us:
+            times = s.times
+            off = s.offset
+            idx = off + len(times)
+            times.append(t)
+            columns = s.values
+            if columns:
+                self._push_values(s, values)
+
+            # Advance each window's head past expired events
+            heads = s.heads
+            cap = self.max_events
+            for wi, w in enumerate(self._window_us):
+                old = h = heads[wi]
+                cutoff = t - w
+                while times[h - off] < cutoff:
+                    h += 1
+                if cap is not None and h <= idx - cap:
+                    h = idx + 1 - cap
+                if h != old:
+                    if columns:
+                        self._expire_values(s, wi, old, h)
+                    heads[wi] = h
+
+            # Drop events no window needs, in bulk once enough have piled up
+            first = min(heads)
+            drop = first - off
+            if drop >= self._compact_after and 2 * drop >= len(times):
+                self._compact(s, first)
+        if distinct:
+            self._push_distinct(s, t, distinct)
+
+    def _push_values(self, s: _KeyState, values):
+        columns = s.values
+        for col, v in zip(columns, values):
+            col.append(float(v))
+        for si, (_, vi) in enumerate(self._sum_slots):
+            s.sums[si] += columns[vi][-1]
+        off = s.offset
+        for si, (_, vi, is_max) in enumerate(self._extrema_slots):
+            dq, col = s.extrema[si], columns[vi]
+            v = col[-1]
+            if is_max:
+                while dq and col[dq[-1] - off] <= v:
+                    dq.pop()
+            else:
+                while dq and col[dq[-1] - off] >= v:
+                    dq.pop()
+            dq.append(off + len(col) - 1)
+
+    def _expire_values(self, s: _KeyState, wi: int, old: int, head: int):
+        """Remove events [old, head) from window `wi`'s sums and extrema."""
+        off = s.offset
+        for si in self._sums_of[wi]:
+            s.sums[si] -= sum(s.values[self._sum_slots[si][1]][old - off:head - off])
+        for si in self._extrema_of[wi]:
+            dq = s.extrema[si]
+            while dq[0] < head:
+                dq.popleft()
+
+    def _compact(self, s: _KeyState, first: int):
+        drop = first - s.offset
+        del s.times[:drop]
+        for col in s.values:
+            del col[:drop]
+        s.offset = first
+        # Re-sum from scratch, so running-sum rounding error does not accumulate
+        for si, (wi, vi) in enumerate(self._sum_slots):
+            s.sums[si] = math.fsum(s.values[vi][s.heads[wi] - first:])
+
+    def _push_distinct(self, s: _KeyState, t: int, distinct):
+        precision = self.precision
+        for regs, v in zip(s.hll, distinct):
+            if v is None:
+                continue
+            reg, rank = _hll_position(v, precision)
+            entries = regs.get(reg)
+            if entries is None:
+                regs[reg] = [(t, rank)]
+                continue
+            # Older entries with a rank no higher can never be the maximum again
+            while entries and entries[-1][1] <= rank:
+                entries.pop()
+            entries.append((t, rank))
+
+    def _estimate_distinct(self, regs: dict, cutoff: int) -> float:
+        weight = self._rank_weight
+        total, nonzero = 0.0, 0
+        for entries in regs.values():
+            # Times ascend and ranks descend: the first live entry is the register value
+            for t, rank in entries:
+                if t >= cutoff:
+                    total += weight[rank]
+                    nonzero += 1
+                    break
+        m = self._m
+        zeros = m - nonzero
+        estimate = self._alpha_mm / (total + zeros)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            return m * math.log(m / zeros)
+        return estimate
+
+    @staticmethod
+    def _prune_distinct(regs: dict, cutoff: int):
+        for reg in [r for r, entries in regs.items() if entries[-1][0] < cutoff]:
+            del regs[reg]
+        for entries in regs.values():
+            while entries[0][0] < cutoff:
+                del entries[0]
+
+    def _read(self, s: _KeyState, t: int) -> tuple:
+        if self._count_windows is not None:
+            end = s.offset + len(s.times)
+            heads = s.heads
+            return tuple([end - heads[wi] for wi in self._count_windows])
+        out = []
+        end = s.offset + len(s.times)
+        for kind, slot, w in self._readers:
+            if kind == "count":
+                out.append(end - s.heads[slot])
+            elif kind == "sum":
+                out.append(s.sums[slot])
+            elif kind == "extremum":
+                vi = self._extrema_slots[slot][1]
+                out.append(s.values[vi][s.extrema[slot][0] - s.offset])
+            else:
+                out.append(self._estimate_distinct(s.hll[slot], t - w))
+        for regs, keep in zip(s.hll, self._distinct_keep):
+            self._prune_distinct(regs, t - keep)
+        return tuple(out)
+
+    def observe(self, key, t: int, values=(), distinct=()) -> tuple:
+        """
+        Add one event and return every metric for its key.
+
+        Args:
+            key: Group key (None: aggregate the event on its own).
+            t (int): Event time in epoch microseconds.
+            values (Sequence[float]): Values of the numeric fields used by
+                sum/min/max metrics, in `_value_fields` order.
+            distinct (Sequence): Values of the distinct-count fields.
+
+        Returns:
+            tuple: One value per metric, in registration order.
+        """
+        if not self._compiled:
+            self._compile()
+        if key is None:
+            s = self._new_state()
+            self._observe(s, t, values, distinct)
+            return self._read(s, t)
+
+        states = self._states
+        s = states.get(key)
+        if s is None:
+            s = self._admit(key)
+        else:
+            states.move_to_end(key)
+        self._observe(s, t, values, distinct)
+
+        if t > self._clock:
+            self._clock = t
+        if self.spill is not None:
+            self.spill.lookups += 1
+        self._updates += 1
+        if self._updates % _SWEEP_EVERY == 0:
+            self._sweep(_SWEEP_EVERY * _SWEEP_PER_UPDATE)
+        return self._read(s, t)
+
+    def _admit(self, key) -> _KeyState:
+        """Add a key not held in memory: read it back from the spill store, or start it empty."""
+        states, spill = self._states, self.spill
+        blob = None
+        if spill is not None:
+            if len(states) >= self.max_keys:
+                self._spill_lru(len(states) - self.max_keys + 1)
+            blob = spill.take(key)
+        s = self._new_state() if blob is None else _KeyState.load(blob)
+        states[key] = s
+        return s
+
+    def _spill_lru(self, count: int):
+        """Move the `count` least recently used keys to the spill store."""
+        states, spill = self._states, self.spill
+        for _ in range(min(count, len(states))):
+            key, s = states.popitem(last=False)
+            spill.put(key, s.dump(), s.last_seen)
+
+    def _sweep(self, steps: int):
+        """Evict up to `steps` keys idle for longer than `idle_us` (least recent first)."""
+        states = self._states
+        horizon = self._clock - self.idle_us
+        if self.spill is not None:
+            self.spill.horizon = horizon
+        for _ in range(steps):
+            if not states:
+                return
+            key, s = next(iter(states.items()))
+            if s.last_seen >= horizon:
+                return
+            del states[key]
+
+    # ---- transactions and batches ----------------------------------------
+
+    def update(self, transaction) -> tuple:
+        """Add a `Transaction` and return every metric for its key."""
+        if transaction is self._last_input:
+            return self._last_output
+        if not self._compiled:
+            self._compile()
+        value_fields, distinct_fields = self._value_fields, self._distinct_fields
+        result = self.observe(
+            getattr(transaction, self.key),
+            to_epoch_us(transaction.timestamp),
+            [getattr(transaction, f) for f in value_fields] if value_fields else (),
+            [getattr(transaction, f) for f in distinct_fields] if distinct_fields else (),
+        )
+        self._last_input, self._last_output = transaction, result
+        return result
+
+    def update_batch(self, batch: TransactionBatch) -> np.ndarray:
+        """
+        Add every row of a batch, in order.
+
+        Count-only aggregators keyed by user id are evaluated vectorized
+        (`_update_counts_batch`); others run the per-event path over the
+        batch columns.
+
+        Returns:
+            np.ndarray: float64 array of shape (rows, metrics).
+        """
+        if batch is self._last_input:
+            return self._last_output
+        if not self._compiled:
+            self._compile()
+        n = len(batch)
+        if self._count_windows is not None and self.key == "user_id":
+            result = self._update_counts_batch(batch)
+        else:
+            keys = _batch_column(batch, self.key)
+            times = batch.timestamp.tolist()
+            value_columns = [_batch_column(batch, f) for f in self._value_fields]
+            distinct_columns = [_batch_column(batch, f) for f in self._distinct_fields]
+            values = zip(*value_columns) if value_columns else [()] * n
+            distinct = zip(*distinct_columns) if distinct_columns else [()] * n
+            observe = self.observe
+            rows = [observe(k, t, v, d) for k, t, v, d in zip(keys, times, values, distinct)]
+            result = np.array(rows, dtype=np.float64).reshape(n, len(self.metrics))
+        self._last_input, self._last_output = batch, result
+        return result
+
+    def _update_counts_batch(self, batch: TransactionBatch) -> np.ndarray:
+        """
+        Vectorized equivalent of observing every row of a batch in order.
+
+        Rows are grouped by user (stable, so per-user arrival order is kept),
+        each user's live history is prepended, and the window counts of every
+        row are found with one `searchsorted` per window over all groups.
+        """
+        n = len(batch)
+        out = np.zeros((n, len(self.metrics)), dtype=np.float64)
+        if n == 0:
+            return out
+
+        order = np.argsort(batch.user_code, kind="stable")
+        codes = batch.user_code[order]
+        new_times = batch.timestamp[order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        new_counts = np.diff(np.r_[starts, n])
+
+        states, ids = self._states, batch.user_ids
+        group_keys = [ids[code] for code in codes[starts].tolist()]
+        group_states = [states.get(key) for key in group_keys]
+        if self.spill is not None:
+            self._load_spilled(group_keys, group_states)
+        history, hist_counts = [], [0] * len(group_keys)
+        for g, s in enumerate(group_states):
+            if s is not None:
+                live = s.times[min(s.heads) - s.offset:]
+                history.extend(live)
+                hist_counts[g] = len(live)
+        hist_counts = np.array(hist_counts, dtype=np.int64)
+
+        # Lay out [history..., new...] for every user, one group after another
+        group_sizes = hist_counts + new_counts
+        group_starts = np.r_[0, np.cumsum(group_sizes)[:-1]]
+        group_of = np.repeat(np.arange(len(group_sizes)), group_sizes)
+        within = np.arange(len(group_of)) - group_starts[group_of]
+        is_new = within >= hist_counts[group_of]
+        times = np.empty(len(group_of), dtype=np.int64)
+        times[is_new] = new_times
+        times[~is_new] = np.array(history, dtype=np.int64)
+
+        # Shift each group onto its own disjoint range, separated by more than
+        # the largest window, so a searchsorted never crosses a group boundary.
+        largest = max(self._window_us)
+        group_min = np.minimum.reduceat(times, group_starts)
+        group_span = np.maximum.reduceat(times, group_starts) - group_min
+        offsets = np.r_[0, np.cumsum(group_span + largest + 1)[:-1]]
+        if int(offsets[-1]) + int(group_span[-1]) >= 2 ** 62:
+            raise OverflowError("Batch time range too large for vectorized window counts.")
+        keys = times - group_min[group_of] + offsets[group_of]
+
+        positions = np.arange(len(keys))
+        group_last = group_starts + group_sizes - 1
+        cap = self.max_events
+        heads = []
+        for wi, w in enumerate(self._window_us):
+            window_start = np.searchsorted(keys, keys - w, side="left")
+            if cap is not None:
+                window_start = np.maximum(window_start, positions - cap + 1)
+            counts = positions - window_start + 1
+            for i, metric_window in enumerate(self._count_windows):
+                if metric_window == wi:
+                    out[order, i] = counts[is_new]
+            heads.append((window_start[group_last] - group_starts).tolist())
+
+        # Store each user's live events; indices restart at the group start
+        first = np.min(np.array(heads), axis=0).tolist()
+        group_starts = group_starts.tolist()
+        group_sizes = group_sizes.tolist()
+        times = times.tolist()
+        last_times = [times[a + size - 1] for a, size in zip(group_starts, group_sizes)]
+        # Least recently seen users first, as the eviction sweep expects
+        new_state = self._new_state
+        for g in np.argsort(last_times, kind="stable").tolist():
+            key, s = group_keys[g], group_states[g]
+            if s is None:
+                s = states[key] = new_state()
+            else:
+                states.move_to_end(key)
+            a = group_starts[g]
+            s.times = times[a + first[g]:a + group_sizes[g]]
+            s.offset = first[g]
+            s.heads = [h[g] for h in heads]
+            s.last_seen = last_times[g]
+            s.dirty = True
+
+        self._clock = max(self._clock, int(new_times.max()))
+        self._updates += n
+        self._sweep(_SWEEP_PER_UPDATE * len(group_keys))
+        if self.spill is not None:
+            self.spill.lookups += len(group_keys)
+            if len(states) > self.max_keys:
+                self._spill_lru(len(states) - self.max_keys)
+        return out
+
+    def _load_spilled(self, keys: list, group_states: list):
+        """Read the batch's spilled keys back in one query (fills `group_states` in place)."""
+        missing = [g for g, s in enumerate(group_states) if s is None]
+        if not missing:
+            return
+        spill, states = self.spill, self._states
+        spill.prefetch(keys[g] for g in missing)
+        for g in missing:
+            blob = spill.take(keys[g])
+            if blob is not None:
+                s = group_states[g] = _KeyState.load(blob)
+                states[keys[g]] = s
+
+    # ---- introspection ---------------------------------------------------
+
+    def __len__(self):
+        return len(self._states)
+
+    def __contains__(self, key):
+        return key in self._states
+
+    def history(self, key) -> List[int]:
+        """Timestamps of `key`'s events inside its largest window, oldest first."""
+        s = self._states.get(key)
+        if s is None or not s.heads:
+            return []
+        return s.times[min(s.heads) - s.offset:]
+
+    def evict_idle(self, now: Optional[int] = None) -> int:
+        """Evict every key idle for longer than `idle_us`; return how many were evicted."""
+        if now is not None and now > self._clock:
+            self._clock = now
+        before = len(self._states)
+        self._sweep(before)
+        return before - len(self._states)
+
+    def memory_usage(self) -> int:
+        """Approximate bytes of per-key state, including the key index."""
+        total = sys.getsizeof(self._states)
+        for s in self._states.values():
+            total += sys.getsizeof(s.times) + 32 * len(s.times)
+            total += sum(sys.getsizeof(col) + 24 * len(col) for col in s.values)
+            total += sum(sys.getsizeof(dq) for dq in s.extrema)
+            total += sum(sys.getsizeof(regs) + 72 * sum(map(len, regs.values())) for regs in s.hll)
+        return total
+
+    # ---- checkpoints -----------------------------------------------------
+
+    def snapshot_state(self, incremental: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Export the live events of every key (or only of keys changed since
+        the last snapshot) as flat arrays, and clear the dirty marks.
+        Aggregates are rebuilt from the events on restore.
+        """
+        if self.spill is not None:
+            raise ValueError("Cannot checkpoint an aggregator that spills state to disk.")
+        if not self._compiled:
+            self._compile()
+        keys, last_seen, sizes, times, values = [], [], [], [], []
+        hll_key, hll_field, hll_register, hll_time, hll_rank = [], [], [], [], []
+        for key, s in self._states.items():
+            if incremental and not s.dirty:
+                continue
+            k = len(keys)
+            keys.append(key)
+            last_seen.append(s.last_seen)
+            first = (min(s.heads) - s.offset) if s.heads else len(s.times)
+            sizes.append(len(s.times) - first)
+            times.extend(s.times[first:])
+            values.extend(zip(*(col[first:] for col in s.values)))
+            for fi, regs in enumerate(s.hll):
+                for reg, entries in regs.items():
+                    for t, rank in entries:
+                        hll_key.append(k)
+                        hll_field.append(fi)
+                        hll_register.append(reg)
+                        hll_time.append(t)
+                        hll_rank.append(rank)
+            s.dirty = False
+        return {
+            "keys": np.array(keys, dtype=str),
+            "last_seen": np.array(last_seen, dtype=np.int64),
+            "sizes": np.array(sizes, dtype=np.int64),
+            "times": np.array(times, dtype=np.int64),
+            "values": np.array(values, dtype=np.float64).reshape(len(times), len(self._value_fields)),
+            "hll_key": np.array(hll_key, dtype=np.int64),
+            "hll_field": np.array(hll_field, dtype=np.int64),
+            "hll_register": np.array(hll_register, dtype=np.int64),
+            "hll_time": np.array(hll_time, dtype=np.int64),
+            "hll_rank": np.array(hll_rank, dtype=np.int64),
+            "clock": np.array([self._clock], dtype=np.int64),
+        }
+
+    def restore_state(self, state: Dict[str, np.ndarray], incremental: bool = False):
+        """
+        Load arrays produced by `snapshot_state`.
+
+        A full restore replaces all keys; an incremental one overwrites just
+        the listed keys.
+        """
+        if not self._compiled:
+            self._compile()
+        if not incremental:
+            self._states = OrderedDict()
+        keys = state["keys"].tolist()
+        rebuilt = []
+        times = state["times"].tolist()
+        values = state["values"].tolist()
+        pos = 0
+        for size in state["sizes"].tolist():
+            s = self._new_state()
+            for t, v in zip(times[pos:pos + size], values[pos:pos + size]):
+                self._observe(s, t, v, ())
+            pos += size
+            rebuilt.append(s)
+        for k, fi, reg, t, rank in zip(state["hll_key"].tolist(), state["hll_field"].tolist(),
+                                       state["hll_register"].tolist(), state["hll_time"].tolist(),
+                                       state["hll_rank"].tolist()):
+            rebuilt[k].hll[fi].setdefault(reg, []).append((t, rank))
+
+        # Keep the least recently seen keys first, as the eviction sweep expects
+        for key, s, seen in sorted(zip(keys, rebuilt, state["last_seen"].tolist()),
+                                   key=lambda item: item[2]):
+            s.last_seen = seen
+            s.dirty = False
+            self._states.pop(key, None)
+            self._states[key] = s
+        if incremental:
+            # Restored keys may be older than keys already present
+            self._states = OrderedDict(sorted(self._states.items(), key=lambda kv: kv[1].last_seen))
+        self._clock = max(self._clock, int(state["clock"][0]))
+        self._last_input = self._last_output = None
@@ -0,0 +1,113 @@
+# scripts/backtest.py
+"""
+Backtest a grid of rule configurations in one pass over the data (see
+`fraud_engine.backtest`). The grid varies parameters of the rules in
+config/rules.config.yaml; every combination is evaluated side by side.
+
+Typical usage:
+    python -m scripts.backtest --param RapidTransactionsRule.max_txns=2,3,5 \\
+        --param RapidTransactionsRule.window_minutes=1,5 \\
+        --param LargeTransactionRule.threshold=5000,10000 --output logs/backtest.csv
+    python -m scripts.backtest --grid config/backtest.grid.yaml --source data/big.columnar
+"""
+import argparse
+import copy
+import csv
+import os
+import time
+
+from fraud_engine.backtest import Backtest
+from fraud_engine.config import load_yaml
+from fraud_engine.pipeline import batch_pipeline
+from fraud_engine.utils import validate_file_path
+from scripts.run_detection import RULE_CLASSES, load_rules, logger, setup_logging
+
+
+def parse_param(spec: str):
+    """'Rule.param=v1,v2' -> ('Rule', 'param', [v1, v2]) with YAML-typed values."""
+    import yaml
+    target, _, values = spec.partition("=")
+    rule, _, param = target.rpartition(".")
+    if not rule or not param or not values:
+        raise ValueError(f"Expected Rule.param=value[,value...], got {spec!r}")
+    return rule, param, [yaml.safe_load(v) for v in values.split(",")]
+
+
+def main(source=None, grid=None, params=(), output=None, overlap_csv=None):
+    if source is None:
+        source = os.path.join(os.path.dirname(__file__), "../data/sample_transaction.csv")
+    validate_file_path(source)
+    source_type = "columnar" if os.path.isdir(source) else "csv"
+
+    grid = copy.deepcopy(grid or {})
+    for spec in params:
+        rule, param, values = parse_param(spec)
+        grid.setdefault(rule, {})[param] = values
+
+    backtest = Backtest(copy.deepcopy(load_rules().get("rules", [])), grid, RULE_CLASSES)
+    logger.info(f"Backtesting {len(backtest.configs)} configurations "
+                f"({len(backtest.variants)} distinct rules) on: {source}")
+    start = time.perf_counter()
+    rejects = []
+    result = backtest.run(batch_pipeline(source, source_type, rejects=rejects))
+    elapsed = time.perf_counter() - start
+    logger.info(f"Evaluated {result.transactions} transactions in {elapsed:.2f}s"
+                + (f" ({len(rejects)} invalid rows skipped)" if rejects else ""))
+
+    rows = result.rows()
+    jaccard = result.jaccard()
+    logger.info("=== Alerts per configuration ===")
+    for i, row in enumerate(rows):
+        others = [j for j in range(len(rows)) if j != i]
+        closest = max(others, key=lambda j: jaccard[i, j]) if others else None
+        logger.info(f"  [{i}] {row['config']}: alerts={row['alerts']} ({row['alert_rate']:.2%})"
+                    + (f", closest [{closest}] jaccard={jaccard[i, closest]:.2f}"
+                       if closest is not None else ""))
+
+    if output:
+        with open(output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        logger.info(f"Wrote configuration summary to: {output}")
+    if overlap_csv:
+        with open(overlap_csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["config_a", "config_b", "both", "jaccard"])
+            for i in range(len(rows)):
+                for j in range(i + 1, len(rows)):
+                    writer.writerow([result.labels[i], result.labels[j],
+                                     int(result.overlap[i, j]), f"{jaccard[i, j]:.4f}"])
+        logger.info(f"Wrote pairwise alert overlap to: {overlap_csv}")
+    return result
+
+
+def build_parser(prog=None):
+    parser = argparse.ArgumentParser(prog=prog,
+                                     description="Backtest a grid of rule configurations.")
+    parser.add_argument("--source", default=None,
+                        help="CSV file or columnar store directory "
+                             "(default: data/sample_transaction.csv).")
+    parser.add_argument("--grid", default=None,
+                        help="YAML file mapping rule name/type -> parameter -> list of values.")
+    parser.add_argument("--param", action="append", default=[],
+                        help="Grid axis as Rule.param=v1,v2 (repeatable; adds to --grid).")
+    parser.add_argument("--output", default=None,
+                        help="CSV file for per-configuration alert counts.")
+    parser.add_argument("--overlap-csv", default=None,
+                        help="CSV file for pairwise alert overlap between configurations.")
+    return parser
+
+
+def cli(argv=None, prog=None):
+    args = build_parser(prog).parse_args(argv)
+    setup_logging()
+    grid = None
+    if args.grid:
+        validate_file_path(args.grid)
+        grid = load_yaml(args.grid, kind="grid")
+    main(args.source, grid, args.param, args.output, args.overlap_csv)
+
+
+if __name__ == "__main__":
+    cli()
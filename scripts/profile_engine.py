@@ -1,33 +1,381 @@
-from collections import defaultdict
+import heapq
+import struct
+import sys
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Optional
+import numpy as np
+from fraud_engine.sketches import QuantileSketch
 from fraud_engine.schema import Transaction
+from fraud_engine.batch import TransactionBatch, to_epoch_us
+
+EMPTY_PROFILE = MappingProxyType({
+    "total_txn": 0,
+    "total_amount": 0.0,
+    "avg_amount": 0.0,
+    "std_amount": 0.0,
+    "ewma_amount": 0.0,
+    "last_seen": None,
+})
+
+_US_PER_HOUR = 3600 * 1_000_000
+_REPORT_QUANTILES = (0.5, 0.9, 0.99)
+# count, total, mean, m2, ewma, last_seen: one spilled profile
+_ROW = struct.Struct("<qddddq")
+_ROW_DTYPE = np.dtype([("count", "<i8"), ("total", "<f8"), ("mean", "<f8"), ("m2", "<f8"),
+                       ("ewma", "<f8"), ("last_seen", "<i8")])
+_REPORT_CHUNK = 65536
+
+
+def _top_indices(counts: np.ndarray, top: int) -> np.ndarray:
+    """Indices of the `top` largest counts, descending (ties: lowest index first)."""
+    if len(counts) > top:
+        candidates = np.argpartition(-counts, top - 1)[:top]
+        # Keep every tie of the smallest selected count so the cut is by index
+        candidates = np.flatnonzero(counts >= counts[candidates].min())
+    else:
+        candidates = np.arange(len(counts))
+    order = np.lexsort((candidates, -counts[candidates]))
+    return candidates[order][:top]
+
+
+def _profile_report(counts: np.ndarray, avgs: np.ndarray, top_users: list) -> dict:
+    def spread(values):
+        if not len(values):
+            return {}
+        qs = np.quantile(values, _REPORT_QUANTILES)
+        return dict({f"p{round(q * 100)}": float(v) for q, v in zip(_REPORT_QUANTILES, qs)},
+                    max=float(values.max()))
+
+    return {
+        "users": len(counts),
+        "txns_per_user": spread(counts),
+        "avg_amount_per_user": spread(avgs),
+        "top_users": top_users,
+    }
+
+
+def _sketch_spread(sketch: QuantileSketch) -> dict:
+    """`_profile_report` spread from a quantile sketch (1% relative error)."""
+    if not sketch.count:
+        return {}
+    return dict({f"p{round(q * 100)}": sketch.quantile(q) for q in _REPORT_QUANTILES},
+                max=float(sketch.max))
+
+
+def summarize_profiles(profiles: dict, top: int = 10) -> dict:
+    """`ProfileEngine.report` for a user_id -> profile dict (e.g. merged shard profiles)."""
+    users = list(profiles)
+    counts = np.fromiter((p["total_txn"] for p in profiles.values()), np.int64, len(users))
+    avgs = np.fromiter((p["avg_amount"] for p in profiles.values()), np.float64, len(users))
+    return _profile_report(counts, avgs,
+                           [(users[i], profiles[users[i]]) for i in _top_indices(counts, top)])
+
 
 class ProfileEngine:
     """
     Maintains user profiles:
     - total transactions
     - total amount
-    - average amount
+    - average amount and variance (Welford's online algorithm)
+    - last-seen time (epoch microseconds)
+    - exponentially time-decayed mean amount (half-life `half_life_hours`)
+
+    Profiles are stored struct-of-arrays: user ids are interned to a dense
+    slot index and every statistic lives in one contiguous NumPy array.
+
+    With `max_users` and `spill` (a `StateSpill`), at most `max_users`
+    profiles stay in memory: slots are reused in least-recently-used order
+    and evicted profiles are spilled to disk, then read back when their user
+    returns. Such an engine cannot be checkpointed, its `report` quantiles
+    are sketch estimates, and a batch may not hold more than `max_users` users.
     """
 
-    def __init__(self):
-        self.user_profiles = defaultdict(lambda: {
-            "total_txn": 0,
-            "total_amount": 0.0,
-            "avg_amount": 0.0
-        })
+    _ARRAYS = ("_count", "_total", "_mean", "_m2", "_ewma", "_last_seen", "_dirty")
+
+    def __init__(self, half_life_hours: float = 24.0, initial_users: int = 1024,
+                 max_users: Optional[int] = None, spill=None):
+        if (max_users is None) != (spill is None):
+            raise ValueError("max_users and spill must be given together")
+        if max_users is not None:
+            if max_users < 1:
+                raise ValueError("max_users must be at least 1")
+            initial_users = min(initial_users, max_users)
+        self.half_life_us = half_life_hours * _US_PER_HOUR
+        self.max_users = max_users
+        self.spill = spill
+        self._index = {} if spill is None else OrderedDict()
+        self._users = []
+        self._count = np.zeros(initial_users, dtype=np.int64)
+        self._total = np.zeros(initial_users, dtype=np.float64)
+        self._mean = np.zeros(initial_users, dtype=np.float64)
+        self._m2 = np.zeros(initial_users, dtype=np.float64)
+        self._ewma = np.zeros(initial_users, dtype=np.float64)
+        self._last_seen = np.zeros(initial_users, dtype=np.int64)
+        # Users updated since the last checkpoint
+        self._dirty = np.zeros(initial_users, dtype=bool)
+
+    def __len__(self):
+        return len(self._users)
+
+    def _resize(self, size, keep=True):
+        for name in self._ARRAYS:
+            old = getattr(self, name)
+            new = np.zeros(size, dtype=old.dtype)
+            if keep:
+                new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _slot(self, user_id) -> int:
+        if self.spill is not None:
+            return self._spilling_slot(user_id)
+        slot = self._index.get(user_id)
+        if slot is None:
+            slot = len(self._users)
+            if slot == len(self._count):
+                self._resize(max(2 * slot, 1))
+            self._index[user_id] = slot
+            self._users.append(user_id)
+        return slot
+
+    def _spilling_slot(self, user_id) -> int:
+        """`_slot` with at most `max_users` profiles in memory, the least recently used spilled."""
+        index, spill = self._index, self.spill
+        spill.lookups += 1
+        slot = index.get(user_id)
+        if slot is not None:
+            index.move_to_end(user_id)
+            return slot
+        if len(index) >= self.max_users:
+            evicted, slot = index.popitem(last=False)
+            spill.put(evicted, self._dump(slot), int(self._last_seen[slot]))
+            self._users[slot] = user_id
+        else:
+            slot = len(self._users)
+            if slot == len(self._count):
+                self._resize(min(max(2 * slot, 1), self.max_users))
+            self._users.append(user_id)
+        index[user_id] = slot
+        self._load(slot, spill.take(user_id))
+        return slot
+
+    def _dump(self, slot) -> bytes:
+        return _ROW.pack(int(self._count[slot]), float(self._total[slot]), float(self._mean[slot]),
+                         float(self._m2[slot]), float(self._ewma[slot]), int(self._last_seen[slot]))
+
+    def _load(self, slot, blob: Optional[bytes]):
+        """Fill a slot from a spilled row (or reset it for a new user)."""
+        row = _ROW.unpack(blob) if blob is not None else (0, 0.0, 0.0, 0.0, 0.0, 0)
+        (self._count[slot], self._total[slot], self._mean[slot],
+         self._m2[slot], self._ewma[slot], self._last_seen[slot]) = row
+        self._dirty[slot] = True
 
     def update_profile(self, txn: Transaction):
-        profile = self.user_profiles[txn.user_id]
-        profile["total_txn"] += 1
-        profile["total_amount"] += txn.amount
-        profile["avg_amount"] = profile["total_amount"] / profile["total_txn"]
+        slot = self._slot(txn.user_id)
+        x = txn.amount
+        now = to_epoch_us(txn.timestamp)
+
+        n = int(self._count[slot]) + 1
+        mean = float(self._mean[slot])
+        delta = x - mean
+        mean += delta / n
+        self._count[slot] = n
+        self._total[slot] += x
+        self._mean[slot] = mean
+        self._m2[slot] += delta * (x - mean)
+
+        if n == 1:
+            self._ewma[slot] = x
+        else:
+            w = 0.5 ** (max(now - int(self._last_seen[slot]), 0) / self.half_life_us)
+            self._ewma[slot] = w * self._ewma[slot] + (1.0 - w) * x
+        self._last_seen[slot] = now
+        self._dirty[slot] = True
+
+    def update_batch(self, batch: TransactionBatch):
+        """
+        Apply a whole batch in one vectorized pass.
+
+        Equivalent to calling `update_profile` on every row in order, up to
+        floating-point rounding: per-user batch statistics are merged into the
+        stored ones with Chan's parallel variance update, and the decayed mean
+        uses its closed form over each user's rows.
+        """
+        if not len(batch):
+            return
+        order = np.argsort(batch.user_code, kind="stable")
+        codes = batch.user_code[order]
+        x = batch.amount[order]
+        t = batch.timestamp[order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        group_of = np.cumsum(np.r_[False, codes[1:] != codes[:-1]])
+        users = [batch.user_ids[c] for c in codes[starts].tolist()]
+        if self.spill is not None:
+            if len(users) > self.max_users:
+                raise ValueError(f"Batch has {len(users)} users; at most max_users="
+                                 f"{self.max_users} can be updated at once.")
+            self.spill.prefetch(u for u in users if u not in self._index)
+        slots = np.array([self._slot(u) for u in users], dtype=np.int64)
+
+        # Welford / Chan merge of (stored) and (batch) statistics
+        n_b = np.bincount(group_of).astype(np.int64)
+        sum_b = np.bincount(group_of, weights=x)
+        mean_b = sum_b / n_b
+        m2_b = np.bincount(group_of, weights=(x - mean_b[group_of]) ** 2)
+        n_a = self._count[slots]
+        mean_a = self._mean[slots]
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        self._mean[slots] = mean_a + delta * n_b / n
+        self._m2[slots] += m2_b + delta ** 2 * n_a * n_b / n
+        self._count[slots] = n
+        self._total[slots] += sum_b
+
+        # Time-decayed mean: e_k = d(t_k - t_0) e_0 + sum_j (1 - w_j) x_j d(t_k - t_j)
+        prev_t = np.r_[0, t[:-1]]
+        prev_t[starts] = self._last_seen[slots]
+        w = 0.5 ** (np.maximum(t - prev_t, 0) / self.half_life_us)
+        w[starts[n_a == 0]] = 0.0
+        last_t = t[np.r_[starts[1:], len(t)] - 1]
+        decay_to_end = 0.5 ** (np.maximum(last_t[group_of] - t, 0) / self.half_life_us)
+        carried = np.where(n_a > 0, 0.5 ** (np.maximum(last_t - self._last_seen[slots], 0)
+                                            / self.half_life_us), 0.0)
+        self._ewma[slots] = carried * self._ewma[slots] + np.bincount(
+            group_of, weights=(1.0 - w) * x * decay_to_end)
+
+        self._last_seen[slots] = last_t
+        self._dirty[slots] = True
+
+    def _profile(self, slot) -> dict:
+        return self._row_profile(self._count[slot], self._total[slot], self._mean[slot],
+                                 self._m2[slot], self._ewma[slot], self._last_seen[slot])
+
+    @staticmethod
+    def _row_profile(n, total, mean, m2, ewma, last_seen) -> dict:
+        n = int(n)
+        return {
+            "total_txn": n,
+            "total_amount": float(total),
+            "avg_amount": float(total) / n,
+            "std_amount": (float(m2) / (n - 1)) ** 0.5 if n > 1 else 0.0,
+            "ewma_amount": float(ewma),
+            "last_seen": int(last_seen),
+        }
 
     def get_profile(self, user_id):
-        return self.user_profiles.get(user_id, {
-            "total_txn": 0,
-            "total_amount": 0.0,
-            "avg_amount": 0.0
-        })
+        slot = self._slot(user_id) if self.spill is not None else self._index.get(user_id)
+        if slot is None or not self._count[slot]:
+            return EMPTY_PROFILE
+        return self._profile(slot)
+
+    def stats(self, user_id):
+        """Return (count, mean, std) for a user without building a dict, or None."""
+        if self.spill is not None:
+            slot = self._slot(user_id)
+            if not self._count[slot]:
+                return None
+        else:
+            slot = self._index.get(user_id)
+            if slot is None:
+                return None
+        n = int(self._count[slot])
+        std = (float(self._m2[slot]) / (n - 1)) ** 0.5 if n > 1 else 0.0
+        return n, float(self._mean[slot]), std
 
     def summary(self):
-        return dict(self.user_profiles)
+        profiles = {user: self._profile(slot) for slot, user in enumerate(self._users)}
+        if self.spill is not None:
+            for user, blob in self.spill.items():
+                if user not in profiles:
+                    profiles[user] = self._row_profile(*_ROW.unpack(blob))
+        return profiles
+
+    def report(self, top: int = 10) -> dict:
+        """
+        Bounded summary of all profiles: the user count, quantiles of
+        transactions and average amount per user, and the `top` most active
+        users with their profiles. Unlike `summary()`, its size does not grow
+        with the number of users.
+        """
+        if self.spill is not None:
+            return self._spilled_report(top)
+        used = len(self._users)
+        counts = self._count[:used]
+        avgs = self._total[:used] / np.maximum(counts, 1)
+        return _profile_report(counts, avgs, [(self._users[s], self._profile(s))
+                                              for s in _top_indices(counts, top).tolist()])
+
+    def _profile_chunks(self):
+        """(users, rows) chunks of every profile, in memory and spilled; rows use `_ROW_DTYPE`."""
+        used = len(self._users)
+        rows = np.empty(used, dtype=_ROW_DTYPE)
+        for name in _ROW_DTYPE.names:
+            rows[name] = getattr(self, "_" + name)[:used]
+        yield self._users, rows
+        users, blobs = [], []
+        for user, blob in self.spill.items():
+            if user in self._index:
+                continue
+            users.append(user)
+            blobs.append(blob)
+            if len(users) == _REPORT_CHUNK:
+                yield users, np.frombuffer(b"".join(blobs), dtype=_ROW_DTYPE)
+                users, blobs = [], []
+        if users:
+            yield users, np.frombuffer(b"".join(blobs), dtype=_ROW_DTYPE)
+
+    def _spilled_report(self, top: int) -> dict:
+        """`report` streamed over memory and the spill store, one chunk at a time."""
+        n_users = 0
+        counts_sketch, avgs_sketch = QuantileSketch(), QuantileSketch()
+        best = []
+        for users, rows in self._profile_chunks():
+            counts = rows["count"]
+            n_users += len(users)
+            counts_sketch.add_many(counts)
+            avgs_sketch.add_many(rows["total"] / np.maximum(counts, 1))
+            chunk_best = [(int(counts[i]), users[i], rows[i]) for i in _top_indices(counts, top).tolist()]
+            best = heapq.nlargest(top, best + chunk_best, key=lambda item: item[0])
+        return {
+            "users": n_users,
+            "txns_per_user": _sketch_spread(counts_sketch),
+            "avg_amount_per_user": _sketch_spread(avgs_sketch),
+            "top_users": [(user, self._row_profile(*row.tolist())) for _, user, row in best],
+        }
+
+    def memory_usage(self) -> int:
+        """Approximate bytes used by the profile store, including the user index."""
+        arrays = sum(getattr(self, name).nbytes for name in self._ARRAYS)
+        return arrays + sys.getsizeof(self._index) + sys.getsizeof(self._users)
+
+    def snapshot_state(self, incremental=False):
+        """Export profiles (all, or only those changed since the last snapshot) as arrays."""
+        if self.spill is not None:
+            raise ValueError("Cannot checkpoint profiles that spill to disk.")
+        used = len(self._users)
+        slots = np.flatnonzero(self._dirty[:used]) if incremental else np.arange(used)
+        self._dirty[:used] = False
+        return {
+            "keys": np.array([self._users[s] for s in slots], dtype=str),
+            "count": self._count[slots],
+            "total": self._total[slots],
+            "mean": self._mean[slots],
+            "m2": self._m2[slots],
+            "ewma": self._ewma[slots],
+            "last_seen": self._last_seen[slots],
+        }
+
+    def restore_state(self, state, incremental=False):
+        if self.spill is not None:
+            raise ValueError("Cannot restore profiles that spill to disk.")
+        keys = state["keys"].tolist()
+        if incremental:
+            slots = np.array([self._slot(u) for u in keys], dtype=np.int64)
+        else:
+            self._users = list(keys)
+            self._index = dict(zip(keys, range(len(keys))))
+            self._resize(max(len(keys), 1024), keep=False)
+            slots = np.arange(len(keys))
+        for name in ("count", "total", "mean", "m2", "ewma", "last_seen"):
+            getattr(self, "_" + name)[slots] = state[name]
+        self._dirty[slots] = False
@@ -1,124 +1,454 @@
 # scripts/run_detection.py
 import os
-import csv
+import sys
+import argparse
+import itertools
 import logging
 import logging.config
-import yaml
-from collections import Counter
+from logging.handlers import QueueHandler
 
+from fraud_engine.config import (DEFAULT_LOGGING_CONFIG, DEFAULT_RULES_CONFIG, load_rules_config,
+                                 load_yaml)
 from fraud_engine.pipeline import pipeline
+from fraud_engine.alerts import open_alert_sink
+from fraud_engine.log_queue import start_queue_logging
 from fraud_engine.detector import FraudDetector
+from fraud_engine.plan import RulePlan
+from fraud_engine.parallel import DetectionSummary, detect_transactions, run_sharded
+from fraud_engine.metrics import DetectorMetrics, MetricsRegistry, PipelineMetrics
 from fraud_engine.schema import validate_transaction
-from fraud_engine.utils import format_flags, validate_file_path
-from scripts.profile_engine import ProfileEngine
+from fraud_engine.utils import validate_file_path
+from fraud_engine.rules.registry import RULES
+from scripts.profile_engine import ProfileEngine, summarize_profiles
+# Optional stages (dedup, event-time reordering, checkpoints, spilling,
+# profiling, the metrics file exporter) are imported by the branches of
+# `main` that use them; their options default to None for the same reason.
 
-from fraud_engine.rules.rapid_transaction_rule import RapidTransactionsRule
-from fraud_engine.rules.other_rules import LargeTransactionRule
-
-# --- Setup logs ---
 LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
-os.makedirs(LOG_DIR, exist_ok=True)
+LOGGING_CONFIG = DEFAULT_LOGGING_CONFIG
+RULES_CONFIG_FILE = DEFAULT_RULES_CONFIG
+
+logger = logging.getLogger("fraud_engine")
 
-LOGGING_CONFIG = os.path.join(os.path.dirname(__file__), "../config/logging.yaml")
-validate_file_path(LOGGING_CONFIG)
-with open(LOGGING_CONFIG, "r") as f:
-    config = yaml.safe_load(f)
+# Rule type name -> class; modules are imported when a configuration uses them
+RULE_CLASSES = RULES
 
-# Update file paths in YAML
-for h in config.get("handlers", {}).values():
-    if "filename" in h:
-        h["filename"] = os.path.join(LOG_DIR, os.path.basename(h["filename"]))
+_rules_config = None
+
+
+def setup_logging():
+    """Configure logging from config/logging.yaml (once per process)."""
+    if any(isinstance(h, QueueHandler) for h in logging.getLogger().handlers):
+        return
+    os.makedirs(LOG_DIR, exist_ok=True)
+    validate_file_path(LOGGING_CONFIG)
+    config = load_yaml(LOGGING_CONFIG, kind="logging")
+    # Update file paths in YAML
+    for h in config.get("handlers", {}).values():
+        if "filename" in h:
+            h["filename"] = os.path.join(LOG_DIR, os.path.basename(h["filename"]))
+    logging.config.dictConfig(config)
+    # Console / file I/O happens on a listener thread, not in the detection loop
+    start_queue_logging()
+
+
+def load_rules():
+    """The validated rules configuration (parsed once, then cached; see fraud_engine.config)."""
+    global _rules_config
+    if _rules_config is None:
+        validate_file_path(RULES_CONFIG_FILE)
+        _rules_config = load_rules_config(RULES_CONFIG_FILE)
+    return _rules_config
 
-logging.config.dictConfig(config)
-logger = logging.getLogger("fraud_engine")
 
-# --- Load rules config ---
-RULES_CONFIG_FILE = os.path.join(os.path.dirname(__file__), "../config/rules.config.yaml")
-validate_file_path(RULES_CONFIG_FILE)
-with open(RULES_CONFIG_FILE, "r") as f:
-    rules_config = yaml.safe_load(f)
+def __getattr__(name):
+    # `rules_config` is loaded on first use rather than at import time
+    if name == "rules_config":
+        return load_rules()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-RULE_CLASSES = {
-    "RapidTransactionsRule": RapidTransactionsRule,
-    "LargeTransactionRule": LargeTransactionRule,
-}
 
 def build_rules(config_list):
     rules = []
+    # Window rules over the same key share one aggregator (one pass per transaction)
+    aggregators = {}
     for r_conf in config_list:
         cls_name = r_conf.pop("type", None)
         cls = RULE_CLASSES.get(cls_name)
         if cls is None:
             logger.warning(f"Unknown rule type: {cls_name}, skipping...")
             continue
+        if getattr(cls, "windowed", False):
+            r_conf.setdefault("aggregators", aggregators)
         rules.append(cls(**r_conf))
     return rules
 
-def main():
+DEFAULT_STATE_MAX_USERS = 100_000
+
+
+def spill_state(rules, state_dir, max_users, registry):
+    """
+    Keep at most `max_users` keys of every window aggregator and of the
+    profiles in memory, spilling the rest to SQLite files in `state_dir`.
+
+    Returns:
+        tuple: (ProfileEngine, list of StateSpill to close after the run)
+    """
+    from fraud_engine.spill import SqliteBackend, StateSpill
+    aggregators = []
+    for rule in rules:
+        aggregator = getattr(rule, "aggregator", None)
+        if aggregator is not None and all(a is not aggregator for a in aggregators):
+            aggregators.append(aggregator)
+    spills = []
+    for i, aggregator in enumerate(aggregators):
+        spill = registry.register(StateSpill(
+            SqliteBackend(os.path.join(state_dir, f"windows{i}.db")),
+            name=f"windows{i}_{aggregator.key}"))
+        aggregator.spill_to(spill, max_keys=max_users)
+        spills.append(spill)
+    spill = registry.register(StateSpill(
+        SqliteBackend(os.path.join(state_dir, "profiles.db")), name="profiles"))
+    spills.append(spill)
+    return ProfileEngine(max_users=max_users, spill=spill), spills
+
+
+def log_profile(profile, profile_dir):
+    """Write a run profile to `profile_dir` and log its per-stage breakdown."""
+    paths = profile.write(profile_dir)
+    logger.info(f"=== Profile ({profile.samples} samples every {profile.interval * 1e3:g} ms CPU, "
+                f"{profile.cpu_seconds:.2f}s CPU, {profile.wall_seconds:.2f}s wall) ===")
+    for row in profile.stage_rows(top=3):
+        logger.info(f"  {row['stage']}: {row['share']:.1%} of samples ({row['cpu_seconds']:.2f}s CPU)"
+                    + (f", retained {row['alloc_bytes'] / 1e6:.1f} MB in {row['alloc_blocks']} blocks"
+                       if profile.peak_bytes else ""))
+        for site in row["top_allocations"]:
+            logger.info(f"    {site['site']}: {site['bytes'] / 1e6:.2f} MB "
+                        f"in {site['blocks']} blocks")
+    if profile.peak_bytes:
+        logger.info(f"Peak traced memory: {profile.peak_bytes / 1e6:.1f} MB")
+    logger.info(f"Wrote collapsed stacks to: {paths['folded']}, stage report to: {paths['report']}")
+
+
+def _given(**options):
+    """The options that were set; None leaves the component's own default."""
+    return {name: value for name, value in options.items() if value is not None}
+
+
+def option_conflict(workers=1, checkpoint_dir=None, allowed_lateness=None, dedup_horizon=None,
+                    state_dir=None, profile_dir=None, source=None):
+    """Why a combination of `main` options is unsupported, or None if it is fine."""
+    if workers > 1 and checkpoint_dir:
+        return "Checkpointing is only supported for single-process runs."
+    if allowed_lateness is not None and (workers > 1 or checkpoint_dir):
+        # Buffered transactions are not part of a checkpoint's stream offset
+        return ("Event-time reordering is only supported for single-process "
+                "runs without checkpoints.")
+    if dedup_horizon is not None and workers > 1:
+        return "Deduplication is only supported for single-process runs."
+    if state_dir and (workers > 1 or checkpoint_dir):
+        # Spilled keys are not part of checkpoints
+        return ("Spilling state to disk is only supported for single-process "
+                "runs without checkpoints.")
+    if profile_dir and workers > 1:
+        return "Profiling is only supported for single-process runs."
+    if workers > 1 and source is not None and os.path.isdir(source):
+        return "Sharded runs read CSV sources only."
+    return None
+
+
+def main(workers=1, checkpoint_dir=None, checkpoint_every=0, resume=False,
+         source=None, alerts_csv=None, metrics_file=None, metrics_interval=15.0,
+         metrics_sample=0, alerts_format="csv", alerts_max_bytes=None,
+         alerts_rotate_seconds=None, parse_workers=1, allowed_lateness=None,
+         reorder_max_buffered=None, reorder_max_delay=None, late_output=None,
+         dedup_horizon=None, dedup_error_rate=None, dedup_capacity=None,
+         state_dir=None, state_max_users=DEFAULT_STATE_MAX_USERS, profile_dir=None,
+         profile_interval=None, profile_alloc_frames=None):
+    setup_logging()
+    sink = None
+    late_sink = None
+    run_profiler = None
     try:
-        source = os.path.join(os.path.dirname(__file__), "../data/sample_transaction.csv")
+        rules_config = load_rules()
+        conflict = option_conflict(workers=workers, checkpoint_dir=checkpoint_dir,
+                                   allowed_lateness=allowed_lateness, dedup_horizon=dedup_horizon,
+                                   state_dir=state_dir, profile_dir=profile_dir, source=source)
+        if conflict:
+            raise ValueError(conflict)
+
+        if source is None:
+            source = os.path.join(os.path.dirname(__file__), "../data/sample_transaction.csv")
         validate_file_path(source)
+        # A directory is a columnar store (see scripts/convert_to_columnar.py)
+        source_type = "columnar" if os.path.isdir(source) else "csv"
         logger.info(f"Starting Fraud Detection on: {source}")
 
-        rules = build_rules(rules_config.get("rules", []))
-        detector = FraudDetector(rules)
-        profiler = ProfileEngine()
+        rules = build_rules([dict(r) for r in rules_config.get("rules", [])])
+
+        # Stream flagged transactions to disk (a restored checkpoint rolls the
+        # file back to the checkpoint's position and appends from there)
+        out_csv = alerts_csv or os.path.join(LOG_DIR, "fraud_alerts.csv")
+        sink = open_alert_sink(out_csv, fmt=alerts_format,
+                               rule_names=[r.name for r in rules],
+                               max_bytes=alerts_max_bytes, rotate_interval=alerts_rotate_seconds)
+
+        def on_alert(seq, txn_id, user_id, flags):
+            sink.write(seq, txn_id, user_id, flags)
+            logger.warning(f"ALERT: txn={txn_id} user={user_id} flags={flags}")
+
+        if workers > 1:
+            logger.info(f"Sharding detection across {workers} worker processes")
+            # Alerts reach the sink in input order while the workers run
+            summary = run_sharded(source, rules, workers=workers, on_alert=on_alert)
+            profile_report = summarize_profiles(summary.profiles)
+        else:
+            plan = None
+            if rules_config.get("plan"):
+                plan = RulePlan.from_config(rules_config["plan"], rules)
+                logger.info(f"Rule plan mode: {'first_match' if plan.first_match else 'all'}")
+            registry = MetricsRegistry()
+            detector_metrics = registry.register(DetectorMetrics(rules, sample_every=metrics_sample))
+            pipeline_metrics = registry.register(PipelineMetrics())
+            detector = FraudDetector(rules, plan=plan, metrics=detector_metrics)
+            spills = []
+            if state_dir:
+                profiler, spills = spill_state(rules, state_dir, state_max_users, registry)
+                logger.info(f"Keeping at most {state_max_users} users per state store in memory; "
+                            f"spilling the rest to {state_dir}")
+            else:
+                profiler = ProfileEngine()
+            dedup = None
+            if dedup_horizon is not None:
+                # Replayed ids never reach the rules or the profiles. Resuming
+                # re-reads the skipped prefix, which rebuilds the filters too.
+                from fraud_engine.dedup import Deduplicator
+                dedup = registry.register(Deduplicator(
+                    horizon_seconds=dedup_horizon,
+                    **_given(error_rate=dedup_error_rate, capacity=dedup_capacity)))
+            stream = enumerate(pipeline(source, source_type=source_type, metrics=pipeline_metrics,
+                                        workers=parse_workers, dedup=dedup))
 
-        total, fraud_count = 0, 0
-        rule_counter, user_counter = Counter(), Counter()
-        flagged_rows = []
+            summary = DetectionSummary()
+            if checkpoint_dir:
+                from fraud_engine.checkpoint import Checkpointer, checkpointed, stateful_components
+                checkpointer = Checkpointer(checkpoint_dir,
+                                            stateful_components(detector, profiler, summary, sink))
+                offset = checkpointer.restore() if resume else 0
+                if offset:
+                    logger.info(f"Resuming from checkpoint at stream offset {offset}")
+                    stream = itertools.islice(stream, offset, None)
+                stream = checkpointed(stream, checkpointer, every=checkpoint_every)
 
-        for txn in pipeline(source, source_type="csv"):
-            total += 1
-            profiler.update_profile(txn)
+            reorder = None
+            if allowed_lateness is not None:
+                from fraud_engine.event_time import CsvLateEventSink, EventTimeBuffer
+                if late_output:
+                    late_sink = CsvLateEventSink(late_output)
+                reorder = registry.register(EventTimeBuffer(
+                    allowed_lateness_seconds=allowed_lateness, max_delay_seconds=reorder_max_delay,
+                    on_late=late_sink, **_given(max_buffered=reorder_max_buffered)))
+                logger.info(f"Reordering by event time (allowed lateness {allowed_lateness}s)")
+                stream = reorder.reorder(stream)
 
+            exporter = None
+            if metrics_file:
+                from fraud_engine.metrics import PrometheusFileExporter
+                exporter = PrometheusFileExporter(registry, metrics_file, metrics_interval).start()
+            if profile_dir:
+                from fraud_engine.profiling import RunProfiler
+                run_profiler = RunProfiler(**_given(interval=profile_interval,
+                                                    trace_frames=profile_alloc_frames)).start()
             try:
-                result = detector.evaluate(txn)
-            except Exception as e:
-                logger.warning(f"Error evaluating txn {txn.transaction_id}: {e}")
-                continue
-
-            if result.get("is_fraud"):
-                fraud_count += 1
-                for r in result.get("flags", []):
-                    rule_counter[r] += 1
-                user_counter[txn.user_id] += 1
-                flagged_rows.append({
-                    "transaction_id": txn.transaction_id,
-                    "user_id": txn.user_id,
-                    "flags": format_flags(result.get("flags", []))
-                })
-                logger.warning(f"ALERT: txn={txn.transaction_id} user={txn.user_id} flags={result.get('flags', [])}")
-
-        # Write flagged transactions
-        out_csv = os.path.join(LOG_DIR, "fraud_alerts.csv")
-        if flagged_rows:
-            with open(out_csv, "w", newline="", encoding="utf-8") as f:
-                writer = csv.DictWriter(f, fieldnames=["transaction_id", "user_id", "flags"])
-                writer.writeheader()
-                writer.writerows(flagged_rows)
-            logger.info(f"Wrote {len(flagged_rows)} flagged transactions to: {out_csv}")
+                detect_transactions(
+                    stream, detector, profiler, summary, keep_alerts=False,
+                    on_alert=lambda seq, txn, flags: on_alert(
+                        seq, txn.transaction_id, txn.user_id, flags))
+            finally:
+                if run_profiler is not None:
+                    # Stop while the run's state is alive, so it shows as retained memory
+                    profile = run_profiler.stop()
+                if exporter is not None:
+                    exporter.stop()
+                    logger.info(f"Wrote metrics to: {metrics_file}")
+            if run_profiler is not None:
+                log_profile(profile, profile_dir)
+            profile_report = profiler.report()
+            logger.info("=== Rule Metrics ===")
+            for i, name in enumerate(detector_metrics.names):
+                logger.info(f"  {name}: calls={detector_metrics.calls[i]} "
+                            f"hits={detector_metrics.hits[i]} errors={detector_metrics.errors[i]}")
+            logger.info(f"Pipeline: {pipeline_metrics.throughput():.0f} txns/s, "
+                        f"reject rate {pipeline_metrics.reject_rate():.2%}")
+            for spill in spills:
+                p99 = spill.load_latency.quantile(0.99)
+                logger.info(f"State {spill.name}: hit rate {spill.hit_rate():.1%}, "
+                            f"{spill.loads} loaded, {spill.spills} spilled, {spill.flushes} writes"
+                            + (f", p99 read {p99 * 1e3:.2f} ms" if p99 is not None else ""))
+                spill.close()
+            if dedup is not None:
+                logger.info(f"Dedup: {dedup.dropped} repeated transactions dropped of "
+                            f"{dedup.checked}, filters {dedup.memory_usage() / 1e6:.1f} MB")
+            if reorder is not None:
+                logger.info(f"Event time: {reorder.late_count} late transactions"
+                            f"{f' written to {late_output}' if late_sink is not None else ' dropped'}, "
+                            f"{reorder.forced_count} released early, "
+                            f"peak buffer {reorder.peak_buffered}")
+            if plan is not None:
+                logger.info("=== Rule Plan Statistics ===")
+                for row in plan.report():
+                    logger.info(f"  {row['rule']}: calls={row['calls']} hits={row['hits']} "
+                                f"avg_ns={row['avg_ns']:.0f}")
+
+        rule_counter, user_counter = summary.counters()
+        sink.close()
+        if sink.count:
+            logger.info(f"Wrote {sink.count} flagged transactions to: {out_csv}")
+            if sink.rotated:
+                logger.info(f"Rotated alert files: {len(sink.rotated)}")
         else:
             logger.info("No flagged transactions to write.")
 
         # --- Summary ---
         logger.info("=== Detection Summary ===")
-        logger.info(f"Total transactions processed: {total}")
-        logger.info(f"Total flagged (fraud): {fraud_count}")
+        logger.info(f"Total transactions processed: {summary.total}")
+        logger.info(f"Total flagged (fraud): {summary.fraud_count}")
         logger.info("Top rules fired:")
         for rule, cnt in rule_counter.most_common():
             logger.info(f"  {rule}: {cnt}")
         logger.info("Top flagged users:")
         for user, cnt in user_counter.most_common(10):
-            logger.info(f"  {user}: {cnt}")
+            error = user_counter.error(user)
+            logger.info(f"  {user}: {cnt}" + (f" (overcounted by at most {error})" if error else ""))
+
+        quantiles = (0.5, 0.9, 0.99)
+        for label, sketch in (("Amount", summary.amounts),
+                              ("Flagged amount", summary.flagged_amounts)):
+            if sketch.count:
+                logger.info(f"{label} quantiles: " + ", ".join(
+                    f"p{round(q * 100)}={v:.2f}" for q, v in sketch.quantiles(quantiles).items())
+                    + f", max={sketch.max:.2f}")
+        if summary.alert_sample.items:
+            logger.info(f"Sample of {len(summary.alert_sample.items)} alerts:")
+            for seq, txn_id, user_id, flags in sorted(summary.alert_sample.items):
+                logger.info(f"  #{seq} txn={txn_id} user={user_id} flags={flags}")
 
-        # --- Profile summary ---
+        # --- Profile summary (bounded: quantiles and the most active users) ---
         logger.info("=== User Profile Summary ===")
-        for user, stats in profiler.summary().items():
-            logger.info(f"User {user}: {stats}")
+        logger.info(f"Users profiled: {profile_report['users']}")
+        for label in ("txns_per_user", "avg_amount_per_user"):
+            if profile_report[label]:
+                logger.info(f"  {label}: " + ", ".join(
+                    f"{k}={v:.2f}" for k, v in profile_report[label].items()))
+        logger.info("Most active users:")
+        for user, stats in profile_report["top_users"]:
+            logger.info(f"  User {user}: {stats}")
+        return 0
 
     except Exception as e:
         logger.exception(f"Fatal error in fraud detection: {e}")
+        return 1
+    finally:
+        if run_profiler is not None:
+            run_profiler.stop()
+        if sink is not None:
+            sink.close()
+        if late_sink is not None:
+            late_sink.close()
+
+
+def build_parser(prog=None):
+    parser = argparse.ArgumentParser(prog=prog,
+                                     description="Run fraud detection on the sample transactions.")
+    parser.add_argument("--source", default=None,
+                        help="CSV file or columnar store directory to scan "
+                             "(default: data/sample_transaction.csv).")
+    parser.add_argument("--alerts-csv", default=None,
+                        help="Where to write flagged transactions (default: logs/fraud_alerts.csv).")
+    parser.add_argument("--alerts-format", choices=["csv", "binary"], default="csv",
+                        help="Alert file format (binary: compact records, see fraud_engine/alerts.py).")
+    parser.add_argument("--alerts-max-bytes", type=int, default=None,
+                        help="Rotate the alert file once it reaches this size.")
+    parser.add_argument("--alerts-rotate-seconds", type=float, default=None,
+                        help="Rotate the alert file once it is this many seconds old.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes (transactions are sharded by user_id).")
+    parser.add_argument("--parse-workers", type=int, default=1,
+                        help="Processes parsing the CSV in byte ranges (single-process detection).")
+    parser.add_argument("--checkpoint-dir", default=None,
+                        help="Directory for state checkpoints (rule state, profiles, stream "
+                             "offset, alert file position).")
+    parser.add_argument("--checkpoint-every", type=int, default=0,
+                        help="Checkpoint every N transactions (0: only at the end of the run).")
+    parser.add_argument("--resume", action="store_true",
+                        help="Restore the latest checkpoint and continue from its stream offset.")
+    parser.add_argument("--metrics-file", default=None,
+                        help="Write Prometheus text-format metrics to this file during the run.")
+    parser.add_argument("--metrics-interval", type=float, default=15.0,
+                        help="Seconds between metrics file writes.")
+    parser.add_argument("--metrics-sample", type=int, default=0,
+                        help="Time one in N evaluations for latency histograms (0: off).")
+    parser.add_argument("--allowed-lateness", type=float, default=None,
+                        help="Reorder transactions by event time, accepting ones up to this many "
+                             "seconds behind the newest seen (default: no reordering).")
+    parser.add_argument("--reorder-max-buffered", type=int, default=None,
+                        help="Most transactions held for reordering before the oldest are released "
+                             "(default: 100000).")
+    parser.add_argument("--reorder-max-delay", type=float, default=None,
+                        help="Most seconds (processing time) a transaction is held for reordering.")
+    parser.add_argument("--late-output", default=None,
+                        help="CSV file for transactions too late to reorder (default: drop them).")
+    parser.add_argument("--dedup-horizon", type=float, default=None,
+                        help="Drop transactions whose transaction_id was already seen within this "
+                             "many seconds of event time (default: no deduplication).")
+    parser.add_argument("--dedup-error-rate", type=float, default=None,
+                        help="Share of new transactions the dedup filter may wrongly drop "
+                             "(default: 1e-4).")
+    parser.add_argument("--dedup-capacity", type=int, default=None,
+                        help="Expected distinct transactions per dedup horizon (sizes the filter; "
+                             "default: 1000000).")
+    parser.add_argument("--state-dir", default=None,
+                        help="Spill window and profile state of the least recently seen users to "
+                             "SQLite files in this directory (default: keep all state in memory).")
+    parser.add_argument("--state-max-users", type=int, default=DEFAULT_STATE_MAX_USERS,
+                        help="Users kept in memory per state store when spilling (--state-dir).")
+    parser.add_argument("--profile", default=None, metavar="DIR",
+                        help="Profile the detection loop and write a per-stage CPU and allocation "
+                             "report and collapsed stacks (flame graphs) to this directory.")
+    parser.add_argument("--profile-interval-ms", type=float, default=None,
+                        help="Milliseconds of CPU time between stack samples (--profile; "
+                             "default: 1).")
+    parser.add_argument("--profile-alloc-frames", type=int, default=None,
+                        help="Frames kept per traced allocation (--profile; default: 4; 0: CPU "
+                             "samples only, which runs closer to normal speed).")
+    return parser
+
+
+def cli(argv=None, prog=None) -> int:
+    """Parse `argv` and run `main`; returns the exit status (1 if the run failed)."""
+    parser = build_parser(prog)
+    args = parser.parse_args(argv)
+    conflict = option_conflict(workers=args.workers, checkpoint_dir=args.checkpoint_dir,
+                               allowed_lateness=args.allowed_lateness,
+                               dedup_horizon=args.dedup_horizon, state_dir=args.state_dir,
+                               profile_dir=args.profile, source=args.source)
+    if conflict:
+        parser.error(conflict)
+    return main(workers=args.workers, checkpoint_dir=args.checkpoint_dir,
+         checkpoint_every=args.checkpoint_every, resume=args.resume,
+         source=args.source, alerts_csv=args.alerts_csv, metrics_file=args.metrics_file,
+         metrics_interval=args.metrics_interval, metrics_sample=args.metrics_sample,
+         alerts_format=args.alerts_format, alerts_max_bytes=args.alerts_max_bytes,
+         alerts_rotate_seconds=args.alerts_rotate_seconds, parse_workers=args.parse_workers,
+         allowed_lateness=args.allowed_lateness, reorder_max_buffered=args.reorder_max_buffered,
+         reorder_max_delay=args.reorder_max_delay, late_output=args.late_output,
+         dedup_horizon=args.dedup_horizon, dedup_error_rate=args.dedup_error_rate,
+         dedup_capacity=args.dedup_capacity, state_dir=args.state_dir,
+         state_max_users=args.state_max_users, profile_dir=args.profile,
+         profile_interval=(args.profile_interval_ms / 1e3
+                           if args.profile_interval_ms is not None else None),
+         profile_alloc_frames=args.profile_alloc_frames)
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(cli())
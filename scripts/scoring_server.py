@@ -0,0 +1,115 @@
+# scripts/scoring_server.py
+"""
+Run the micro-batching scoring server (see `fraud_engine.server`) with the
+rules from config/rules.config.yaml, or load-test it on localhost.
+
+Typical usage:
+    python -m scripts.scoring_server --port 8765 --latency-budget-ms 2
+    python -m scripts.scoring_server --unix-socket /tmp/fraud.sock
+    python -m scripts.scoring_server --load-test --clients 32 --requests 20000
+"""
+import argparse
+import asyncio
+import copy
+import time
+
+import numpy as np
+
+from fraud_engine.detector import FraudDetector
+from fraud_engine.server import (DEFAULT_LATENCY_BUDGET_MS, DEFAULT_MAX_BATCH_SIZE,
+                                 ScoringClient, ScoringServer)
+from scripts.run_detection import build_rules, load_rules, logger, setup_logging
+
+
+def build_server(latency_budget_ms=DEFAULT_LATENCY_BUDGET_MS,
+                 max_batch_size=DEFAULT_MAX_BATCH_SIZE, host="127.0.0.1", port=0,
+                 path=None):
+    detector = FraudDetector(build_rules(copy.deepcopy(load_rules()["rules"])))
+    return ScoringServer(detector, latency_budget_ms=latency_budget_ms,
+                         max_batch_size=max_batch_size, host=host, port=port, path=path)
+
+
+async def serve(server):
+    await server.start()
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+async def load_test(server, clients=16, requests=10_000, users=1_000):
+    """
+    Score `requests` synthetic transactions from `clients` concurrent
+    connections, one transaction per request, and report latency and throughput.
+    """
+    # The benchmark package is only needed to load-test, not to serve
+    from benchmarks.generator import TransactionGenerator
+    records = list(TransactionGenerator(users=users, invalid_rate=0.0).records(requests))
+    client_ns = []
+
+    async def run_client(share):
+        async with ScoringClient(*_client_address(server)) as client:
+            for record in share:
+                start = time.perf_counter_ns()
+                await client.score(record)
+                client_ns.append(time.perf_counter_ns() - start)
+
+    await server.start()
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(run_client(records[i::clients]) for i in range(clients)))
+        elapsed = time.perf_counter() - start
+        stats = server.stats.snapshot()
+    finally:
+        await server.close()
+
+    client_ms = np.asarray(client_ns) / 1e6
+    print(f"{len(records)} requests from {clients} clients in {elapsed:.2f}s "
+          f"({len(records) / elapsed:,.0f} txn/s), mean batch {stats['mean_batch_size']:.1f}")
+    print(f"server latency  p50 {stats['p50_ms']:.3f} ms  p99 {stats['p99_ms']:.3f} ms")
+    print(f"client round trip  p50 {np.percentile(client_ms, 50):.3f} ms  "
+          f"p99 {np.percentile(client_ms, 99):.3f} ms")
+    return stats
+
+
+def _client_address(server):
+    return (server.address,) if server.path is not None else server.address
+
+
+def build_parser(prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Online fraud scoring server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix-socket", default=None,
+                        help="Listen on this Unix socket path instead of TCP.")
+    parser.add_argument("--latency-budget-ms", type=float, default=DEFAULT_LATENCY_BUDGET_MS,
+                        help="Longest a request waits for its micro-batch to fill.")
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help="Transactions evaluated together at most.")
+    parser.add_argument("--load-test", action="store_true",
+                        help="Start on a free port, drive it with synthetic clients, report, exit.")
+    parser.add_argument("--clients", type=int, default=16,
+                        help="Concurrent connections in --load-test.")
+    parser.add_argument("--requests", type=int, default=10_000,
+                        help="Transactions sent in --load-test.")
+    return parser
+
+
+def cli(argv=None, prog=None):
+    args = build_parser(prog).parse_args(argv)
+    setup_logging()
+    if args.load_test:
+        server = build_server(args.latency_budget_ms, args.max_batch_size, args.host, 0,
+                              args.unix_socket)
+        asyncio.run(load_test(server, args.clients, args.requests))
+    else:
+        server = build_server(args.latency_budget_ms, args.max_batch_size, args.host,
+                              args.port, args.unix_socket)
+        try:
+            asyncio.run(serve(server))
+        except KeyboardInterrupt:
+            logger.info(f"Scoring server stopped: {server.stats.snapshot()}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def config_cache_dir(tmp_path_factory, monkeypatch):
+    """Keep compiled configs out of the user's cache directory."""
+    monkeypatch.setenv("FRAUDX_CACHE_DIR", str(tmp_path_factory.getbasetemp() / "fraudx-cache"))
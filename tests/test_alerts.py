@@ -0,0 +1,106 @@
+import csv
+import logging
+import time
+
+from fraud_engine.alerts import BinaryAlertSink, CsvAlertSink, read_binary_alerts
+from fraud_engine.log_queue import start_queue_logging, stop_queue_logging
+
+
+def make_alerts(n):
+    return [(i, f"t{i}", f"U{i % 7}", ["RapidTransactionsRule"] if i % 2 else
+             ["RapidTransactionsRule", "LargeTransactionRule"]) for i in range(n)]
+
+
+def test_csv_sink_buffers_and_rotates(tmp_path):
+    path = tmp_path / "alerts.csv"
+    alerts = make_alerts(500)
+    sink = CsvAlertSink(str(path), buffer_size=50, flush_interval=3600, max_bytes=2000)
+    for a in alerts[:49]:
+        sink.write(*a)
+    assert not path.exists()            # still buffered, file opened lazily
+    for a in alerts[49:]:
+        sink.write(*a)
+    sink.close()
+
+    assert sink.count == 500 and len(sink.rotated) >= 5
+    rows = []
+    for p in sink.rotated + ([str(path)] if path.exists() else []):
+        with open(p, newline="") as f:
+            reader = csv.reader(f)
+            assert next(reader) == ["transaction_id", "user_id", "flags"]
+            rows.extend(reader)
+    assert rows == [[t, u, ";".join(flags)] for _, t, u, flags in alerts]
+
+
+def test_poll_applies_time_limits_without_new_alerts(tmp_path):
+    path = tmp_path / "alerts.csv"
+    sink = CsvAlertSink(str(path), flush_interval=0.05, rotate_interval=0.1)
+    sink.write(*make_alerts(1)[0])
+    sink.poll()
+    assert not path.exists()            # not stale yet
+    time.sleep(0.06)
+    sink.poll()
+    assert len(path.read_text().splitlines()) == 2
+    time.sleep(0.1)
+    sink.poll()
+    assert not path.exists() and len(sink.rotated) == 1
+    sink.close()
+
+
+def test_binary_sink_round_trip(tmp_path):
+    path = str(tmp_path / "alerts.bin")
+    alerts = make_alerts(300)
+    with BinaryAlertSink(path, ["RapidTransactionsRule", "LargeTransactionRule"],
+                         buffer_size=64) as sink:
+        for a in alerts:
+            sink.write(*a)
+    assert list(read_binary_alerts(path)) == alerts
+    assert (tmp_path / "alerts.bin").stat().st_size < 300 * 40
+
+
+def test_restore_rolls_rotated_files_back_to_the_checkpoint(tmp_path):
+    path = tmp_path / "alerts.csv"
+    alerts = make_alerts(500)
+    options = dict(buffer_size=50, flush_interval=3600, max_bytes=2000)
+
+    sink = CsvAlertSink(str(path), **options)
+    for a in alerts[:230]:
+        sink.write(*a)
+    state = sink.snapshot_state()
+    for a in alerts[230:400]:           # rotates again, then the run dies
+        sink.write(*a)
+    sink.close()
+
+    sink = CsvAlertSink(str(path), **options)
+    sink.restore_state(state)
+    sink.restore_state(state, incremental=True)
+    for a in alerts[230:]:
+        sink.write(*a)
+    sink.close()
+
+    files = sorted(p for p in tmp_path.iterdir() if p.name != "alerts.csv") + [path]
+    assert [str(p) for p in files[:-1]] == sink.rotated
+    rows = []
+    for p in files:
+        with open(p, newline="") as f:
+            assert next(csv.reader(f)) == ["transaction_id", "user_id", "flags"]
+            rows.extend(csv.reader(f))
+    assert rows == [[t, u, ";".join(flags)] for _, t, u, flags in alerts]
+    assert sink.count == 500
+
+
+def test_queue_logging_keeps_records(tmp_path):
+    logger = logging.getLogger("fraud_engine.test_queue")
+    logger.propagate = False
+    handler = logging.FileHandler(tmp_path / "out.log")
+    logger.addHandler(handler)
+    listener = start_queue_logging(logger)
+    try:
+        for i in range(100):
+            logger.warning(f"alert {i}")
+    finally:
+        stop_queue_logging(listener)
+        handler.close()
+        logger.handlers.clear()
+    lines = (tmp_path / "out.log").read_text().splitlines()
+    assert lines == [f"alert {i}" for i in range(100)]
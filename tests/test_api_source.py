@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import aiohttp
+import pytest
+
+from fraud_engine.api_source import AsyncApiSource
+from fraud_engine.pipeline import pipeline
+
+RECORDS = [
+    {"transaction_id": str(i), "user_id": f"u{i % 4}", "amount": 10.0 * i,
+     "timestamp": f"2025-09-01 10:{i // 60:02d}:{i % 60:02d}", "location": "NY",
+     "payment_method": "UPI"}
+    for i in range(95)
+]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requested = []      # paths of the requests served, reset per test
+
+    def do_GET(self):
+        self.requested.append(self.path)
+        query = parse_qs(urlparse(self.path).query)
+        if "page" in query:
+            page, size = int(query["page"][0]), int(query["size"][0])
+            body = json.dumps(RECORDS[(page - 1) * size:page * size])
+        else:
+            body = "\n".join(json.dumps(r) for r in RECORDS)
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    StandInHandler.requested.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/transactions"
+    server.shutdown()
+    server.server_close()
+
+
+def test_paginated_source_yields_records_in_order(server_url):
+    source = AsyncApiSource(server_url, page_param="page", page_size_param="size",
+                            page_size=10, max_in_flight=3, queue_size=1)
+    txns = list(pipeline(source, source_type="api"))
+    assert [t.transaction_id for t in txns] == [r["transaction_id"] for r in RECORDS]
+
+
+def test_unpaginated_ndjson_source(server_url):
+    txns = list(pipeline(server_url, source_type="api"))
+    assert len(txns) == len(RECORDS)
+    assert txns[-1].amount == 940.0
+
+
+def test_consumer_can_stop_early(server_url, monkeypatch):
+    sessions = []
+    client_session = aiohttp.ClientSession
+
+    def recorded_session(*args, **kwargs):
+        sessions.append(client_session(*args, **kwargs))
+        return sessions[-1]
+
+    monkeypatch.setattr(aiohttp, "ClientSession", recorded_session)
+    source = AsyncApiSource(server_url, page_param="page", page_size_param="size",
+                            page_size=5, max_in_flight=2, queue_size=1)
+    for i, _ in enumerate(source):
+        if i == 7:
+            break
+
+    # The session and its pooled connections are closed when the loop exits
+    assert len(sessions) == 1
+    assert sessions[0].closed and sessions[0].connector is None
+    # Fetching stopped with the consumer: a few pages ahead at most, none later
+    requested = len(StandInHandler.requested)
+    assert requested < len(RECORDS) // 5
+    time.sleep(0.2)
+    assert len(StandInHandler.requested) == requested
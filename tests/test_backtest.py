@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from benchmarks.generator import TransactionGenerator
+from fraud_engine.backtest import Backtest, expand_grid
+from fraud_engine.detector import FraudDetector
+from fraud_engine.pipeline import batch_pipeline
+from fraud_engine.rules.other_rules import LargeTransactionRule
+from fraud_engine.rules.rapid_transaction_rule import RapidTransactionsRule
+from fraud_engine.rules.velocity_rule import VelocityRule
+
+RULE_CLASSES = {"RapidTransactionsRule": RapidTransactionsRule,
+                "LargeTransactionRule": LargeTransactionRule,
+                "VelocityRule": VelocityRule}
+BASE = [{"type": "RapidTransactionsRule", "max_txns": 3, "window_minutes": 1},
+        {"type": "LargeTransactionRule", "threshold": 10000.0}]
+
+
+def test_expand_grid_overrides_only_listed_parameters():
+    configs = expand_grid(BASE, {"RapidTransactionsRule": {"max_txns": [2, 4]}})
+    assert [c["label"] for c in configs] == ["RapidTransactionsRule.max_txns=2",
+                                             "RapidTransactionsRule.max_txns=4"]
+    assert configs[1]["rules"][0] == {"type": "RapidTransactionsRule", "max_txns": 4,
+                                      "window_minutes": 1}
+    assert configs[1]["rules"][1] == BASE[1]
+    with pytest.raises(ValueError):
+        expand_grid(BASE, {"NoSuchRule": {"threshold": [1]}})
+
+
+def test_single_pass_matches_separate_runs(tmp_path):
+    generator = TransactionGenerator(users=200, burst_rate=0.02, large_rate=0.01,
+                                     invalid_rate=0.0, seed=5)
+    path = generator.write_csv(str(tmp_path / "txns.csv"), 6000)
+    grid = {"RapidTransactionsRule": {"max_txns": [2, 3], "window_minutes": [1, 10]},
+            "LargeTransactionRule": {"threshold": [10000.0, 40000.0]}}
+    backtest = Backtest(BASE, grid, RULE_CLASSES)
+    # 4 window variants + 2 thresholds, all window variants on one aggregator
+    assert len(backtest.configs) == 8 and len(backtest.variants) == 6
+    windowed = [r for r in backtest.variants if isinstance(r, RapidTransactionsRule)]
+    assert len({id(r.aggregator) for r in windowed}) == 1
+
+    result = backtest.run(batch_pipeline(path, batch_size=1000))
+    assert result.transactions == 6000
+
+    flagged = []
+    for config in backtest.configs:
+        rules = [RULE_CLASSES[c["type"]](**{k: v for k, v in c.items() if k != "type"})
+                 for c in config["rules"]]
+        detector = FraudDetector(rules)
+        flagged.append(np.concatenate([detector.evaluate_batch(b) != 0
+                                       for b in batch_pipeline(path, batch_size=1000)]))
+    flagged = np.array(flagged)
+    assert result.alerts.tolist() == flagged.sum(axis=1).tolist()
+    assert result.overlap.tolist() == (flagged[:, None] & flagged[None, :]).sum(axis=2).tolist()
+    assert result.alerts.min() > 0 and result.jaccard().min() < 1.0
@@ -0,0 +1,39 @@
+from collections import Counter
+
+from benchmarks.generator import TransactionGenerator
+from benchmarks.run import compare
+from fraud_engine.pipeline import batch_pipeline
+
+
+def test_generator_is_deterministic_and_rejects_match(tmp_path):
+    options = dict(users=50, invalid_rate=0.05, burst_rate=0.02, seed=3)
+    first = TransactionGenerator(**options).write_csv(str(tmp_path / "a.csv"), 5000, chunk_rows=700)
+    second = TransactionGenerator(**options).write_csv(str(tmp_path / "b.csv"), 5000, chunk_rows=700)
+    with open(first) as f, open(second) as g:
+        assert f.read() == g.read()
+
+    invalid = sum(int((c["invalid"] >= 0).sum())
+                  for c in TransactionGenerator(**options).chunks(5000, chunk_rows=700))
+    rejects = []
+    valid = sum(len(b) for b in batch_pipeline(first, rejects=rejects))
+    assert len(rejects) == invalid > 0
+    assert valid + invalid == 5000
+
+
+def test_generator_skew_and_bursts():
+    chunk = next(TransactionGenerator(users=1000, zipf_s=1.2, burst_rate=0.01,
+                                      burst_size=4, seed=1).chunks(20000))
+    counts = sorted(Counter(chunk["user"].tolist()).values())
+    assert counts[-1] > 20 * (20000 / 1000)   # hottest user far above uniform
+    gaps = (chunk["timestamp"][1:] - chunk["timestamp"][:-1]) / 1e6
+    same_user = chunk["user"][1:] == chunk["user"][:-1]
+    assert (same_user & (gaps <= 10)).sum() >= 3 * 150
+
+
+def test_compare_flags_regressions():
+    baseline = {"meta": {}, "results": {"a": {"rows_per_sec": 100.0}, "b": {"rows_per_sec": 100.0}}}
+    current = {"meta": {}, "results": {"a": {"rows_per_sec": 85.0}, "b": {"rows_per_sec": 95.0},
+                                       "c": {"rows_per_sec": 1.0}}}
+    rows = {r["stage"]: r for r in compare(current, baseline, tolerance=0.10)}
+    assert set(rows) == {"a", "b"}
+    assert rows["a"]["regression"] and not rows["b"]["regression"]
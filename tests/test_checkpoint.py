@@ -0,0 +1,125 @@
+import csv
+from datetime import datetime, timedelta
+
+import scripts.run_detection as run_detection
+from fraud_engine.checkpoint import Checkpointer, checkpointed, stateful_components
+from fraud_engine.detector import FraudDetector
+from fraud_engine.parallel import DetectionSummary, detect_transactions
+from fraud_engine.rules.other_rules import LargeTransactionRule
+from fraud_engine.rules.rapid_transaction_rule import RapidTransactionsRule
+from fraud_engine.schema import Transaction
+from scripts.profile_engine import ProfileEngine
+
+
+def make_stream(n=300):
+    start = datetime(2025, 9, 1, 8, 0, 0)
+    return [
+        Transaction(transaction_id=str(i), user_id=f"u{(i * 7) % 11}", amount=float(i * 53 % 12000),
+                    timestamp=start + timedelta(seconds=3 * i), location="NY", payment_method="UPI")
+        for i in range(n)
+    ]
+
+
+def new_run():
+    detector = FraudDetector([RapidTransactionsRule(max_txns=2, window_minutes=1),
+                              LargeTransactionRule(threshold=11000)])
+    profiler = ProfileEngine()
+    return detector, profiler
+
+
+def test_resume_from_incremental_checkpoints_matches_uninterrupted_run(tmp_path):
+    txns = make_stream()
+
+    detector, profiler = new_run()
+    expected = detect_transactions(enumerate(txns), detector, profiler)
+
+    # First run stops after 170 transactions, checkpointing every 40
+    detector, profiler = new_run()
+    checkpointer = Checkpointer(str(tmp_path), stateful_components(detector, profiler))
+    stream = checkpointed(enumerate(txns[:170]), checkpointer, every=40, full_every=3)
+    first = detect_transactions(stream, detector, profiler)
+
+    assert sorted(p.name for p in tmp_path.iterdir())[-1].endswith("-incr.npz")
+
+    # Restart with fresh objects and resume from the saved offset
+    detector, profiler = new_run()
+    checkpointer = Checkpointer(str(tmp_path), stateful_components(detector, profiler))
+    offset = checkpointer.restore()
+    assert offset == 170
+    rest = detect_transactions(
+        ((seq, txn) for seq, txn in enumerate(txns) if seq >= offset), detector, profiler)
+
+    assert expected.alerts
+    assert [a[0] for a in first.alerts + rest.alerts] == [a[0] for a in expected.alerts]
+    assert profiler.summary() == _profiles(txns)
+
+
+def test_resumed_summary_matches_uninterrupted_run(tmp_path):
+    txns = make_stream()
+
+    detector, profiler = new_run()
+    expected = detect_transactions(enumerate(txns), detector, profiler,
+                                   DetectionSummary(top_k=3, sample_size=4))
+
+    detector, profiler = new_run()
+    summary = DetectionSummary(top_k=3, sample_size=4)
+    checkpointer = Checkpointer(str(tmp_path), stateful_components(detector, profiler, summary))
+    detect_transactions(checkpointed(enumerate(txns[:170]), checkpointer, every=40),
+                        detector, profiler, summary, keep_alerts=False)
+
+    detector, profiler = new_run()
+    summary = DetectionSummary(top_k=3, sample_size=4)
+    checkpointer = Checkpointer(str(tmp_path), stateful_components(detector, profiler, summary))
+    offset = checkpointer.restore()
+    detect_transactions(((seq, txn) for seq, txn in enumerate(txns) if seq >= offset),
+                        detector, profiler, summary, keep_alerts=False)
+
+    assert (summary.total, summary.fraud_count) == (expected.total, expected.fraud_count)
+    for resumed, uninterrupted in zip(summary.counters(), expected.counters()):
+        assert resumed.most_common() == uninterrupted.most_common()
+        assert [resumed.error(k) for k, _ in resumed.most_common()] == \
+            [uninterrupted.error(k) for k, _ in uninterrupted.most_common()]
+    assert summary.amounts.quantiles([0.1, 0.5, 0.9]) == expected.amounts.quantiles([0.1, 0.5, 0.9])
+    assert summary.flagged_amounts.getstate() == expected.flagged_amounts.getstate()
+    assert summary.alert_sample.items == expected.alert_sample.items
+
+
+def test_resume_after_crash_writes_each_alert_once(tmp_path, monkeypatch):
+    source = tmp_path / "txns.csv"
+    with open(source, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["transaction_id", "user_id", "amount", "timestamp", "location",
+                         "payment_method"])
+        # A transaction per second: each user bursts past the rapid-transactions limit
+        for i, txn in enumerate(make_stream(400)):
+            writer.writerow([txn.transaction_id, txn.user_id, txn.amount,
+                             f"2025-09-01 08:{i // 60:02d}:{i % 60:02d}", "NY", "UPI"])
+
+    def run(name, **options):
+        return run_detection.main(source=str(source), alerts_csv=str(tmp_path / name),
+                                  checkpoint_dir=str(tmp_path / f"{name}.state"),
+                                  checkpoint_every=100, **options)
+
+    assert run("clean.csv") == 0
+
+    class CrashingProfiles(ProfileEngine):
+        def update_profile(self, txn):
+            if txn.transaction_id == "350":
+                raise RuntimeError("simulated crash")
+            super().update_profile(txn)
+
+    monkeypatch.setattr(run_detection, "ProfileEngine", CrashingProfiles)
+    assert run("resumed.csv") == 1
+    monkeypatch.undo()
+    assert run("resumed.csv", resume=True) == 0
+
+    clean = (tmp_path / "clean.csv").read_text()
+    assert len(clean.splitlines()) > 300
+    assert (tmp_path / "resumed.csv").read_text() == clean
+
+
+def _profiles(txns):
+    profiler = ProfileEngine()
+    for txn in txns:
+        profiler.update_profile(txn)
+    return profiler.summary()
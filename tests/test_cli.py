@@ -0,0 +1,121 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from fraud_engine.config import load_rules_config
+from fraud_engine.exceptions import ConfigError
+from fraud_engine.rules.other_rules import LargeTransactionRule
+from fraud_engine.rules.registry import RuleRegistry
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ["numpy", "pydantic", "yaml", "aiohttp", "fraud_engine.rules.base"]
+
+RULES_YAML = """
+rules:
+  - type: "RapidTransactionsRule"
+    max_txns: 3
+    window_minutes: 1
+  - type: "LargeTransactionRule"
+    threshold: 10000.0
+plan:
+  mode: "first_match"
+"""
+
+
+def imported_after(code, cache_dir, modules=HEAVY):
+    """Run `code` in a fresh interpreter; return which of `modules` it imported."""
+    probe = f"{code}\nimport sys, json\nprint(json.dumps([m for m in {modules!r} if m in sys.modules]))"
+    env = dict(os.environ, FRAUDX_CACHE_DIR=str(cache_dir))
+    out = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, env=env, check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def test_light_commands_start_without_heavy_imports(tmp_path):
+    check = "from fraud_engine.cli import main\nassert main(['check-config']) == 0"
+    # The first run parses and validates; later runs read the compiled cache
+    assert "yaml" in imported_after(check, tmp_path)
+    assert imported_after(check, tmp_path) == []
+    assert imported_after("from fraud_engine.cli import main\nmain(['rules'])", tmp_path) == []
+    assert imported_after("from fraud_engine.cli import main\nmain(['--help'])", tmp_path) == []
+    # Importing the detection script neither parses YAML nor loads the HTTP client
+    detect = imported_after("import logging, scripts.run_detection\n"
+                            "assert not logging.getLogger().handlers", tmp_path)
+    assert "yaml" not in detect and "aiohttp" not in detect
+    # Optional stages are imported by the runs that enable them
+    assert imported_after("import scripts.run_detection", tmp_path,
+                          ["sqlite3", "tracemalloc", "fraud_engine.dedup", "fraud_engine.event_time",
+                           "fraud_engine.checkpoint", "fraud_engine.spill"]) == []
+
+
+def test_rules_config_is_validated_and_cached(tmp_path):
+    path = tmp_path / "rules.yaml"
+    path.write_text(RULES_YAML)
+    cache = tmp_path / "cache"
+
+    config = load_rules_config(str(path), cache_dir=str(cache))
+    assert [r["type"] for r in config["rules"]] == ["RapidTransactionsRule", "LargeTransactionRule"]
+    assert len(os.listdir(cache)) == 1
+    assert load_rules_config(str(path), cache_dir=str(cache)) == config
+
+    # Edited content is parsed again rather than served from the old entry
+    path.write_text(RULES_YAML.replace("10000.0", "500.0"))
+    assert load_rules_config(str(path), cache_dir=str(cache))["rules"][1]["threshold"] == 500.0
+    assert len(os.listdir(cache)) == 2
+
+    for old, new, message in (('"LargeTransactionRule"', '"NoSuchRule"', "unknown rule type"),
+                              ("threshold: 10000.0", "colour: red", "colour"),
+                              ('"first_match"', '"fastest"', "unknown mode")):
+        path.write_text(RULES_YAML.replace(old, new))
+        with pytest.raises(ConfigError, match=message):
+            load_rules_config(str(path), cache_dir=str(cache))
+
+
+def test_config_cache_is_keyed_by_rule_registry(tmp_path):
+    path = tmp_path / "rules.yaml"
+    path.write_text(RULES_YAML)
+    cache = str(tmp_path / "cache")
+    full = RuleRegistry(group=None)
+    load_rules_config(str(path), registry=full, cache_dir=cache)
+
+    # The cached result was validated against other rules; validate again
+    reduced = RuleRegistry({"RapidTransactionsRule": full.target("RapidTransactionsRule")},
+                           group=None)
+    with pytest.raises(ConfigError, match="unknown rule type"):
+        load_rules_config(str(path), registry=reduced, cache_dir=cache)
+    full.register("LargeTransactionRule", type("StricterRule", (LargeTransactionRule,), {}))
+    assert len(os.listdir(cache)) == 1
+    load_rules_config(str(path), registry=full, cache_dir=cache)
+    assert len(os.listdir(cache)) == 2
+
+
+def test_registry_imports_rules_on_demand():
+    registry = RuleRegistry(group="fraudx.test-rules-none")
+    assert "fraud_engine.rules.other_rules" in registry.target("LargeTransactionRule")
+    assert registry["LargeTransactionRule"] is LargeTransactionRule
+    # Built-in names never trigger the entry point scan
+    assert not registry._scanned
+    assert registry.get("NoSuchRule") is None and registry._scanned
+
+    registry.register("Blocklist", "fraud_engine.rules.other_rules:LargeTransactionRule")
+    registry.register("Custom", LargeTransactionRule)
+    assert registry["Blocklist"] is registry["Custom"] is LargeTransactionRule
+    assert sorted(registry) == ["Blocklist", "Custom", "LargeTransactionRule",
+                                "RapidTransactionsRule", "VelocityRule"]
+
+
+def test_detect_exits_nonzero_when_the_run_fails(tmp_path):
+    def detect(*args):
+        return subprocess.run([sys.executable, "-m", "fraud_engine", "detect", *args], cwd=ROOT,
+                              capture_output=True, text=True)
+
+    # Unsupported option combinations are usage errors, reported before the run starts
+    conflict = detect("--workers", "2", "--checkpoint-dir", str(tmp_path / "state"))
+    assert conflict.returncode == 2
+    assert "only supported for single-process runs" in conflict.stderr
+    assert not (tmp_path / "state").exists()
+
+    assert detect("--source", str(tmp_path / "missing.csv")).returncode == 1
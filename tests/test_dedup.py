@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+from fraud_engine.dedup import Deduplicator
+from fraud_engine.metrics import PipelineMetrics
+from fraud_engine.pipeline import pipeline
+from fraud_engine.schema import Transaction
+
+START = datetime(2025, 9, 1, 10, 0, 0)
+HEADER = "transaction_id,user_id,amount,timestamp,location,payment_method\n"
+
+
+def make_txn(i, seconds):
+    return Transaction(transaction_id=str(i), user_id="u1", amount=10.0,
+                       timestamp=START + timedelta(seconds=seconds),
+                       location="NY", payment_method="UPI")
+
+
+def test_replayed_rows_are_dropped_on_every_path(tmp_path):
+    lines = [f"{i},u{i % 7},{i + 1}.5,2025-09-01 10:{i // 60:02d}:{i % 60:02d},NY,UPI"
+             for i in range(300)]
+    # A retried tail and a full re-read of the first 50 rows
+    replayed = lines + lines[250:] + lines[:50]
+    csv_file = tmp_path / "replayed.csv"
+    csv_file.write_text(HEADER + "\n".join(replayed) + "\n")
+
+    for strict in (False, True):
+        dedup = Deduplicator(horizon_seconds=3600, error_rate=1e-4, capacity=1000)
+        metrics = PipelineMetrics()
+        ids = [t.transaction_id for t in pipeline(str(csv_file), strict=strict,
+                                                  metrics=metrics, dedup=dedup)]
+        assert ids == [str(i) for i in range(300)]
+        assert dedup.checked == 400 and dedup.dropped == 100
+        assert metrics.records == 300
+
+
+def test_ids_are_forgotten_after_the_horizon():
+    dedup = Deduplicator(horizon_seconds=60, capacity=100, slices=4)
+    stream = [make_txn(1, 0), make_txn(1, 30), make_txn(2, 90), make_txn(1, 200)]
+    kept = [(t.transaction_id, t.timestamp) for t in dedup.filter(stream)]
+
+    # The repeat 30s later is dropped; 200s later the first copy has expired
+    assert kept == [("1", START), ("2", START + timedelta(seconds=90)),
+                    ("1", START + timedelta(seconds=200))]
+    assert dedup.expired_slices > 0
+    assert len(dedup._buckets) <= dedup.slices + 1
+
+
+def test_false_positive_rate_stays_near_target():
+    dedup = Deduplicator(horizon_seconds=3600, error_rate=1e-3, capacity=20_000)
+    kept = sum(1 for _ in dedup.filter(make_txn(i, i * 0.2) for i in range(20_000)))
+    assert dedup.dropped == 20_000 - kept
+    assert dedup.dropped <= 60  # ~20 at the target rate
+    assert dedup.overflows == 0
@@ -33,3 +33,112 @@ def test_detector_combined():
     assert not result1["is_fraud"]
     assert result2["is_fraud"]
     assert "LargeTransactionRule" in result2["flags"]
+
+
+def test_evaluate_batch_matches_evaluate():
+    from fraud_engine.batch import TransactionBatch
+
+    start = datetime(2025, 9, 1, 10, 0, 0)
+    txns = [
+        make_txn(str(i), f"u{i % 3}", 50 + 40 * i, start + timedelta(seconds=7 * i))
+        for i in range(30)
+    ]
+
+    def build():
+        return FraudDetector([
+            RapidTransactionsRule(max_txns=2, window_minutes=1),
+            LargeTransactionRule(threshold=500),
+        ])
+
+    row_detector = build()
+    expected = [row_detector.evaluate(t)["flags"] for t in txns]
+
+    batch_detector = build()
+    first = TransactionBatch.from_transactions(txns[:12])
+    second = TransactionBatch.from_transactions(txns[12:])
+    masks = list(batch_detector.evaluate_batch(first)) + list(batch_detector.evaluate_batch(second))
+
+    assert [batch_detector.flag_names(m) for m in masks] == expected
+    assert any(expected)
+
+
+def test_rule_plan_all_mode_matches_evaluate():
+    from fraud_engine.plan import RulePlan
+
+    start = datetime(2025, 9, 1, 10, 0, 0)
+    txns = [
+        make_txn(str(i), f"u{i % 4}", 30 * (i % 17), start + timedelta(seconds=5 * i))
+        for i in range(200)
+    ]
+
+    def build():
+        return [
+            RapidTransactionsRule(max_txns=2, window_minutes=1),
+            LargeTransactionRule(threshold=300),
+            LargeTransactionRule(threshold=100),
+        ]
+
+    plain = FraudDetector(build())
+    rules = build()
+    planned = FraudDetector(rules, plan=RulePlan(rules, reorder_every=7, sample_every=1))
+
+    expected = [plain.evaluate(t)["flags"] for t in txns]
+    assert [planned.evaluate(t)["flags"] for t in txns] == expected
+    assert any(len(flags) > 1 for flags in expected)
+
+
+def test_rule_plan_first_match_keeps_stateful_rules_running():
+    from fraud_engine.plan import RulePlan
+
+    start = datetime(2025, 9, 1, 10, 0, 0)
+    rapid = RapidTransactionsRule(max_txns=2, window_minutes=1)
+    rules = [LargeTransactionRule(threshold=100), rapid, LargeTransactionRule(threshold=10)]
+    plan = RulePlan(rules, first_match=True)
+    detector = FraudDetector(rules, plan=plan)
+
+    flags = [detector.evaluate(make_txn(str(i), "u1", 500, start + timedelta(seconds=i)))["flags"]
+             for i in range(4)]
+
+    # Every transaction is large, so the stateless rules stop after the first
+    # hit; the rapid rule still counts all four.
+    assert flags[0] == ["LargeTransactionRule"]
+    assert flags[3] == ["RapidTransactionsRule"]
+    assert len(rapid.aggregator.history("u1")) == 3
+    stats = {row["rule"]: row for row in plan.report() if row["stateful"]}
+    assert stats["RapidTransactionsRule"]["calls"] == 4
+
+
+def test_detector_metrics_and_prometheus_export(tmp_path):
+    from fraud_engine.metrics import DetectorMetrics, MetricsRegistry, PrometheusFileExporter
+    from fraud_engine.rules.base import Rule
+
+    class BrokenRule(Rule):
+        def check(self, transaction):
+            raise RuntimeError("boom")
+
+    rules = [LargeTransactionRule(threshold=100), BrokenRule()]
+    registry = MetricsRegistry()
+    metrics = registry.register(DetectorMetrics(rules, sample_every=2))
+    detector = FraudDetector(rules, metrics=metrics)
+
+    start = datetime(2025, 9, 1, 10, 0, 0)
+    for i in range(10):
+        detector.evaluate(make_txn(str(i), "u1", 60 * i, start + timedelta(seconds=i)))
+
+    assert metrics.calls == [10, 10]
+    assert metrics.hits == [8, 0]
+    assert metrics.errors == [0, 10]
+    assert metrics.latency[0].count == 5 and metrics.evaluate_latency.count == 5
+
+    snapshot = registry.snapshot()
+    hits = snapshot["fraudx_rule_hits_total"]["samples"]
+    assert hits[0] == {"labels": {"rule": "LargeTransactionRule"}, "value": 8}
+    assert snapshot["fraudx_rule_latency_seconds"]["samples"][0]["value"]["count"] == 5
+
+    path = str(tmp_path / "metrics.prom")
+    with PrometheusFileExporter(registry, path, interval=60):
+        pass
+    text = open(path).read()
+    assert '# TYPE fraudx_rule_latency_seconds histogram' in text
+    assert 'fraudx_rule_exceptions_total{rule="BrokenRule"} 10' in text
+    assert 'fraudx_rule_latency_seconds_bucket{rule="LargeTransactionRule",le="+Inf"} 5' in text
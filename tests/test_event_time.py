@@ -0,0 +1,76 @@
+import csv
+import random
+from datetime import datetime, timedelta
+
+from fraud_engine.detector import FraudDetector
+from fraud_engine.event_time import CsvLateEventSink, EventTimeBuffer
+from fraud_engine.rules.rapid_transaction_rule import RapidTransactionsRule
+from fraud_engine.schema import Transaction
+
+START = datetime(2025, 9, 1, 10, 0, 0)
+
+
+def make_txn(i, seconds, user="u1"):
+    return Transaction(transaction_id=str(i), user_id=user, amount=10.0,
+                       timestamp=START + timedelta(seconds=seconds),
+                       location="NY", payment_method="UPI")
+
+
+def test_reorder_within_lateness_matches_sorted_stream():
+    rng = random.Random(3)
+    txns = [make_txn(i, i * 5, user=f"u{i % 3}") for i in range(300)]
+    # Deliver each transaction up to 40s late
+    arrival = sorted(range(len(txns)), key=lambda i: i * 5 + rng.uniform(0, 40))
+    shuffled = [(i, txns[i]) for i in arrival]
+    assert [i for i, _ in shuffled] != list(range(len(txns)))
+
+    buffer = EventTimeBuffer(allowed_lateness_seconds=45)
+    released = list(buffer.reorder(shuffled))
+    assert [seq for seq, _ in released] == list(range(len(txns)))
+    assert buffer.late_count == 0 and buffer.buffered == 0
+
+    def flags(stream):
+        detector = FraudDetector([RapidTransactionsRule(max_txns=3, window_minutes=1)])
+        return {seq: detector.evaluate(txn)["flags"] for seq, txn in stream}
+
+    assert flags(released) == flags(enumerate(txns))
+
+
+def test_too_late_events_go_to_side_output(tmp_path):
+    path = tmp_path / "late.csv"
+    with CsvLateEventSink(str(path)) as sink:
+        buffer = EventTimeBuffer(allowed_lateness_seconds=10, on_late=sink)
+        out = []
+        for seq, seconds in enumerate([0, 5, 30, 12, 25, 40, 19]):
+            out.extend(buffer.push(seq, make_txn(seq, seconds)))
+        out.extend(buffer.flush())
+
+    # 12 arrives after the watermark reached 20 (30 - 10); 19 after it reached 30
+    assert [seq for seq, _ in out] == [0, 1, 4, 2, 5]
+    assert buffer.late_count == 2
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["transaction_id"] for r in rows] == ["3", "6"]
+    assert rows[0]["watermark"] == (START + timedelta(seconds=20)).isoformat()
+
+
+def test_buffer_size_and_delay_bounds():
+    buffer = EventTimeBuffer(allowed_lateness_seconds=3600, max_buffered=3)
+    out = []
+    for seq in range(10):
+        out.extend(buffer.push(seq, make_txn(seq, seq)))
+        assert buffer.buffered <= 3
+    assert [seq for seq, _ in out] == list(range(7))
+    assert buffer.forced_count == 7
+
+    now = [0.0]
+    buffer = EventTimeBuffer(allowed_lateness_seconds=3600, max_delay_seconds=2.0,
+                             clock=lambda: now[0])
+    assert buffer.push(0, make_txn(0, 0)) == []
+    now[0] = 1.0
+    assert buffer.push(1, make_txn(1, 1)) == []
+    now[0] = 2.5
+    assert [seq for seq, _ in buffer.poll()] == [0]
+    now[0] = 3.5
+    assert [seq for seq, _ in buffer.poll()] == [1]
+    assert buffer.buffered == 0
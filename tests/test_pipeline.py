@@ -1,3 +1,6 @@
+import json
+from datetime import datetime
+
 from fraud_engine.pipeline import pipeline
 from fraud_engine.schema import validate_transaction
 
@@ -16,3 +19,224 @@ def test_pipeline_csv(tmp_path):
     assert txn.transaction_id == "1"
     assert txn.amount == 100
 
+
+def test_batch_pipeline_collects_rejects(tmp_path):
+    from fraud_engine.pipeline import batch_pipeline
+
+    csv_file = tmp_path / "transactions.csv"
+    csv_file.write_text(
+        "transaction_id,user_id,amount,timestamp,location,payment_method\n"
+        "1,u1,100,2025-09-16 10:00:00,NY,CreditCard\n"
+        "2,u2,abc,2025-09-16 10:00:01,NY,CreditCard\n"
+        "3,u1,25.5,not-a-date,NY,UPI\n"
+        "4,u2,7\n"
+        "5,u2,300,2025-09-16 10:00:05,LA,UPI\n"
+    )
+
+    rejects = []
+    batches = list(batch_pipeline(str(csv_file), batch_size=2, rejects=rejects))
+    rows = [txn for batch in batches for txn in batch.rows()]
+
+    assert [t.transaction_id for t in rows] == ["1", "5"]
+    assert rows[1].amount == 300.0 and rows[1].user_id == "u2"
+    assert [r.index for r in rejects] == [1, 2, 3]
+    assert "amount" in rejects[0].reason
+    assert "timestamp" in rejects[1].reason
+    assert "fields" in rejects[2].reason
+
+
+def test_out_of_range_timestamps_are_rejected_at_parse_time(tmp_path):
+    csv_file = tmp_path / "transactions.csv"
+    csv_file.write_text(
+        "transaction_id,user_id,amount,timestamp,location,payment_method\n"
+        "1,u1,100,0000-01-01 00:00:00,NY,CreditCard\n"
+        "2,u1,100,2025-09-16 10:00:00,NY,CreditCard\n"
+        "3,u1,100,9999-12-31 23:59:59-05:00,NY,CreditCard\n"
+    )
+
+    rejects = []
+    txns = list(pipeline(str(csv_file), source_type="csv", rejects=rejects))
+    assert [t.transaction_id for t in txns] == ["2"]
+    assert [r.index for r in rejects] == [0, 2]
+    assert all("out of range" in r.reason for r in rejects)
+
+
+def test_pipeline_csv_strict_matches_fast(tmp_path):
+    csv_file = tmp_path / "transactions.csv"
+    csv_file.write_text(
+        "transaction_id,user_id,amount,timestamp,location,payment_method\n"
+        "1,u1,100,2025-09-16 10:00:00,NY,CreditCard\n"
+        "2,u2,12.5,2025-09-16 10:01:00,LA,UPI\n"
+    )
+
+    fast = list(pipeline(str(csv_file), source_type="csv"))
+    strict = list(pipeline(str(csv_file), source_type="csv", strict=True))
+    assert [t.model_dump() for t in fast] == [t.model_dump() for t in strict]
+
+
+def test_fast_and_strict_csv_accept_the_same_timestamps(tmp_path):
+    timestamps = ["2025-09-16 10:00:00", "now", "2025", "1694858400", "2025-09-16T10:00:01.5",
+                  "2025-02-30 10:00:00", "2025-09-16 10:00", " 2025-09-16 10:00:02", ""]
+    csv_file = tmp_path / "transactions.csv"
+    csv_file.write_text(
+        "transaction_id,user_id,amount,timestamp,location,payment_method\n"
+        + "".join(f"{i},u1,10,{ts},NY,UPI\n" for i, ts in enumerate(timestamps))
+    )
+
+    rejects, strict_rejects = [], []
+    fast = list(pipeline(str(csv_file), source_type="csv", rejects=rejects))
+    strict = list(pipeline(str(csv_file), source_type="csv", strict=True, rejects=strict_rejects))
+    assert [t.transaction_id for t in fast] == ["0", "4"]
+    assert [t.model_dump() for t in fast] == [t.model_dump() for t in strict]
+    assert [r.index for r in rejects] == [r.index for r in strict_rejects] == [1, 2, 3, 5, 6, 7, 8]
+    assert all("timestamp" in r.reason for r in rejects)
+
+
+def test_offset_timestamps_are_naive_utc_on_every_path(tmp_path):
+    timestamps = ["2025-09-01 10:00:00+05:30", "2025-09-01T04:30:00Z", "2025-09-01 00:30:00-04:00",
+                  "2025-09-01 04:30:00"]
+    csv_file = tmp_path / "transactions.csv"
+    csv_file.write_text(
+        "transaction_id,user_id,amount,timestamp,location,payment_method\n"
+        + "".join(f"{i},u1,10,{ts},NY,UPI\n" for i, ts in enumerate(timestamps))
+    )
+    json_file = tmp_path / "transactions.json"
+    json_file.write_text(json.dumps([
+        {"transaction_id": str(i), "user_id": "u1", "amount": 10.0, "timestamp": ts,
+         "location": "NY", "payment_method": "UPI"} for i, ts in enumerate(timestamps)]))
+
+    fast = list(pipeline(str(csv_file), source_type="csv"))
+    strict = list(pipeline(str(csv_file), source_type="csv", strict=True))
+    from_json = list(pipeline(str(json_file), source_type="json"))
+    assert [t.timestamp for t in fast] == [datetime(2025, 9, 1, 4, 30)] * 4
+    assert [t.model_dump() for t in fast] == [t.model_dump() for t in strict] == \
+        [t.model_dump() for t in from_json]
+
+
+def _json_records(n):
+    return [
+        {"transaction_id": str(i), "user_id": "ü1", "amount": i + 0.5,
+         "timestamp": "2025-09-16 10:00:00", "location": "São Paulo", "payment_method": "UPI"}
+        for i in range(n)
+    ]
+
+
+def test_pipeline_json_array_and_ndjson_stream(tmp_path):
+    import json
+
+    records = _json_records(40)
+    array_file = tmp_path / "transactions.json"
+    array_file.write_text(json.dumps(records, ensure_ascii=False, indent=2), encoding="utf-8")
+    ndjson_file = tmp_path / "transactions.ndjson"
+    ndjson_file.write_text("\n".join(json.dumps(r) for r in records) + "\n", encoding="utf-8")
+
+    from_array = list(pipeline(str(array_file), source_type="json"))
+    from_ndjson = list(pipeline(str(ndjson_file), source_type="ndjson"))
+
+    assert [t.transaction_id for t in from_array] == [r["transaction_id"] for r in records]
+    assert [t.model_dump() for t in from_ndjson] == [t.model_dump() for t in from_array]
+    assert from_array[0].location == "São Paulo"
+
+
+def test_iter_json_records_small_chunks(tmp_path):
+    import json
+    from fraud_engine.jsonstream import iter_json_records
+
+    records = _json_records(25)
+    path = tmp_path / "transactions.json"
+    path.write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+
+    # Chunks split records and multi-byte characters at arbitrary points
+    assert list(iter_json_records(str(path), chunk_bytes=7)) == records
+
+
+def test_pipeline_metrics_count_rejects(tmp_path):
+    from fraud_engine.metrics import PipelineMetrics
+
+    path = tmp_path / "txns.csv"
+    path.write_text(
+        "transaction_id,user_id,amount,timestamp,location,payment_method\n"
+        "1,U1,10.0,2025-09-01 10:00:00,Pune,UPI\n"
+        "2,U1,oops,2025-09-01 10:00:05,Pune,UPI\n"
+        "3,U2,12.5,2025-09-01 10:00:09,Delhi,UPI\n"
+    )
+    for strict in (False, True):
+        metrics = PipelineMetrics()
+        txns = list(pipeline(str(path), "csv", strict=strict, rejects=[], metrics=metrics))
+        assert len(txns) == metrics.records == 2
+        assert metrics.rejected == 1
+        assert abs(metrics.reject_rate() - 1 / 3) < 1e-9
+
+
+def test_parallel_csv_matches_serial_with_quoted_newlines(tmp_path):
+    import csv
+    from fraud_engine.ingest import read_csv_batches
+    from fraud_engine.parallel_ingest import read_csv_parallel, split_byte_ranges
+
+    path = tmp_path / "quoted.csv"
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["transaction_id", "user_id", "amount", "timestamp",
+                         "location", "payment_method"])
+        for i in range(3000):
+            location = ["Pune", "New\nDelhi", 'Say "hi"\n,twice', '"\n"'][i % 4]
+            amount = "bad" if i % 101 == 0 else f"{i * 1.5:.2f}"
+            writer.writerow([i, f"U{i % 37}", amount, f"2025-09-01 10:{i % 60:02d}:00",
+                             location, "UPI"])
+
+    header, ranges = split_byte_ranges(str(path), chunk_bytes=2048)
+    assert header[0] == "transaction_id" and len(ranges) > 10
+
+    def rows(batches):
+        return [(t.transaction_id, t.user_id, t.amount, t.location)
+                for b in batches for t in b.rows()]
+
+    expected_rejects = []
+    expected = rows(read_csv_batches(str(path), rejects=expected_rejects))
+    for ordered in (True, False):
+        rejects = []
+        got = rows(read_csv_parallel(str(path), workers=2, chunk_bytes=2048,
+                                     ordered=ordered, rejects=rejects))
+        assert (got if ordered else sorted(got)) == (expected if ordered else sorted(expected))
+        assert rejects == expected_rejects
+
+
+def test_columnar_store_roundtrip(tmp_path):
+    import pytest
+    from fraud_engine.batch import UserInterner
+    from fraud_engine.columnar import convert_to_columnar
+    from fraud_engine.exceptions import InvalidTransactionError
+    from fraud_engine.pipeline import batch_pipeline
+
+    path = tmp_path / "txns.csv"
+    path.write_text(
+        "transaction_id,user_id,amount,timestamp,location,payment_method,merchant_id\n"
+        "1,U1,10.0,2025-09-01 10:00:00,Pune,UPI,M1\n"
+        "2,U1,oops,2025-09-01 10:00:05,Pune,UPI,M1\n"
+        "ü3,Ü2,12.5,2025-09-01T10:00:09,Delhi,Card,\n"
+        "4,U3,7.25,2025-09-01 10:00:11,Pune,UPI,M2\n",
+        encoding="utf-8",
+    )
+    store = tmp_path / "store"
+    rejects = []
+    assert convert_to_columnar(str(path), str(store), rejects=rejects) == 3
+    assert len(rejects) == 1
+
+    def fields(txns):
+        return [(t.transaction_id, t.user_id, t.amount, t.timestamp, t.location,
+                 t.payment_method, t.merchant_id) for t in txns]
+
+    expected = fields(pipeline(str(path), "csv", rejects=[]))
+    assert fields(pipeline(str(store), "columnar")) == expected
+
+    # Small batches with a shared interner
+    interner = UserInterner()
+    interner.intern("U9")
+    batches = list(batch_pipeline(str(store), "columnar", batch_size=2, interner=interner))
+    assert [len(b) for b in batches] == [2, 1]
+    assert fields(t for b in batches for t in b.rows()) == expected
+    assert batches[0].user_ids is interner.user_ids
+
+    # An unfinished conversion (no meta.json) is not readable
+    with pytest.raises(InvalidTransactionError):
+        list(pipeline(str(tmp_path), "columnar"))
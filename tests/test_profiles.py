@@ -0,0 +1,87 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from fraud_engine.batch import TransactionBatch, UserInterner
+from fraud_engine.profiler import Profiler
+from fraud_engine.schema import Transaction
+from scripts.profile_engine import ProfileEngine
+
+
+def make_txns(n=400, users=9, seed=3):
+    rng = random.Random(seed)
+    ts = datetime(2025, 9, 1, 8, 0, 0)
+    txns = []
+    for i in range(n):
+        ts += timedelta(minutes=rng.randint(0, 90))
+        txns.append(Transaction(transaction_id=str(i), user_id=f"u{rng.randint(1, users)}",
+                                amount=round(rng.uniform(5, 5000), 2), timestamp=ts,
+                                location="NY", payment_method="UPI"))
+    return txns
+
+
+def test_update_batch_matches_per_row_updates():
+    txns = make_txns()
+    per_row = ProfileEngine(half_life_hours=6)
+    for txn in txns:
+        per_row.update_profile(txn)
+
+    batched = ProfileEngine(half_life_hours=6, initial_users=2)
+    interner = UserInterner()
+    for start in range(0, len(txns), 64):
+        batched.update_batch(TransactionBatch.from_transactions(txns[start:start + 64], interner))
+
+    expected, actual = per_row.summary(), batched.summary()
+    assert expected.keys() == actual.keys()
+    for user, profile in expected.items():
+        for field, value in profile.items():
+            assert actual[user][field] == pytest.approx(value, rel=1e-9), (user, field)
+
+
+def test_get_profile_miss_returns_shared_default():
+    engine = ProfileEngine()
+    assert engine.get_profile("nobody") is engine.get_profile("someone-else")
+    assert engine.get_profile("nobody")["total_txn"] == 0
+    assert len(engine) == 0
+
+
+def test_profiler_flags_zscore_outlier():
+    profiler = Profiler(z_threshold=3.0, min_history=5)
+    ts = datetime(2025, 9, 1, 8, 0, 0)
+    for i, amount in enumerate([100, 110, 90, 105, 95, 100]):
+        txn = Transaction(transaction_id=str(i), user_id="u1", amount=amount,
+                          timestamp=ts + timedelta(minutes=i), location="NY", payment_method="UPI")
+        assert "ZScoreDeviationRule" not in profiler.evaluate(txn)
+
+    spike = Transaction(transaction_id="99", user_id="u1", amount=200, timestamp=ts + timedelta(hours=1),
+                        location="NY", payment_method="UPI")
+    flags = profiler.evaluate(spike)
+    assert "ZScoreDeviationRule" in flags
+    assert "DynamicLargeTransactionRule" not in flags
+
+
+def test_report_is_bounded_and_matches_summary():
+    engine = ProfileEngine()
+    for txn in make_txns(n=2000, users=300):
+        engine.update_profile(txn)
+    summary = engine.summary()
+
+    report = engine.report(top=5)
+    assert report["users"] == len(summary)
+    assert len(report["top_users"]) == 5
+    counts = sorted((p["total_txn"] for p in summary.values()), reverse=True)
+    assert [p["total_txn"] for _, p in report["top_users"]] == counts[:5]
+    assert all(summary[user] == p for user, p in report["top_users"])
+    assert report["txns_per_user"]["max"] == counts[0]
+
+
+def test_profiler_reads_shared_profiles():
+    txns = make_txns()
+    own = Profiler(z_threshold=2.0, min_history=3)
+    profiles = ProfileEngine()
+    shared = Profiler(z_threshold=2.0, min_history=3, profile_engine=profiles)
+    for txn in txns:
+        assert shared.evaluate(txn) == own.evaluate(txn)
+        profiles.update_profile(txn)
+    assert profiles.summary() == own.profile_engine.summary()
@@ -0,0 +1,73 @@
+import json
+import random
+import tracemalloc
+from datetime import datetime, timedelta
+
+from fraud_engine.detector import FraudDetector
+from fraud_engine.parallel import detect_transactions
+from fraud_engine.profiling import RunProfiler, stage_of
+from fraud_engine.rules.rapid_transaction_rule import RapidTransactionsRule
+from fraud_engine.rules.velocity_rule import VelocityRule
+from fraud_engine.schema import Transaction
+from scripts.profile_engine import ProfileEngine
+
+START = datetime(2025, 9, 1, 10, 0, 0)
+
+
+def raw_txns(n, users=2000, seed=5):
+    rng = random.Random(seed)
+    for i in range(n):
+        yield dict(transaction_id=str(i), user_id=f"u{rng.randint(1, users)}",
+                   amount=round(rng.uniform(5, 500), 2),
+                   timestamp=START + timedelta(seconds=i), location="NY", payment_method="UPI")
+
+
+def test_frames_are_attributed_to_stages():
+    assert stage_of("/repo/fraud_engine/windows.py", "observe") == "rules"
+    assert stage_of("/repo/fraud_engine/ingest.py", "parse_rows") == "validation"
+    assert stage_of("/repo/fraud_engine/ingest.py", "read_csv_batches") == "pipeline"
+    assert stage_of("/usr/lib/python3/logging/__init__.py", "emit") == "sink"
+    assert stage_of("/repo/scripts/run_detection.py", "main") is None
+
+
+def test_profile_breaks_down_time_and_memory_by_stage(tmp_path):
+    detector = FraudDetector([RapidTransactionsRule(max_txns=3, window_minutes=5),
+                              VelocityRule(aggregate="sum", field="amount", window_minutes=30,
+                                           threshold=1500)])
+    profiles = ProfileEngine()
+    stream = enumerate(Transaction(**raw) for raw in raw_txns(5000))
+
+    profiler = RunProfiler(interval=0.0005).start()
+    summary = detect_transactions(stream, detector, profiles, keep_alerts=False)
+    report = profiler.stop()
+    assert profiler.stop() is report
+    assert summary.total == 5000
+
+    rows = {row["stage"]: row for row in report.stage_rows()}
+    assert report.samples > 0
+    assert sum(row["samples"] for row in rows.values()) == report.samples
+    assert rows["rules"]["samples"] > 0 and rows["validation"]["samples"] > 0
+    # Window histories and profiles are alive when the profiler stops
+    assert rows["rules"]["alloc_bytes"] > 0 and rows["profiles"]["alloc_bytes"] > 0
+    top = rows["rules"]["top_allocations"][0]
+    assert top["site"].startswith("fraud_engine/") and top["bytes"] > 0
+    assert report.peak_bytes > 0
+
+    paths = report.write(str(tmp_path))
+    lines = open(paths["folded"]).read().splitlines()
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) == report.samples
+    assert any("fraud_engine/parallel.py:detect_transactions;" in line for line in lines)
+    written = json.load(open(paths["report"]))
+    assert [s["stage"] for s in written["stages"]] == list(rows)
+
+
+def test_stop_leaves_tracing_started_by_the_caller_running():
+    tracemalloc.start()
+    try:
+        RunProfiler(interval=0.001).start().stop()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+    RunProfiler(interval=0.001).start().stop()
+    assert not tracemalloc.is_tracing()
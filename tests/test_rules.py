@@ -1,3 +1,4 @@
+import numpy as np
 from fraud_engine.rules.rapid_transaction_rule import RapidTransactionsRule
 from fraud_engine.rules.other_rules import LargeTransactionRule
 from fraud_engine.schema import Transaction
@@ -31,3 +32,104 @@ def test_large_transaction_rule():
 
     assert not rule.check(txn_small)
     assert rule.check(txn_large)
+
+def test_rule_check_batch_falls_back_to_check():
+    from fraud_engine.batch import TransactionBatch
+    from fraud_engine.rules.base import Rule
+
+    class OddIdRule(Rule):
+        def check(self, transaction):
+            return int(transaction.transaction_id) % 2 == 1
+
+    txns = [make_txn(str(i), "u1", 10, datetime.now()) for i in range(4)]
+    hits = OddIdRule().check_batch(TransactionBatch.from_transactions(txns))
+    assert hits.tolist() == [False, True, False, True]
+
+def test_rapid_rule_evicts_idle_users():
+    rule = RapidTransactionsRule(max_txns=2, window_minutes=1)
+    start = datetime(2025, 9, 1, 10, 0, 0)
+    for i in range(50):
+        rule.check(make_txn(str(i), f"idle{i}", 10, start + timedelta(seconds=i)))
+    assert len(rule.aggregator) == 50
+
+    later = start + timedelta(minutes=5)
+    for i in range(50):
+        rule.check(make_txn(f"a{i}", "active", 10, later + timedelta(seconds=i * 30)))
+
+    assert len(rule.aggregator) == 1
+    assert len(rule.aggregator.history("active")) <= rule.max_txns + 1
+    assert rule.memory_usage() > 0
+
+def test_sliding_window_aggregates_match_brute_force():
+    import random
+    from fraud_engine.batch import TransactionBatch
+    from fraud_engine.windows import SlidingWindowAggregator, WindowMetric
+
+    rng = random.Random(7)
+    start = datetime(2025, 9, 1, 10, 0, 0)
+    txns, t = [], start
+    for i in range(2000):
+        t += timedelta(seconds=rng.choice([1, 5, 30, 120]))
+        txns.append(make_txn(str(i), f"u{rng.randrange(5)}", round(rng.uniform(1, 500), 2), t,
+                             location=f"L{rng.randrange(40)}"))
+
+    specs = [WindowMetric("count", 60), WindowMetric("sum", 600, "amount"),
+             WindowMetric("min", 600, "amount"), WindowMetric("max", 60, "amount"),
+             WindowMetric("distinct", 3600, "location")]
+    per_row, batched = SlidingWindowAggregator("user_id"), SlidingWindowAggregator("user_id")
+    for agg in (per_row, batched):
+        assert [agg.add_metric(m) for m in specs] == [0, 1, 2, 3, 4]
+        assert agg.add_metric(WindowMetric("count", 60)) == 0
+
+    got = [per_row.update(txn) for txn in txns]
+    half = len(txns) // 2
+    got_batched = np.vstack([batched.update_batch(TransactionBatch.from_transactions(part))
+                             for part in (txns[:half], txns[half:])])
+    assert np.allclose(got_batched, np.array(got))
+
+    for i, txn in enumerate(txns):
+        def recent(seconds):
+            return [p for p in txns[:i + 1] if p.user_id == txn.user_id
+                    and p.timestamp >= txn.timestamp - timedelta(seconds=seconds)]
+        count, total, low, high, distinct = got[i]
+        assert count == len(recent(60))
+        assert abs(total - sum(p.amount for p in recent(600))) < 1e-6
+        assert low == min(p.amount for p in recent(600))
+        assert high == max(p.amount for p in recent(60))
+        exact = len({p.location for p in recent(3600)})
+        assert abs(distinct - exact) <= max(2, 0.15 * exact)
+
+
+def test_velocity_rules_share_one_aggregator_and_checkpoint():
+    from fraud_engine.rules.velocity_rule import VelocityRule
+
+    aggregators = {}
+    rapid = RapidTransactionsRule(max_txns=2, window_minutes=1, aggregators=aggregators)
+    spend = VelocityRule(name="Spend", aggregate="sum", field="amount", window_minutes=10,
+                         threshold=250, aggregators=aggregators)
+    places = VelocityRule(name="Places", aggregate="distinct", field="location",
+                          window_minutes=60, op=">=", threshold=3, aggregators=aggregators)
+    assert rapid.aggregator is spend.aggregator is places.aggregator
+    assert spend.name == "Spend" and rapid.name == "RapidTransactionsRule"
+
+    start = datetime(2025, 9, 1, 10, 0, 0)
+    txns = [make_txn(str(i), "u1", 100, start + timedelta(seconds=30 * i), location=f"L{i}")
+            for i in range(4)]
+    hits = []
+    for txn in txns:
+        hits.append([rule.check(txn) for rule in (rapid, spend, places)])
+    assert hits == [[False, False, False], [False, False, False],
+                    [True, True, True], [True, True, True]]
+    assert len(rapid.aggregator.history("u1")) == 4
+
+    state = rapid.snapshot_state()
+    assert spend.snapshot_state() == {}
+    restored = {}
+    copy = [RapidTransactionsRule(max_txns=2, window_minutes=1, aggregators=restored),
+            VelocityRule(name="Spend", aggregate="sum", field="amount", window_minutes=10,
+                         threshold=250, aggregators=restored),
+            VelocityRule(name="Places", aggregate="distinct", field="location",
+                         window_minutes=60, op=">=", threshold=3, aggregators=restored)]
+    copy[0].restore_state(state)
+    nxt = make_txn("9", "u1", 10, start + timedelta(seconds=125), location="L0")
+    assert [rule.check(nxt) for rule in copy] == [rule.check(nxt) for rule in (rapid, spend, places)]
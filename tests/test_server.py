@@ -0,0 +1,79 @@
+import asyncio
+import socket
+
+import pytest
+
+from fraud_engine.detector import FraudDetector
+from fraud_engine.rules.other_rules import LargeTransactionRule
+from fraud_engine.rules.rapid_transaction_rule import RapidTransactionsRule
+from fraud_engine.server import ScoringClient, ScoringServer
+
+
+def record(i, user="u1", amount=10.0, second=0):
+    return {"transaction_id": f"t{i}", "user_id": user, "amount": amount,
+            "timestamp": f"2025-09-01 10:00:{second:02d}", "location": "NY",
+            "payment_method": "UPI"}
+
+
+def make_server(**options):
+    rules = [RapidTransactionsRule(max_txns=2, window_minutes=1),
+             LargeTransactionRule(threshold=1000)]
+    return ScoringServer(FraudDetector(rules), **options)
+
+
+async def exercise(server, address):
+    async with server:
+        async with ScoringClient(*address(server)) as client:
+            single = await client.score(record(0, amount=5000.0))
+            batch = await client.score_many([record(i, second=i) for i in range(1, 4)]
+                                            + [{"transaction_id": "bad", "amount": "x"}])
+
+        # Concurrent clients get gathered into shared micro-batches
+        async def one(i):
+            async with ScoringClient(*address(server)) as c:
+                return await c.score(record(100 + i, user=f"c{i}"))
+
+        concurrent = await asyncio.gather(*(one(i) for i in range(20)))
+        async with ScoringClient(*address(server)) as client:
+            stats = await client.server_stats()
+    return single, batch, concurrent, stats
+
+
+def check(single, batch, concurrent, stats):
+    assert single == {"transaction_id": "t0", "is_fraud": True,
+                      "flags": ["LargeTransactionRule"]}
+    # u1 already has t0: the third transaction in the minute is one too many
+    assert [v.get("is_fraud") for v in batch[:3]] == [False, True, True]
+    assert batch[2]["flags"] == ["RapidTransactionsRule"]
+    assert "error" in batch[3]
+    assert [v["transaction_id"] for v in concurrent] == [f"t{100 + i}" for i in range(20)]
+    assert not any(v["is_fraud"] for v in concurrent)
+    assert stats["transactions"] == 24 and stats["errors"] == 1
+    assert stats["batches"] < stats["transactions"]
+    assert 0 < stats["p50_ms"] <= stats["p99_ms"]
+    assert stats["throughput_per_sec"] > 0
+
+
+def test_tcp_scoring_end_to_end():
+    server = make_server(latency_budget_ms=20.0)
+    check(*asyncio.run(exercise(server, lambda s: s.address)))
+    assert server.stats.latency.count == 24
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix sockets not available")
+def test_unix_socket_scoring_end_to_end(tmp_path):
+    server = make_server(latency_budget_ms=20.0, path=str(tmp_path / "fraud.sock"))
+    check(*asyncio.run(exercise(server, lambda s: (s.address,))))
+
+
+def test_batch_size_cap_splits_batches():
+    server = make_server(latency_budget_ms=50.0, max_batch_size=4)
+
+    async def run():
+        async with server:
+            async with ScoringClient(*server.address) as client:
+                return await client.score_many([record(i, user=f"u{i}") for i in range(10)])
+
+    verdicts = asyncio.run(run())
+    assert len(verdicts) == 10
+    assert server.stats.batches == 3
@@ -0,0 +1,54 @@
+import random
+from collections import Counter
+
+import numpy as np
+
+from fraud_engine.sketches import QuantileSketch, Reservoir, SpaceSaving
+
+
+def test_space_saving_is_exact_below_capacity_and_keeps_heavy_hitters():
+    rng = random.Random(1)
+    small = [f"u{rng.randint(1, 20)}" for _ in range(2000)]
+    exact = SpaceSaving(capacity=50)
+    for user in small:
+        exact.add(user)
+    assert exact.most_common() == Counter(small).most_common()
+
+    # Zipf-like stream with far more users than tracked slots
+    stream = [f"u{int(rng.paretovariate(1.1))}" for _ in range(50_000)]
+    truth = Counter(stream)
+    top = SpaceSaving(capacity=100)
+    for user in stream:
+        top.add(user)
+    assert len(top) == 100
+    for user, n in truth.most_common(10):
+        assert n <= top.count(user) <= n + top.error(user)
+    assert [u for u, _ in top.most_common(5)] == [u for u, _ in truth.most_common(5)]
+
+
+def test_quantile_sketch_relative_error_and_merge():
+    rng = np.random.default_rng(2)
+    values = np.concatenate([rng.lognormal(6, 1.5, 20_000), -rng.uniform(1, 50, 500), [0.0] * 10])
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for v in values[:10_000].tolist():
+        sketch.add(v)
+    other = QuantileSketch(relative_accuracy=0.01)
+    other.add_many(values[10_000:])
+    sketch.merge(other)
+
+    assert sketch.count == len(values) and sketch.max == values.max()
+    for q in (0.01, 0.25, 0.5, 0.9, 0.99):
+        exact = np.quantile(values, q, method="lower")
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * abs(exact) + 1e-9
+
+
+def test_reservoir_is_uniform_and_bounded():
+    hits = Counter()
+    for seed in range(400):
+        reservoir = Reservoir(size=10, seed=seed)
+        for i in range(100):
+            reservoir.add(i)
+        assert len(reservoir.items) == 10 and reservoir.seen == 100
+        hits.update(i // 10 for i in reservoir.items)
+    # Each tenth of the stream holds about a tenth of the samples
+    assert all(300 <= hits[d] <= 500 for d in range(10))
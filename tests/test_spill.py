@@ -0,0 +1,82 @@
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from fraud_engine.batch import TransactionBatch, UserInterner
+from fraud_engine.rules.rapid_transaction_rule import RapidTransactionsRule
+from fraud_engine.rules.velocity_rule import VelocityRule
+from fraud_engine.schema import Transaction
+from fraud_engine.spill import SqliteBackend, StateSpill
+from scripts.profile_engine import ProfileEngine
+
+START = datetime(2025, 9, 1, 10, 0, 0)
+
+
+def make_txns(n=3000, users=40, seed=11):
+    rng = random.Random(seed)
+    return [Transaction(transaction_id=str(i), user_id=f"u{rng.randint(1, users)}",
+                        amount=round(rng.uniform(5, 500), 2),
+                        timestamp=START + timedelta(seconds=2 * i),
+                        location=f"L{rng.randint(1, 6)}", payment_method="UPI")
+            for i in range(n)]
+
+
+def build_rules():
+    aggregators = {}
+    return [RapidTransactionsRule(max_txns=3, window_minutes=5, aggregators=aggregators),
+            VelocityRule(name="Spend", aggregate="sum", field="amount", window_minutes=30,
+                         threshold=1500, aggregators=aggregators),
+            VelocityRule(name="Places", aggregate="distinct", field="location",
+                         window_minutes=60, op=">=", threshold=4, aggregators=aggregators)]
+
+
+def test_spilled_windows_flag_like_in_memory_ones(tmp_path):
+    txns = make_txns()
+    plain, spilled = build_rules(), build_rules()
+    spill = StateSpill(SqliteBackend(str(tmp_path / "windows.db")), write_batch=8)
+    spilled[0].aggregator.spill_to(spill, max_keys=5)
+
+    for txn in txns:
+        assert [r.check(txn) for r in spilled] == [r.check(txn) for r in plain]
+        assert len(spilled[0].aggregator) <= 5
+    assert spill.spills > 0 and spill.loads > 0 and spill.flushes > 0
+    assert spill.hits + spill.loads + spill.misses == spill.lookups == len(txns)
+
+    # Vectorized path: cold users of each batch are read back in one query
+    plain, spilled = RapidTransactionsRule(max_txns=2, window_minutes=5), \
+        RapidTransactionsRule(max_txns=2, window_minutes=5)
+    spill = StateSpill(SqliteBackend(str(tmp_path / "counts.db")))
+    spilled.aggregator.spill_to(spill, max_keys=16)
+    interner = UserInterner()
+    for lo in range(0, len(txns), 250):
+        batch = TransactionBatch.from_transactions(txns[lo:lo + 250], interner)
+        assert np.array_equal(spilled.check_batch(batch), plain.check_batch(batch))
+    assert spill.loads > 0
+
+
+def test_spilled_profiles_match_in_memory_profiles(tmp_path):
+    txns = make_txns(users=60)
+    plain = ProfileEngine()
+    spill = StateSpill(SqliteBackend(str(tmp_path / "profiles.db"), table="profiles"),
+                       name="profiles", write_batch=16)
+    spilled = ProfileEngine(max_users=8, spill=spill)
+    for txn in txns:
+        assert spilled.stats(txn.user_id) == plain.stats(txn.user_id)
+        plain.update_profile(txn)
+        spilled.update_profile(txn)
+    assert len(spilled) == 8
+    assert spilled.summary() == plain.summary()
+    assert spilled.get_profile("u7") == plain.get_profile("u7")
+
+    report, expected = spilled.report(top=5), plain.report(top=5)
+    assert report["users"] == expected["users"] == 60
+    # Ties may come out in another order
+    assert [p["total_txn"] for _, p in report["top_users"]] == \
+        [p["total_txn"] for _, p in expected["top_users"]]
+    assert abs(report["txns_per_user"]["p50"] - expected["txns_per_user"]["p50"]) \
+        <= 0.02 * expected["txns_per_user"]["p50"]
+
+    families = {f.name: f for f in spill.collect()}
+    assert families["fraudx_state_hits_total"].samples == [({"store": "profiles"}, spill.hits)]
+    assert 0 < spill.hit_rate() < 1